@@ -1,10 +1,15 @@
 import os
-import math
-import io
-import wave
-import struct
+import hmac
+import time
+import logging
+import threading
 from datetime import datetime
-from flask import Flask, render_template, jsonify, send_from_directory, request, send_file
+
+_imports_started = time.perf_counter()
+
+from flask import (
+    Blueprint, Flask, Response, render_template, jsonify, send_from_directory, request, send_file, g
+)
 from werkzeug.exceptions import BadRequest
 
 from config import get_config, Config
@@ -14,86 +19,555 @@ from csv_handler import (
     NetworkConfigHandler, DeviceDataHandler, TrafficLogger, CSVHandler
 )
 from image_handler import ImageHandler
-from pdf_generator import generate_flowchart_pdf
-
-# Initialize Flask app
-app = Flask(__name__)
+from catalogue_cache import CatalogueCache
+from payload import PayloadCache, payload_response
+from audio import LatencyAudioRenderer
+from export_pool import PDFExportPool, PoolSaturated, ExportTimeout, clear_asset_cache
+from chains import ChainEvaluator
+from snapshot import CatalogueSnapshot, SNAPSHOT_MODULES, source_fingerprint
+from shared_catalogue import SharedCatalogue, available as shared_catalogue_available
+from thumbnails import ThumbnailStore
+from profiling import RequestProfiler
+from watcher import FileWatcher
+from metrics import (
+    REGISTRY, HTTP_REQUEST_SECONDS, HTTP_RESPONSES, HTTP_IN_FLIGHT,
+    CATALOGUE_RELOADS, CATALOGUE_LOAD_SECONDS, SOURCE_RELOADS
+)
 
-# Load configuration
-config = get_config()
-app.config.from_object(config)
+# Flask's app.logger (named after this file, also when run as __main__),
+# configured by setup_logging in create_app
+logger = logging.getLogger('app')
 
-# Initialize logging
-logger = setup_logging(app)
+# Routes and request hooks, registered on the app by create_app
+routes = Blueprint('alc', __name__)
 
 # Initialize handlers
-image_handler = ImageHandler(Config.IMAGE_FOLDER)
+image_handler = ImageHandler(Config.IMAGE_FOLDER, fuzzy_threshold=Config.IMAGE_FUZZY_THRESHOLD)
+image_handler.add_listener(clear_asset_cache)
+thumbnail_store = ThumbnailStore(
+    Config.IMAGE_FOLDER,
+    Config.THUMBNAIL_CACHE_DIR,
+    quality=Config.THUMBNAIL_QUALITY
+)
 network_handler = NetworkConfigHandler(Config.NETWORK_CNF_FILE)
 device_handler = DeviceDataHandler(
     Config.CSV_DIR,
     network_handler,
-    image_finder=image_handler.find
+    image_finder=image_handler.find,
+    loader=Config.CSV_LOADER,
+    image_version=lambda: image_handler.version
+)
+traffic_logger = TrafficLogger(
+    Config.TRAFFIC_LOG_FILE,
+    flush_interval=Config.TRAFFIC_FLUSH_INTERVAL,
+    batch_size=Config.TRAFFIC_BATCH_SIZE,
+    buffer_size=Config.TRAFFIC_BUFFER_SIZE,
+    checkpoint_file=Config.POPULARITY_CHECKPOINT_FILE,
+    trending_half_life_hours=Config.TRENDING_HALF_LIFE_HOURS
+)
+audio_renderer = LatencyAudioRenderer(
+    Config.AUDIO_SAMPLE_RATE,
+    Config.AUDIO_BEEP_FREQ,
+    Config.AUDIO_BEEP_DURATION_MS,
+    cache_size=Config.AUDIO_CACHE_SIZE,
+    cache_entry_max_bytes=Config.AUDIO_CACHE_ENTRY_MAX_BYTES,
+    chunk_frames=Config.AUDIO_STREAM_CHUNK_FRAMES
+)
+pdf_export_pool = PDFExportPool(
+    Config.PDF_POOL_SIZE,
+    Config.PDF_QUEUE_DEPTH,
+    Config.PDF_TIMEOUT,
+    start_method=Config.PDF_POOL_START_METHOD,
+    max_exports=Config.PDF_MAX_EXPORTS
 )
-traffic_logger = TrafficLogger(Config.TRAFFIC_LOG_FILE)
 
-# Caches
-devices_cache = None
-devices_cache_time = None
-popularity_cache = None
+# Catalogue built once and shared by all gunicorn workers (when configured)
+shared_catalogue = None
+if Config.SHARED_CATALOGUE_DIR:
+    if shared_catalogue_available():
+        shared_catalogue = SharedCatalogue(Config.SHARED_CATALOGUE_DIR)
+    else:
+        logger.warning("Shared catalogue needs fcntl, each process builds its own catalogue")
 
-def get_devices():
-    """Get cached devices list with TTL-based refresh."""
-    global devices_cache, devices_cache_time
-    now = datetime.now()
+RELOAD_SOURCES = ('devices', 'network', 'images')
+
+# Parser code is part of every source's fingerprint (fixed per process)
+_CODE_FINGERPRINT = source_fingerprint(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), module) for module in SNAPSHOT_MODULES
+)
+
+
+def _source_fingerprints():
+    """Fingerprint of each catalogue source, for the shared catalogue."""
+    return {
+        'devices': source_fingerprint([Config.CSV_DIR]),
+        'network': source_fingerprint([Config.NETWORK_CNF_FILE]),
+        'images': source_fingerprint([Config.IMAGE_FOLDER]),
+        'code': _CODE_FINGERPRINT,
+    }
+
+
+def _handler_state():
+    """Handler states, pickled together so the catalogue keeps sharing configs."""
+    return {
+        'images': image_handler.export_state(),
+        'network': network_handler.export_state(),
+        'devices': device_handler.export_state(),
+    }
+
+
+def _restore_handlers(state):
+    """Restore handler states from a snapshot or shared catalogue."""
+    image_version = image_handler.version
+    image_handler.restore_state(state['images'])
+    network_handler.restore_state(state['network'])
+    device_handler.restore_state(state['devices'])
+    if device_handler.devices.thumbnails:
+        # Built elsewhere: serve the variant URLs it already carries
+        thumbnail_store.register(device_handler.devices.thumbnails)
+    if image_handler.version != image_version:
+        clear_asset_cache()
+
+
+def _load_devices(sources, full, trigger):
+    """
+    Reload the given sources, then the device catalogue.
     
-    if devices_cache and devices_cache_time:
-        age = (now - devices_cache_time).total_seconds()
-        if age < Config.CACHE_TTL:
-            return devices_cache
+    The device handler only re-parses CSV files that changed, so an
+    unchanged data directory costs one stat per file.
+    """
+    if 'images' in sources:
+        image_handler.scan()
+    if 'network' in sources:
+        network_handler.load()
+    if full:
+        device_handler.invalidate()
+    for source in sources:
+        SOURCE_RELOADS.inc(source=source, trigger=trigger)
+    return device_handler.load()
+
+
+def _load_shared_devices(sources, full, trigger):
+    """
+    Adopt the shared catalogue, rebuilding and publishing it if stale.
     
-    try:
-        device_handler.load()
-        devices_cache = device_handler.devices
-        devices_cache_time = now
+    Only sources whose files changed since they were last loaded (by any
+    worker) are reloaded, so a change is parsed once, by whichever worker
+    gets the builder lock first; the others adopt its publication.
+    """
+    with shared_catalogue.building():
+        published = shared_catalogue.read()
+        if published is not None:
+            _restore_handlers(published['state'])
+            shared_catalogue.adopt(published)
+        
+        fingerprints = _source_fingerprints()
+        stale = {source for source, fingerprint in fingerprints.items()
+                 if shared_catalogue.fingerprints.get(source) != fingerprint}
+        if 'code' in stale:
+            stale, full = set(RELOAD_SOURCES), True
+        if full:
+            stale |= set(sources)
+        if not stale:
+            return device_handler.devices
         
+        catalogue = _load_devices(sorted(stale), full, trigger)
+        if catalogue.thumbnails is None:
+            catalogue.thumbnails = thumbnail_store.urls(catalogue.images)
+        shared_catalogue.publish(fingerprints, _handler_state())
+        return catalogue
+
+
+def _build_devices(current, sources=(), full=False, trigger='refresh'):
+    """
+    Build the catalogue to publish, refreshing devices and popularity.
+    
+    Popularity counts are refreshed from the tail of the traffic log and
+    attached as a ranking. The current catalogue is kept, along with its
+    version, encoded payload and ETag, unless the devices or the ranking
+    changed. Runs in the catalogue cache's refresh thread, one build at a
+    time.
+    
+    Args:
+        current: Currently published catalogue, or None
+        sources: Names from RELOAD_SOURCES to reload first
+        full: Re-parse every device CSV, not only changed ones
+        trigger: What asked for the reload, for metrics
+    
+    Returns:
+        DeviceCatalogue: New catalogue, or current if nothing changed
+    """
+    started = time.perf_counter()
+    if shared_catalogue is not None:
+        catalogue = _load_shared_devices(sources, full, trigger)
+    else:
+        catalogue = _load_devices(sources, full, trigger)
+    CATALOGUE_LOAD_SECONDS.observe(time.perf_counter() - started)
+    if catalogue.thumbnails is None:
+        catalogue.thumbnails = thumbnail_store.urls(catalogue.images)
+    popularity = traffic_logger.popularity
+    traffic_logger.flush()
+    popularity.update()
+    
+    devices = catalogue.with_popularity(popularity.counts())
+    if current is not None and current.version == devices.version:
+        return current
+    catalogue_changed = current is None or current.version.partition('.')[0] != catalogue.version
+    
+    if catalogue_changed:
+        CATALOGUE_RELOADS.inc()
         # Log missing images
-        missing = image_handler.get_missing_images(devices_cache)
+        missing = image_handler.get_missing_images(devices)
         if missing:
             logger.info(f"{len(missing)} devices missing images")
         else:
             logger.debug("All device images found")
-        
-        return devices_cache
     
+    return devices
+
+
+# Caches
+devices_cache = CatalogueCache(
+    _build_devices,
+    Config.CACHE_TTL,
+    is_stale=shared_catalogue.changed if shared_catalogue is not None else None
+)
+data_payload_cache = PayloadCache()
+
+def get_devices():
+    """
+    Get the published devices catalogue.
+    
+    Never reloads on the request path: once the catalogue is older than
+    CACHE_TTL, or another worker published a newer shared catalogue, a
+    single background refresh is started and readers keep getting the
+    current catalogue until the new one is swapped in.
+    """
+    return devices_cache.get()
+
+
+def reload_sources(sources, trigger: str, full: bool = False):
+    """
+    Reload source handlers and publish the rebuilt catalogue.
+    
+    Handlers reload under the catalogue cache's build lock, so they never
+    change under a running build, and readers keep getting the previous
+    catalogue until the rebuilt one is swapped in. Device CSVs are always
+    re-checked by the build itself; an image change makes it re-parse them.
+    With a shared catalogue, sources are only reloaded if no other worker
+    already did so since they changed.
+    
+    Args:
+        sources: Names from RELOAD_SOURCES
+        trigger: What asked for the reload ('watcher' or 'admin')
+        full: Re-parse every device CSV and reload the given sources
+            even if unchanged
+    
+    Returns:
+        DeviceCatalogue: The published catalogue
+    """
+    return devices_cache.refresh(sources=tuple(sources), full=full, trigger=trigger)
+
+
+# Reload sources when they change on disk. Started per process by
+# start_worker_threads, since gunicorn forks workers after the app is loaded
+file_watcher = None
+if Config.WATCH_FILES:
+    file_watcher = FileWatcher(Config.WATCH_DEBOUNCE, Config.WATCH_POLL_INTERVAL)
+    file_watcher.watch('device CSVs', Config.CSV_DIR,
+                       lambda: reload_sources(('devices',), 'watcher'), suffixes=('.csv',))
+    file_watcher.watch('network config', Config.NETWORK_CNF_FILE,
+                       lambda: reload_sources(('network',), 'watcher'))
+    file_watcher.watch('images', Config.IMAGE_FOLDER,
+                       lambda: reload_sources(('images',), 'watcher'),
+                       recursive=True, suffixes=ImageHandler.SUPPORTED_FORMATS)
+
+
+_worker_pid = None
+_worker_lock = threading.Lock()
+
+
+def _prewarm_imports():
+    """Import the PDF renderer so the first export does not pay for it."""
+    try:
+        seconds = pdf_export_pool.prewarm()
+        logger.info(f"Pre-warmed PDF renderer imports in {seconds * 1000:.1f} ms")
     except Exception as e:
-        logger.error(f"Error loading devices: {e}")
-        return []
+        logger.warning(f"Could not pre-warm PDF renderer: {e}")
+
+
+def start_worker_threads():
+    """
+    Start this process's background threads: the file watcher and, with
+    PREWARM_IMPORTS, the PDF renderer import.
+    
+    Called from gunicorn's post_worker_init hook, else by the first request
+    of each process. Runs once per process.
+    """
+    global _worker_pid
+    with _worker_lock:
+        if _worker_pid == os.getpid():
+            return
+        _worker_pid = os.getpid()
+    
+    if file_watcher is not None:
+        file_watcher.start()
+    if Config.PREWARM_IMPORTS:
+        threading.Thread(target=_prewarm_imports, name='import-prewarm', daemon=True).start()
+
+
+@routes.before_app_request
+def start_worker():
+    if _worker_pid != os.getpid():
+        start_worker_threads()
+
+
+def _metrics_endpoint() -> str:
+    """Route pattern of the current request (bounded label cardinality)."""
+    return request.url_rule.rule if request.url_rule else '<unmatched>'
+
+
+@routes.before_app_request
+def start_request_metrics():
+    g.metrics_started = time.perf_counter()
+    g.metrics_endpoint = _metrics_endpoint()
+    HTTP_IN_FLIGHT.inc(endpoint=g.metrics_endpoint)
+
+
+@routes.after_app_request
+def record_request_metrics(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        endpoint = g.metrics_endpoint
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                     method=request.method, endpoint=endpoint)
+        HTTP_RESPONSES.inc(method=request.method, endpoint=endpoint,
+                           status=str(response.status_code))
+    return response
+
 
+@routes.teardown_app_request
+def finish_request_metrics(exc):
+    endpoint = g.pop('metrics_endpoint', None)
+    if endpoint is not None:
+        HTTP_IN_FLIGHT.dec(endpoint=endpoint)
 
 
-@app.route('/')
+@routes.route('/')
 def index():
     return render_template('index.html')
 
 
-@app.route('/table')
+@routes.route('/table')
 def table_view():
     devices = get_devices()
     return render_template('table.html', devices=devices)
 
 
-@app.route('/api/data')
+@routes.route('/api/data')
 def get_data():
-    """Get all devices data as JSON."""
+    """Get all devices data as JSON, encoded and compressed once per version."""
     try:
         devices = get_devices()
-        return jsonify(devices)
+        payload = data_payload_cache.get(devices.version, devices.to_list)
+        return payload_response(payload)
     except Exception as e:
         logger.error(f"Error fetching data: {e}")
         return jsonify({"error": "Failed to load device data"}), 500
 
 
-@app.route('/images/<path:filename>')
+@routes.route('/api/devices')
+def query_devices():
+    """
+    Search, filter, sort and paginate devices.
+    
+    Query params: q, brand, input_type, output_type, sample_rate,
+    min_latency, max_latency, sort, cursor, limit.
+    """
+    try:
+        devices = get_devices()
+        index = devices.index
+        if index is None:
+            return jsonify({"devices": [], "total": 0, "next_cursor": None})
+        
+        args = request.args
+        limit = max(1, min(int(args.get('limit', 50)), Config.API_MAX_PAGE_SIZE))
+        min_latency = args.get('min_latency')
+        max_latency = args.get('max_latency')
+        
+        after = None
+        cursor = args.get('cursor')
+        if cursor:
+            version, _, rank = cursor.partition(':')
+            if version != devices.version[:12]:
+                return jsonify({"error": "Cursor expired, restart the query"}), 400
+            after = int(rank)
+        
+        positions, total, last_rank = index.query(
+            search=args.get('q', '').strip(),
+            brand=args.get('brand', '').strip(),
+            input_type=args.get('input_type', '').strip(),
+            output_type=args.get('output_type', '').strip(),
+            sample_rate=args.get('sample_rate', '').strip(),
+            min_latency=float(min_latency) if min_latency else None,
+            max_latency=float(max_latency) if max_latency else None,
+            sort=args.get('sort', 'default'),
+            after=after,
+            limit=limit
+        )
+        
+        return jsonify({
+            "devices": [devices[pos].to_dict() for pos in positions],
+            "total": total,
+            "next_cursor": f"{devices.version[:12]}:{last_rank}" if last_rank is not None else None
+        })
+    
+    except (ValueError, TypeError) as e:
+        logger.warning(f"Invalid device query: {e}")
+        return jsonify({"error": "Invalid query parameters"}), 400
+    except Exception as e:
+        logger.error(f"Error querying devices: {e}")
+        return jsonify({"error": "Failed to query devices"}), 500
+
+
+@routes.route('/api/compatible')
+def compatible_devices():
+    """
+    Get devices that may follow a device in a chain.
+    
+    Query params: after (device id), port ("<output type>|<output SR>" to
+    use a split port selection instead of the device's own output) and
+    ids_only (return only ids, for greying out library cards).
+    """
+    try:
+        devices = get_devices()
+        if devices.compatibility is None:
+            return jsonify({"ids": [], "devices": []})
+        
+        out_type, out_sr = '', ''
+        after = request.args.get('after')
+        if after:
+            source = devices.get_by_id(int(after))
+            if source is None:
+                return jsonify({"error": "Unknown device id"}), 404
+            out_type = source.raw_data.output_type
+            out_sr = source.raw_data.output_sr
+        
+        port = request.args.get('port')
+        if port:
+            out_type, _, out_sr = port.partition('|')
+        
+        positions = devices.compatibility.following(out_type, out_sr)
+        ids = [devices.ids[pos] for pos in positions]
+        if request.args.get('ids_only', '').lower() in ('1', 'true'):
+            return jsonify({"ids": ids})
+        
+        return jsonify({
+            "ids": ids,
+            "devices": [devices[pos].to_dict() for pos in positions]
+        })
+    
+    except (ValueError, TypeError) as e:
+        logger.warning(f"Invalid compatibility request: {e}")
+        return jsonify({"error": "Invalid query parameters"}), 400
+    except Exception as e:
+        logger.error(f"Error finding compatible devices: {e}")
+        return jsonify({"error": "Failed to find compatible devices"}), 500
+
+
+@routes.route('/api/chains/solve', methods=['POST'])
+def solve_chains():
+    """
+    Find the lowest-latency chains from a source signal to a target device.
+
+    JSON body: source ({protocol, sr}), target (any of brand, device,
+    input_type, input_sr, output_type, output_sr), k, required_devices,
+    exclude_brands, max_hops and latency_budget (ms).
+    """
+    try:
+        data = request.get_json()
+        if not isinstance(data, dict) or not isinstance(data.get('target'), dict):
+            return jsonify({"error": "Missing target"}), 400
+        if not isinstance(data.get('source'), (dict, type(None))):
+            return jsonify({"error": "Invalid source"}), 400
+
+        k = max(1, min(int(data.get('k', 3)), Config.SOLVER_MAX_K))
+        max_hops = max(1, min(int(data.get('max_hops', 6)), Config.SOLVER_MAX_HOPS))
+        budget = data.get('latency_budget')
+        budget = float(budget) if budget not in (None, '') else None
+
+        devices = get_devices()
+        if devices.solver is None:
+            return jsonify({"chains": []})
+
+        chains = devices.solver.solve(
+            data.get('source'), data['target'], k=k,
+            required_devices=[str(name) for name in data.get('required_devices') or []],
+            exclude_brands=[str(brand) for brand in data.get('exclude_brands') or []],
+            max_hops=max_hops, latency_budget=budget
+        )
+
+        return jsonify({
+            "chains": [{
+                "total_latency": round(chain['total_latency'], 3),
+                "hops": chain['hops'],
+                "devices": [devices[pos].to_dict() for pos in chain['positions']]
+            } for chain in chains]
+        })
+
+    except BadRequest:
+        return jsonify({"error": "Invalid JSON data"}), 400
+    except (ValueError, TypeError) as e:
+        logger.warning(f"Invalid solve request: {e}")
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error solving chains: {e}")
+        return jsonify({"error": "Failed to solve chains"}), 500
+
+
+@routes.route('/api/chains/evaluate', methods=['POST'])
+def evaluate_chains():
+    """
+    Validate chain trees and compute their per-path latency totals.
+
+    JSON body: either chain (one tree) or chains (a list of trees, up to
+    EVALUATE_MAX_CHAINS). A tree is the chain builder's node list; device
+    nodes may be given as bare ids.
+    """
+    try:
+        data = request.get_json()
+        if not isinstance(data, dict):
+            return jsonify({"error": "Invalid JSON data"}), 400
+
+        evaluator = ChainEvaluator(get_devices())
+        if 'chain' in data:
+            return jsonify(evaluator.evaluate(data['chain']))
+
+        chains = data.get('chains')
+        if not isinstance(chains, list):
+            return jsonify({"error": "Missing chain or chains"}), 400
+        if len(chains) > Config.EVALUATE_MAX_CHAINS:
+            return jsonify({"error": f"At most {Config.EVALUATE_MAX_CHAINS} chains per request"}), 400
+
+        results = []
+        for chain in chains:
+            try:
+                results.append(evaluator.evaluate(chain))
+            except (ValueError, TypeError, AttributeError) as e:
+                results.append({"error": str(e)})
+        return jsonify({"results": results})
+
+    except BadRequest:
+        return jsonify({"error": "Invalid JSON data"}), 400
+    except (ValueError, TypeError, AttributeError) as e:
+        logger.warning(f"Invalid chain evaluation request: {e}")
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error evaluating chains: {e}")
+        return jsonify({"error": "Failed to evaluate chains"}), 500
+
+
+@routes.route('/images/<path:filename>')
 def serve_image(filename):
     """Serve image files with security validation."""
     try:
@@ -107,11 +581,31 @@ def serve_image(filename):
         return "Image not found", 404
 
 
-@app.route('/api/audio_preview')
+@routes.route('/thumbs/<name>')
+def serve_thumbnail(name):
+    """Serve a resized image variant under its content-hashed, immutable URL."""
+    try:
+        path = thumbnail_store.path(name)
+        if path is None:
+            return "Image not found", 404
+        
+        response = send_file(path, max_age=Config.THUMBNAIL_MAX_AGE)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+    except Exception as e:
+        logger.error(f"Thumbnail error for {name}: {e}")
+        return "Image not found", 404
+
+
+@routes.route('/api/audio_preview')
 def audio_preview():
     """
     Generate stereo WAV file with latency demonstration.
     Left channel: Beep at T=0, Right channel: Beep at T=latency_ms
+    
+    Supports single byte-range requests (206) so <audio> seeking does not
+    regenerate the whole file; large files are streamed chunk by chunk.
     """
     try:
         latency_ms = validate_latency(
@@ -119,14 +613,34 @@ def audio_preview():
             Config.AUDIO_MAX_LATENCY_MS
         )
         
-        buf = _generate_latency_audio(latency_ms)
+        size = audio_renderer.file_size(audio_renderer.latency_samples(latency_ms))
+        start, stop, status = 0, size, 200
+        
+        if request.range:
+            byte_range = request.range.range_for_length(size)
+            if byte_range:
+                start, stop = byte_range
+                status = 206
+            elif len(request.range.ranges) == 1:
+                response = Response(status=416)
+                response.headers['Content-Range'] = f"bytes */{size}"
+                return response
         
-        return send_file(
-            buf,
+        response = Response(
+            _generate_latency_audio(latency_ms, start, stop),
+            status=status,
             mimetype="audio/wav",
-            as_attachment=True,
-            download_name=f"latency_{latency_ms}ms.wav"
+            direct_passthrough=True
         )
+        response.content_length = stop - start
+        response.accept_ranges = "bytes"
+        if status == 206:
+            response.headers['Content-Range'] = f"bytes {start}-{stop - 1}/{size}"
+        response.headers.set(
+            'Content-Disposition', 'attachment',
+            filename=f"latency_{latency_ms}ms.wav"
+        )
+        return response
     
     except (ValueError, TypeError) as e:
         logger.warning(f"Invalid audio request: {e}")
@@ -136,44 +650,21 @@ def audio_preview():
         return jsonify({"error": "Failed to generate audio"}), 500
 
 
-def _generate_latency_audio(latency_ms):
-    """Generate stereo WAV buffer with latency demonstration."""
-    sample_rate = Config.AUDIO_SAMPLE_RATE
-    beep_freq = Config.AUDIO_BEEP_FREQ
-    beep_duration_ms = Config.AUDIO_BEEP_DURATION_MS
-    
-    duration_sec = 1.0 + (latency_ms / 1000.0)
-    num_samples = int(sample_rate * duration_sec)
-    beep_samples = int(sample_rate * (beep_duration_ms / 1000.0))
-    latency_samples = int(sample_rate * (latency_ms / 1000.0))
+def _generate_latency_audio(latency_ms, start=0, end=None):
+    """
+    Get a byte range of the stereo WAV for a latency.
     
-    buf = io.BytesIO()
-    with wave.open(buf, 'wb') as wav_file:
-        wav_file.setnchannels(2)  # Stereo
-        wav_file.setsampwidth(2)  # 16-bit
-        wav_file.setframerate(sample_rate)
-        
-        for i in range(num_samples):
-            # Left channel: beep at T=0
-            l_val = 0
-            if 0 <= i < beep_samples:
-                fade = 1.0 if i <= beep_samples * 0.8 else (beep_samples - i) / (beep_samples * 0.2)
-                l_val = int(math.sin(2 * math.pi * beep_freq * i / sample_rate) * 16384 * fade)
-            
-            # Right channel: beep at T=latency_ms
-            r_val = 0
-            if latency_samples <= i < (latency_samples + beep_samples):
-                rel_i = i - latency_samples
-                fade = 1.0 if rel_i <= beep_samples * 0.8 else (beep_samples - rel_i) / (beep_samples * 0.2)
-                r_val = int(math.sin(2 * math.pi * beep_freq * rel_i / sample_rate) * 16384 * fade)
-            
-            wav_file.writeframes(struct.pack('<hh', l_val, r_val))
-    
-    buf.seek(0)
-    return buf
-
-
-@app.route('/api/sources')
+    Returns the cached file slice when the file is small enough to cache,
+    otherwise a generator that synthesizes the range chunk by chunk.
+    """
+    latency_samples = audio_renderer.latency_samples(latency_ms)
+    data = audio_renderer.cached(latency_samples)
+    if data is not None:
+        return [data[start:end]]
+    return audio_renderer.iter_bytes(latency_samples, start, end)
+
+
+@routes.route('/api/sources')
 def get_sources():
     """Get available sources from sources.csv."""
     try:
@@ -193,33 +684,59 @@ def get_sources():
         return jsonify({}), 500
 
 
-@app.route('/api/export-flowchart-pdf', methods=['POST'])
+@routes.route('/api/export-flowchart-pdf', methods=['POST'])
 def export_flowchart_pdf():
-    """Export signal chain as professional flowchart PDF."""
+    """
+    Export signal chain as professional flowchart PDF.
+    
+    The PDF is streamed as its pages are rendered, so long chains (many
+    pages) start downloading after the first page.
+    """
     try:
         data = request.get_json()
         chain = data.get('chain', [])
-        total_latency = float(data.get('total_latency', 0))
         
         if not chain:
             return jsonify({"error": "Empty chain"}), 400
         
-        # Generate PDF with flowchart
-        pdf_bytes = generate_flowchart_pdf(chain, total_latency)
+        # Compute the total here rather than trusting the client's value;
+        # stale nodes count with the latency drawn for them in the PDF
+        try:
+            result = ChainEvaluator(get_devices()).evaluate(chain)
+            total_latency = result['total_latency']
+            if result['stale']:
+                logger.warning(
+                    "Exported chain has stale device ids, using their saved data: "
+                    + ", ".join(f"{node['id']} ({node['name']})" for node in result['stale'])
+                )
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.warning(f"Could not evaluate exported chain, using client total: {e}")
+            total_latency = float(data.get('total_latency', 0))
+        
+        # Generate PDF with flowchart in the export pool
+        parts = pdf_export_pool.stream(chain, total_latency)
         
-        return send_file(
-            io.BytesIO(pdf_bytes),
-            mimetype="application/pdf",
-            as_attachment=True,
-            download_name=f"signal_chain_flowchart_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+        response = Response(parts, mimetype="application/pdf", direct_passthrough=True)
+        response.headers.set(
+            'Content-Disposition', 'attachment',
+            filename=f"signal_chain_flowchart_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
         )
+        return response
     
+    except PoolSaturated:
+        logger.warning("PDF export rejected: export pool saturated")
+        response = jsonify({"error": "PDF export busy, please retry shortly"})
+        response.headers['Retry-After'] = str(Config.PDF_RETRY_AFTER)
+        return response, 503
+    except ExportTimeout:
+        logger.error(f"PDF export produced no output for {Config.PDF_TIMEOUT}s")
+        return jsonify({"error": "PDF generation timed out"}), 504
     except Exception as e:
         logger.error(f"PDF export error: {e}")
         return jsonify({"error": "Failed to generate PDF"}), 500
 
 
-@app.route('/api/track', methods=['POST'])
+@routes.route('/api/track', methods=['POST'])
 def track_event():
     """Log user events for analytics."""
     try:
@@ -246,7 +763,27 @@ def track_event():
         return jsonify({"error": "Internal error"}), 500
 
 
-@app.route('/health')
+@routes.route('/api/popularity')
+def get_popularity():
+    """Get most used devices and brands, plus time-decayed trending devices."""
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), Config.API_MAX_PAGE_SIZE))
+        popularity = traffic_logger.popularity
+        traffic_logger.flush()
+        popularity.update()
+        return jsonify({
+            kind: [{"name": name, "score": score} for name, score in popularity.top(kind, limit)]
+            for kind in ('devices', 'brands', 'trending')
+        })
+    except (ValueError, TypeError) as e:
+        logger.warning(f"Invalid popularity request: {e}")
+        return jsonify({"error": "Invalid limit"}), 400
+    except Exception as e:
+        logger.error(f"Error loading popularity: {e}")
+        return jsonify({"error": "Failed to load popularity"}), 500
+
+
+@routes.route('/health')
 def health_check():
     """Health check endpoint for monitoring."""
     return jsonify({
@@ -255,32 +792,200 @@ def health_check():
     }), 200
 
 
-@app.errorhandler(404)
+@routes.route('/api/admin/reload', methods=['POST'])
+def admin_reload():
+    """
+    Force a rebuild of the catalogue sources.
+    
+    Requires ``Authorization: Bearer <ADMIN_TOKEN>``. An optional JSON body
+    {"sources": [...]} limits the reload to some of RELOAD_SOURCES; device
+    CSVs are then fully re-parsed. Only the worker answering the request
+    reloads; the others pick up file changes through their own watchers.
+    """
+    if not Config.ADMIN_TOKEN:
+        return jsonify({"error": "Not found"}), 404
+    
+    supplied = request.headers.get('Authorization', '').encode('utf-8')
+    if not hmac.compare_digest(supplied, f"Bearer {Config.ADMIN_TOKEN}".encode('utf-8')):
+        logger.warning(f"Rejected admin reload from {request.remote_addr}")
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        sources = data.get('sources') or list(RELOAD_SOURCES)
+        if not isinstance(sources, list) or not set(sources) <= set(RELOAD_SOURCES):
+            return jsonify({"error": f"sources must be a list of {', '.join(RELOAD_SOURCES)}"}), 400
+        
+        started = time.perf_counter()
+        devices = reload_sources(sources, 'admin', full=True)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"Admin reload of {', '.join(sources)} took {elapsed_ms:.1f} ms")
+        return jsonify({
+            "status": "reloaded",
+            "sources": sources,
+            "devices": len(devices),
+            "version": devices.version,
+            "elapsed_ms": round(elapsed_ms, 1)
+        })
+    
+    except Exception as e:
+        logger.error(f"Admin reload error: {e}")
+        return jsonify({"error": "Reload failed"}), 500
+
+
+@routes.route('/metrics')
+def metrics():
+    """Prometheus metrics, summed over all gunicorn workers."""
+    try:
+        return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    except Exception as e:
+        logger.error(f"Error rendering metrics: {e}")
+        return jsonify({"error": "Failed to render metrics"}), 500
+
+
+@routes.app_errorhandler(404)
 def not_found(e):
     """Handle 404 errors."""
     logger.warning(f"404 error: {request.path}")
     return jsonify({"error": "Not found"}), 404
 
 
-@app.errorhandler(500)
+@routes.app_errorhandler(500)
 def internal_error(e):
     """Handle 500 errors."""
     logger.error(f"Internal error: {e}")
     return jsonify({"error": "Internal server error"}), 500
 
 
-# Startup initialization
-try:
-    logger.info("Initializing application...")
+def _load_sources():
+    """
+    Load images, network configs and devices, from the catalogue snapshot
+    when it was built from the current sources.
+    
+    Returns:
+        str: Where the state came from
+    """
+    snapshot = CatalogueSnapshot(
+        Config.SNAPSHOT_FILE,
+        [Config.CSV_DIR, Config.NETWORK_CNF_FILE, Config.IMAGE_FOLDER]
+    )
+    fingerprint = snapshot.fingerprint()
+    state = snapshot.load(fingerprint)
+    
+    if state is not None:
+        _restore_handlers(state)
+        return "snapshot"
+    
     image_handler.scan()
     network_handler.load()
-    get_devices()
-    logger.info("Application initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize application: {e}")
-    raise
+    device_handler.load()
+    snapshot.save(fingerprint, _handler_state())
+    return "sources"
+
+
+def initialize(timings):
+    """
+    Load the catalogue sources: from the shared catalogue when another
+    worker already published them, else from the snapshot or the sources
+    (then published for the other workers).
+    
+    Under gunicorn with preload_app this runs once in the master, and the
+    forked workers share the loaded catalogue pages.
+    
+    Args:
+        timings: Startup phase -> milliseconds, gets 'sources' and 'catalogue'
+    """
+    started = time.perf_counter()
+    if shared_catalogue is not None:
+        with shared_catalogue.building():
+            fingerprints = _source_fingerprints()
+            published = shared_catalogue.read()
+            if published is not None and published['fingerprints'] == fingerprints:
+                _restore_handlers(published['state'])
+                shared_catalogue.adopt(published)
+                source = "shared catalogue"
+            else:
+                source = _load_sources()
+                shared_catalogue.publish(fingerprints, _handler_state())
+    else:
+        source = _load_sources()
+    loaded = time.perf_counter()
+    
+    devices = get_devices()
+    timings['sources'] = (loaded - started) * 1000
+    timings['catalogue'] = (time.perf_counter() - loaded) * 1000
+    logger.info(f"Loaded {len(devices)} devices from {source}")
+
+
+# Module imports, without the PDF renderer and pandas (loaded on first use)
+_IMPORTS_MS = (time.perf_counter() - _imports_started) * 1000
+
+
+def create_app():
+    """
+    Create the Flask app and load the device catalogue.
+    
+    Importing this module only defines the handlers; the catalogue is
+    loaded here. Logs how long each startup phase took, also kept in
+    ``app.extensions['startup_timings']`` (milliseconds).
+    
+    Returns:
+        Flask: The configured application
+    """
+    timings = {'imports': _IMPORTS_MS}
+    started = time.perf_counter()
+    
+    app = Flask(__name__)
+    app.config.from_object(get_config())
+    setup_logging(app)
+    
+    # Sampled cProfile dumps; the middleware is only installed when configured
+    if Config.PROFILE_SAMPLE_EVERY > 0 or Config.PROFILE_SECRET:
+        app.wsgi_app = RequestProfiler(
+            app.wsgi_app,
+            app.url_map,
+            Config.PROFILE_DIR,
+            sample_every=Config.PROFILE_SAMPLE_EVERY,
+            secret=Config.PROFILE_SECRET,
+            max_dumps=Config.PROFILE_MAX_DUMPS,
+            top_n=Config.PROFILE_TOP_N
+        )
+    
+    app.register_blueprint(routes)
+    timings['app'] = (time.perf_counter() - started) * 1000
+    
+    try:
+        logger.info("Initializing application...")
+        initialize(timings)
+        logger.info("Application initialized successfully")
+    except Exception as e:
+        logger.error(f"Failed to initialize application: {e}")
+        raise
+    
+    app.extensions['startup_timings'] = timings
+    logger.info(
+        "Startup took " + ", ".join(f"{phase} {ms:.1f} ms" for phase, ms in timings.items())
+        + f" (total {sum(timings.values()):.1f} ms)"
+    )
+    return app
+
+
+_app = None
+_app_lock = threading.Lock()
+
+
+def __getattr__(name):
+    """Create the app on first access to ``app``, so ``gunicorn app:app`` keeps working."""
+    global _app
+    if name != 'app':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _app_lock:
+        if _app is None:
+            _app = create_app()
+    return _app
 
 
 if __name__ == '__main__':
+    app = create_app()
     logger.info(f"Starting app on {Config.HOST}:{Config.PORT}")
     app.run(debug=Config.DEBUG, host=Config.HOST, port=Config.PORT)
@@ -0,0 +1,168 @@
+"""
+Latency demonstration audio synthesis.
+"""
+import logging
+import struct
+import threading
+from collections import OrderedDict
+from typing import Iterator, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WAV_HEADER_SIZE = 44
+CHANNELS = 2  # Stereo
+SAMPLE_WIDTH = 2  # 16-bit
+FRAME_SIZE = CHANNELS * SAMPLE_WIDTH
+
+
+def wav_header(num_frames: int, sample_rate: int) -> bytes:
+    """
+    Build a canonical 44-byte PCM WAV header.
+
+    Args:
+        num_frames: Number of stereo frames in the data chunk
+        sample_rate: Sample rate in Hz
+
+    Returns:
+        bytes: RIFF/WAVE header
+    """
+    data_size = num_frames * FRAME_SIZE
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, CHANNELS, sample_rate,
+        sample_rate * FRAME_SIZE, FRAME_SIZE, SAMPLE_WIDTH * 8,
+        b'data', data_size
+    )
+
+
+class LatencyAudioRenderer:
+    """
+    Renders stereo WAV previews: left channel beeps at T=0, right channel
+    beeps at T=latency.
+
+    The beep is synthesized once; each preview copies it into an int16
+    frame buffer at both offsets. Rendered files up to ``cache_entry_max_bytes``
+    are kept in an LRU cache keyed by the latency quantized to whole samples;
+    anything larger is only ever generated chunk by chunk.
+    """
+
+    def __init__(self, sample_rate: int, beep_freq: int, beep_duration_ms: int,
+                 cache_size: int = 32, cache_entry_max_bytes: int = 4 * 1024 * 1024,
+                 chunk_frames: int = 8192):
+        self.sample_rate = sample_rate
+        self.cache_size = cache_size
+        self.cache_entry_max_bytes = cache_entry_max_bytes
+        self.chunk_frames = chunk_frames
+        self.beep = self._synthesize_beep(sample_rate, beep_freq, beep_duration_ms)
+        self._cache: 'OrderedDict[int, bytes]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _synthesize_beep(sample_rate: int, beep_freq: int, beep_duration_ms: int) -> np.ndarray:
+        """Sine beep with a linear fade over its last 20%."""
+        beep_samples = int(sample_rate * (beep_duration_ms / 1000.0))
+        i = np.arange(beep_samples, dtype=np.float64)
+        fade = np.where(i <= beep_samples * 0.8, 1.0,
+                        (beep_samples - i) / (beep_samples * 0.2))
+        wave_data = np.sin(2 * np.pi * beep_freq * i / sample_rate) * 16384 * fade
+        return wave_data.astype(np.int16)  # Truncates toward zero like int()
+
+    def latency_samples(self, latency_ms: float) -> int:
+        """Quantize a latency in ms to whole samples."""
+        return int(self.sample_rate * (latency_ms / 1000.0))
+
+    def num_frames(self, latency_samples: int) -> int:
+        """Frames in a preview: one second plus the latency."""
+        return self.sample_rate + latency_samples
+
+    def file_size(self, latency_samples: int) -> int:
+        """Total WAV file size in bytes for a latency."""
+        return WAV_HEADER_SIZE + self.num_frames(latency_samples) * FRAME_SIZE
+
+    def cached(self, latency_samples: int) -> Optional[bytes]:
+        """
+        Get WAV bytes for a latency, rendering them if small enough to cache.
+
+        Args:
+            latency_samples: Latency in whole samples
+
+        Returns:
+            bytes: Complete WAV file, or None if it must be streamed
+        """
+        with self._lock:
+            data = self._cache.get(latency_samples)
+            if data is not None:
+                self._cache.move_to_end(latency_samples)
+                return data
+
+        if self.file_size(latency_samples) > self.cache_entry_max_bytes:
+            return None
+
+        data = b''.join(self.iter_bytes(latency_samples))
+
+        with self._lock:
+            self._cache[latency_samples] = data
+            self._cache.move_to_end(latency_samples)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return data
+
+    def render(self, latency_ms: float) -> bytes:
+        """
+        Get complete WAV file bytes for a latency, from cache when possible.
+
+        Args:
+            latency_ms: Latency in milliseconds (already validated)
+
+        Returns:
+            bytes: Complete WAV file
+        """
+        key = self.latency_samples(latency_ms)
+        data = self.cached(key)
+        return data if data is not None else b''.join(self.iter_bytes(key))
+
+    def _render_chunk(self, latency_samples: int, start: int, stop: int) -> np.ndarray:
+        """Interleaved stereo int16 frames [start, stop) of a preview."""
+        frames = np.zeros((stop - start, CHANNELS), dtype='<i2')
+        beep = self.beep
+
+        for channel, offset in ((0, 0), (1, latency_samples)):
+            lo = max(start, offset)
+            hi = min(stop, offset + len(beep))
+            if lo < hi:
+                frames[lo - start:hi - start, channel] = beep[lo - offset:hi - offset]
+        return frames
+
+    def iter_bytes(self, latency_samples: int, start: int = 0,
+                   end: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Generate a byte range of the WAV file chunk by chunk.
+
+        Args:
+            latency_samples: Latency in whole samples
+            start: First byte offset
+            end: Byte offset to stop at (exclusive), defaults to end of file
+
+        Yields:
+            bytes: Consecutive pieces of the requested range
+        """
+        num_frames = self.num_frames(latency_samples)
+        if end is None:
+            end = self.file_size(latency_samples)
+
+        if start < WAV_HEADER_SIZE:
+            yield wav_header(num_frames, self.sample_rate)[start:end]
+            start = WAV_HEADER_SIZE
+
+        pos = start
+        while pos < end:
+            frame = (pos - WAV_HEADER_SIZE) // FRAME_SIZE
+            stop = min(frame + self.chunk_frames, num_frames)
+            chunk = self._render_chunk(latency_samples, frame, stop).tobytes()
+            chunk_start = WAV_HEADER_SIZE + frame * FRAME_SIZE
+            piece = chunk[pos - chunk_start:end - chunk_start]
+            yield piece
+            pos += len(piece)
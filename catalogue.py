@@ -0,0 +1,349 @@
+"""
+Columnar device catalogue.
+
+Stores parsed device rows column by column instead of one dict per row.
+Repeated strings (names, protocols, sample rates, brands) are pooled so each
+distinct value exists once, and latencies live in a compact ``array('d')``.
+Rows are exposed through lightweight ``__slots__`` views that behave like the
+old device dicts (``row['name']``, ``row.get('raw_data', {})``, attribute
+access from Jinja templates).
+"""
+import copy
+import hashlib
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# Shared default for devices without an entry in the network config file
+DEFAULT_NETWORK_CONFIG = {
+    'interfaces': [{'name': 'IP', 'protocol': '-', 'ip_type': '-'}]
+}
+
+RAW_FIELDS = (
+    'input_type', 'output_type', 'input_sr', 'output_sr',
+    'input_count', 'output_count',
+)
+
+DEVICE_FIELDS = (
+    'id', 'name', 'brand', 'latency', 'display_time', 'image', 'thumb', 'source',
+    'network_config', 'raw_data', 'popularity',
+)
+
+
+class RawDataView:
+    """Read-only view of a row's ``raw_data`` columns."""
+
+    __slots__ = ('_catalogue', '_idx')
+
+    def __init__(self, catalogue: 'DeviceCatalogue', idx: int):
+        self._catalogue = catalogue
+        self._idx = idx
+
+    def __getattr__(self, key: str) -> str:
+        if key in RAW_FIELDS:
+            return self._catalogue.raw_columns[key][self._idx]
+        raise AttributeError(key)
+
+    def __getitem__(self, key: str) -> str:
+        if key not in RAW_FIELDS:
+            raise KeyError(key)
+        return self._catalogue.raw_columns[key][self._idx]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in RAW_FIELDS:
+            return default
+        return self._catalogue.raw_columns[key][self._idx]
+
+    def to_dict(self) -> Dict[str, str]:
+        columns = self._catalogue.raw_columns
+        return {field: columns[field][self._idx] for field in RAW_FIELDS}
+
+
+class DeviceRow:
+    """Read-only view of a single catalogue row, dict-compatible."""
+
+    __slots__ = ('_catalogue', '_idx')
+
+    def __init__(self, catalogue: 'DeviceCatalogue', idx: int):
+        self._catalogue = catalogue
+        self._idx = idx
+
+    @property
+    def id(self) -> int:
+        return self._catalogue.ids[self._idx]
+
+    @property
+    def name(self) -> str:
+        return self._catalogue.names[self._idx]
+
+    @property
+    def brand(self) -> str:
+        return self._catalogue.brands[self._idx]
+
+    @property
+    def latency(self) -> float:
+        return self._catalogue.latency[self._idx]
+
+    @property
+    def display_time(self) -> str:
+        return self._catalogue.display_time[self._idx]
+
+    @property
+    def image(self) -> Optional[str]:
+        return self._catalogue.images[self._idx]
+
+    @property
+    def thumb(self) -> Optional[Dict[str, str]]:
+        return (self._catalogue.thumbnails or {}).get(self.image)
+
+    @property
+    def source(self) -> str:
+        return self._catalogue.sources[self._idx]
+
+    @property
+    def network_config(self) -> Dict[str, Any]:
+        return self._catalogue.network_config_for(self.name)
+
+    @property
+    def popularity(self) -> Optional[int]:
+        popularity = self._catalogue.popularity
+        return None if popularity is None else popularity[self._idx]
+
+    @property
+    def raw_data(self) -> RawDataView:
+        return RawDataView(self._catalogue, self._idx)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in DEVICE_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in DEVICE_FIELDS:
+            return default
+        return getattr(self, key)
+
+    def to_dict(self) -> Dict[str, Any]:
+        device = {
+            'id': self.id,
+            'name': self.name,
+            'brand': self.brand,
+            'latency': self.latency,
+            'display_time': self.display_time,
+            'image': self.image,
+            'thumb': self.thumb,
+            'source': self.source,
+            'network_config': self.network_config,
+            'raw_data': self.raw_data.to_dict(),
+        }
+        if self._catalogue.popularity is not None:
+            device['popularity'] = self.popularity
+        return device
+
+
+class DeviceCatalogue:
+    """Columnar storage for all device rows."""
+
+    def __init__(self, network_configs: Optional[Dict[str, Dict[str, Any]]] = None,
+                 version: str = ''):
+        self.network_configs = network_configs if network_configs is not None else {}
+        self.version = version
+        self.index = None  # DeviceIndex, attached by the loader
+        self.compatibility = None  # CompatibilityIndex, attached by the loader
+        self.solver = None  # ChainSolver, attached by the loader
+        self.popularity: Optional[array] = None  # Event count per row
+        self.popularity_order: Optional[array] = None  # Row positions, most popular first
+        self.thumbnails: Optional[Dict[str, Dict[str, str]]] = None  # image -> variant URLs
+        self.ids = array('q')
+        self.latency = array('d')
+        self.names: List[str] = []
+        self.brands: List[str] = []
+        self.display_time: List[str] = []
+        self.images: List[Optional[str]] = []
+        self.sources: List[str] = []
+        self.raw_columns: Dict[str, List[str]] = {field: [] for field in RAW_FIELDS}
+        self._pool: Dict[str, str] = {}
+        self._positions: Optional[Dict[int, int]] = None
+
+    def _intern(self, value: Optional[str]) -> Optional[str]:
+        """Return the pooled instance of a string value."""
+        if value is None:
+            return None
+        return self._pool.setdefault(value, value)
+
+    def _intern_all(self, values: Iterable[Optional[str]]) -> Iterator[Optional[str]]:
+        """Pooled instances of many values (like _intern, without a call per value)."""
+        pool = self._pool
+        return map(pool.setdefault, values, values)
+
+    def append(self, device: Dict[str, Any]) -> None:
+        """
+        Append a parsed device (as produced by ``_parse_device_row``).
+
+        Args:
+            device: Device dict with the standard device fields
+        """
+        intern = self._intern
+        self.ids.append(device['id'])
+        self.latency.append(device['latency'])
+        self.names.append(intern(device['name']))
+        self.brands.append(intern(device['brand']))
+        self.display_time.append(intern(device['display_time']))
+        self.images.append(intern(device['image']))
+        self.sources.append(intern(device['source']))
+
+        raw = device.get('raw_data', {})
+        for field in RAW_FIELDS:
+            self.raw_columns[field].append(intern(raw.get(field, '')))
+        self._positions = None
+
+    def extend(self, other: 'DeviceCatalogue', start: int = 0,
+               stop: Optional[int] = None) -> None:
+        """
+        Append a slice of rows from another catalogue.
+
+        Args:
+            other: Catalogue to copy rows from
+            start: First row position to copy
+            stop: Row position to stop at (exclusive), defaults to the end
+        """
+        if stop is None:
+            stop = len(other)
+        intern_all = self._intern_all
+        self.ids.extend(other.ids[start:stop])
+        self.latency.extend(other.latency[start:stop])
+        self.names.extend(intern_all(other.names[start:stop]))
+        self.brands.extend(intern_all(other.brands[start:stop]))
+        self.display_time.extend(intern_all(other.display_time[start:stop]))
+        self.images.extend(intern_all(other.images[start:stop]))
+        self.sources.extend(intern_all(other.sources[start:stop]))
+        for field in RAW_FIELDS:
+            self.raw_columns[field].extend(intern_all(other.raw_columns[field][start:stop]))
+        self._positions = None
+
+    def append_columns(self, ids: Iterable[int], columns: Dict[str, List[Any]]) -> None:
+        """
+        Append rows given column-wise, as produced by bulk_loader.
+
+        Args:
+            ids: Device id per row
+            columns: Column name -> values (name, brand, latency, display_time,
+                image, source and the RAW_FIELDS)
+        """
+        intern_all = self._intern_all
+        self.ids.extend(ids)
+        self.latency.extend(columns['latency'])
+        self.names.extend(intern_all(columns['name']))
+        self.brands.extend(intern_all(columns['brand']))
+        self.display_time.extend(intern_all(columns['display_time']))
+        self.images.extend(intern_all(columns['image']))
+        self.sources.extend(intern_all(columns['source']))
+        for field in RAW_FIELDS:
+            self.raw_columns[field].extend(intern_all(columns[field]))
+        self._positions = None
+
+    def with_popularity(self, counts: Dict[str, int]) -> 'DeviceCatalogue':
+        """
+        Get a copy ranked by popularity, sharing all columns with this one.
+
+        The copy's version is this version plus a digest of the ranking, so
+        it changes when the order of devices by popularity changes, not on
+        every new event. The counts only serve to rank devices.
+
+        Args:
+            counts: Device name -> event count
+
+        Returns:
+            DeviceCatalogue with a popularity column and sort order
+        """
+        ranked = copy.copy(self)
+        popularity = array('q', (counts.get(name, 0) for name in self.names))
+        # Devices without events keep their catalogue order after the others
+        popular = array('l', sorted((pos for pos, count in enumerate(popularity) if count),
+                                    key=lambda pos: (-popularity[pos], pos)))
+        ranking = hashlib.blake2b(popular.tobytes(), digest_size=8).hexdigest()
+        ranked.version = f"{self.version}.{ranking}"
+        ranked.popularity = popularity
+        ranked.popularity_order = popular + array('l', (pos for pos, count in enumerate(popularity)
+                                                         if not count))
+        if self.index is not None:
+            ranked.index = self.index.with_popularity(ranked)
+        return ranked
+
+    def network_config_for(self, name: str) -> Dict[str, Any]:
+        """Get network config for a device name, shared rather than copied."""
+        return self.network_configs.get(name, DEFAULT_NETWORK_CONFIG)
+
+    def position_of(self, device_id: int) -> Optional[int]:
+        """
+        Get row position for a device id.
+
+        Args:
+            device_id: Device id
+
+        Returns:
+            int: Row position, or None if the id is unknown
+        """
+        if self._positions is None:
+            self._positions = {device_id: pos for pos, device_id in enumerate(self.ids)}
+        return self._positions.get(device_id)
+
+    def get_by_id(self, device_id: int) -> Optional[DeviceRow]:
+        """Get the row view for a device id, or None."""
+        pos = self.position_of(device_id)
+        return None if pos is None else DeviceRow(self, pos)
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """
+        Materialize all rows as plain dicts for JSON serialization.
+
+        Returns:
+            List of device dictionaries
+        """
+        raw = self.raw_columns
+        raw_rows = zip(*(raw[field] for field in RAW_FIELDS))
+        config_for = self.network_config_for
+        thumbs = self.thumbnails or {}
+        if self.popularity is not None:
+            return [
+                dict(device, popularity=popularity)
+                for device, popularity in zip(self._base_list(raw_rows, config_for, thumbs), self.popularity)
+            ]
+        return self._base_list(raw_rows, config_for, thumbs)
+
+    def _base_list(self, raw_rows, config_for, thumbs) -> List[Dict[str, Any]]:
+        """Device dicts without the popularity field."""
+        return [
+            {
+                'id': device_id,
+                'name': name,
+                'brand': brand,
+                'latency': latency,
+                'display_time': display_time,
+                'image': image,
+                'thumb': thumbs.get(image),
+                'source': source,
+                'network_config': config_for(name),
+                'raw_data': dict(zip(RAW_FIELDS, raw_values)),
+            }
+            for device_id, name, brand, latency, display_time, image, source, raw_values in zip(
+                self.ids, self.names, self.brands, self.latency,
+                self.display_time, self.images, self.sources, raw_rows
+            )
+        ]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __bool__(self) -> bool:
+        return len(self.ids) > 0
+
+    def __iter__(self) -> Iterator[DeviceRow]:
+        for idx in range(len(self.ids)):
+            yield DeviceRow(self, idx)
+
+    def __getitem__(self, idx: int) -> DeviceRow:
+        if idx < 0:
+            idx += len(self.ids)
+        if not 0 <= idx < len(self.ids):
+            raise IndexError('catalogue index out of range')
+        return DeviceRow(self, idx)
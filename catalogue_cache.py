@@ -0,0 +1,107 @@
+"""
+Stale-while-revalidate cache for the published device catalogue.
+
+Requests read whatever catalogue is currently published. When it is older
+than the TTL, the first reader to notice starts one background refresh and
+every reader keeps getting the current catalogue until the new one is
+swapped in with a single assignment. Catalogues are never modified once
+published, so a reader cannot see a half-built one.
+"""
+import time
+import logging
+import threading
+from typing import Callable, Optional
+
+from catalogue import DeviceCatalogue
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogueCache:
+    """
+    Holds the current catalogue and coalesces refreshes.
+
+    Args:
+        build: Called with the current catalogue (None on the first build)
+            and any refresh() options, returns the catalogue to publish.
+            May return the current one unchanged. Only ever runs in one
+            thread at a time.
+        ttl: Seconds before a published catalogue is refreshed. With
+            ttl <= 0 every read refreshes synchronously (tests).
+        is_stale: Optional cheap check run on every read; True starts a
+            background refresh before the TTL is up
+    """
+
+    def __init__(self, build: Callable[..., DeviceCatalogue], ttl: float,
+                 is_stale: Optional[Callable[[], bool]] = None):
+        self.build = build
+        self.ttl = ttl
+        self.is_stale = is_stale
+        self._current: Optional[DeviceCatalogue] = None
+        self._refreshed = 0.0  # time.monotonic() of the last refresh attempt
+        self._started = 0  # builds started
+        self._build_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self) -> DeviceCatalogue:
+        """
+        Get the published catalogue, starting a background refresh if stale.
+
+        Only the first call (before anything is published) builds on the
+        caller's thread.
+        """
+        current = self._current
+        if current is None or self.ttl <= 0:
+            return self.refresh()
+        if time.monotonic() - self._refreshed >= self.ttl or (self.is_stale and self.is_stale()):
+            self._start_refresh()
+        return current
+
+    def refresh(self, **options) -> DeviceCatalogue:
+        """
+        Build and publish a catalogue now.
+
+        Callers that arrive while another refresh is running wait for it.
+        Without options they share the result of a build that started after
+        their call instead of building again.
+
+        Args:
+            options: Passed to build, e.g. which sources to reload; they run
+                under the same lock, so never race a concurrent build
+
+        Returns:
+            DeviceCatalogue: The published catalogue, or an empty one if
+            nothing could ever be built
+        """
+        requested = self._started
+        with self._build_lock:
+            if not options and self._started > requested and self._current is not None:
+                return self._current  # A build that started after this call has published
+            self._started += 1
+            try:
+                self._current = self.build(self._current, **options)
+            except Exception as e:
+                logger.error(f"Error loading devices: {e}")
+            finally:
+                self._refreshed = time.monotonic()  # Failed builds also wait a TTL
+            return self._current if self._current is not None else DeviceCatalogue()
+
+    def _start_refresh(self) -> None:
+        """Start a background refresh unless one is already running."""
+        with self._state_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        try:
+            threading.Thread(target=self._background_refresh, name='catalogue-refresh',
+                             daemon=True).start()
+        except RuntimeError as e:  # Interpreter shutting down
+            logger.warning(f"Could not start catalogue refresh: {e}")
+            self._refreshing = False
+
+    def _background_refresh(self) -> None:
+        try:
+            self.refresh()
+        finally:
+            self._refreshing = False
@@ -0,0 +1,425 @@
+"""
+Signal chain search and evaluation over the device catalogue.
+
+Each catalogue row (a device in one mode) is an edge from the
+(input protocol, input SR) it accepts to the (output protocol, output SR)
+it produces, weighted by its latency. The solver runs a best-first search
+over these states to find the lowest-latency chains.
+"""
+import heapq
+import itertools
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from catalogue import DeviceCatalogue
+from device_index import SR_WILDCARD, is_compatible
+
+State = Tuple[str, str]  # (protocol, sample rate) of the signal
+
+
+class ChainSolver:
+    """
+    k-best lowest-latency chain search.
+
+    Rows are pre-grouped by input key and output state and sorted by
+    latency, so expanding a state only looks at the few cheapest rows per
+    transition instead of every compatible row. The search is A*: labels are
+    ordered by latency so far plus a lower bound on the latency still needed,
+    which also prunes states that cannot reach a target within the budget.
+    """
+
+    TARGET_FIELDS = ('brand', 'device', 'input_type', 'input_sr', 'output_type', 'output_sr')
+
+    def __init__(self, catalogue: DeviceCatalogue):
+        self.catalogue = catalogue
+        raw = catalogue.raw_columns
+        latency = catalogue.latency
+
+        groups: Dict[State, Dict[State, List[int]]] = {}
+        self.input_key_of = []
+        self.output_state_of = []
+        for pos, (in_type, in_sr, out_type, out_sr) in enumerate(zip(
+                raw['input_type'], raw['input_sr'], raw['output_type'], raw['output_sr'])):
+            in_key, out_state = (in_type, in_sr), (out_type, out_sr)
+            self.input_key_of.append(in_key)
+            self.output_state_of.append(out_state)
+            groups.setdefault(in_key, {}).setdefault(out_state, []).append(pos)
+
+        # input key -> [(output state, row positions sorted by latency)]
+        self.groups: Dict[State, List[Tuple[State, array]]] = {
+            in_key: [
+                (out_state, array('l', sorted(positions, key=lambda p: (latency[p], p))))
+                for out_state, positions in by_output.items()
+            ]
+            for in_key, by_output in groups.items()
+        }
+
+        self.keys_by_type: Dict[str, List[State]] = {}
+        for in_key in self.groups:
+            self.keys_by_type.setdefault(in_key[0], []).append(in_key)
+
+        self.brand_keys = [brand.casefold() for brand in catalogue.brands]
+        self.positions_by_name: Dict[str, List[int]] = {}
+        for pos, name in enumerate(catalogue.names):
+            self.positions_by_name.setdefault(name.casefold(), []).append(pos)
+
+        self._keys_cache: Dict[State, List[State]] = {}
+
+        # Reverse state graph weighted by the cheapest row per transition,
+        # used for the remaining-latency lower bound
+        self.states = set(self.output_state_of)
+        self.predecessors: Dict[State, List[Tuple[State, float]]] = {}
+        for state in self.states:
+            for next_state, weight in self._transitions(state).items():
+                self.predecessors.setdefault(next_state, []).append((state, weight))
+
+    def _transitions(self, state: State) -> Dict[State, float]:
+        """Cheapest row latency from a state to each state reachable in one hop."""
+        transitions: Dict[State, float] = {}
+        latency = self.catalogue.latency
+        for in_key in self.input_keys(state):
+            for out_state, positions in self.groups[in_key]:
+                weight = latency[positions[0]]
+                if out_state != state and weight < transitions.get(out_state, float('inf')):
+                    transitions[out_state] = weight
+        return transitions
+
+    def input_keys(self, state: State) -> List[State]:
+        """Input keys of rows that may follow a signal state."""
+        keys = self._keys_cache.get(state)
+        if keys is None:
+            out_type, out_sr = state
+            untyped = self.keys_by_type.get('', [])
+            if not out_type:
+                keys = list(self.groups)
+            elif out_sr == SR_WILDCARD:
+                keys = self.keys_by_type.get(out_type, []) + untyped
+            else:
+                keys = [key for key in ((out_type, out_sr), (out_type, SR_WILDCARD))
+                        if key in self.groups] + untyped
+            self._keys_cache[state] = keys
+        return keys
+
+    def _target_rows(self, target: Dict[str, str]) -> Set[int]:
+        """Rows satisfying every given target field."""
+        fields = {key: str(value).strip() for key, value in target.items()
+                  if key in self.TARGET_FIELDS and value not in (None, '')}
+        if not fields:
+            raise ValueError("Target needs at least one of: " + ', '.join(self.TARGET_FIELDS))
+
+        index = self.catalogue.index
+        sets: List[Set[int]] = []
+        for key, value in fields.items():
+            if key == 'device':
+                sets.append(set(self.positions_by_name.get(value.casefold(), ())))
+            elif index is not None:
+                sets.append(index.match_attribute(key, value))
+            else:
+                column = self.catalogue.brands if key == 'brand' else self.catalogue.raw_columns[key]
+                sets.append({pos for pos, v in enumerate(column) if v.casefold() == value.casefold()})
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+
+    def solve(self, source: Optional[Dict[str, str]], target: Dict[str, str], k: int = 3,
+              required_devices: Sequence[str] = (), exclude_brands: Iterable[str] = (),
+              max_hops: int = 6, latency_budget: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Find the k lowest-latency chains from a source signal to a target device.
+
+        Args:
+            source: {'protocol': ..., 'sr': ...} of the incoming signal; empty
+                protocol means the first device may be anything
+            target: Fields the last device must match (brand, device,
+                input_type, input_sr, output_type, output_sr)
+            k: Number of chains to return
+            required_devices: Device names that must appear in every chain
+            exclude_brands: Brands that may not be used
+            max_hops: Maximum number of devices in a chain
+            latency_budget: Maximum total latency in ms
+
+        Returns:
+            List of {'total_latency', 'hops', 'positions'} dicts, best first
+        """
+        source = source or {}
+        start: State = (str(source.get('protocol', '') or '').strip(),
+                        str(source.get('sr', '') or SR_WILDCARD).strip())
+
+        latency = self.catalogue.latency
+        brands = self.brand_keys
+        excluded = {brand.casefold() for brand in exclude_brands}
+        budget = float('inf') if latency_budget is None else latency_budget
+
+        targets = {pos for pos in self._target_rows(target) if brands[pos] not in excluded}
+        targets_by_key: Dict[State, List[int]] = {}
+        for pos in sorted(targets, key=lambda p: (latency[p], p)):
+            targets_by_key.setdefault(self.input_key_of[pos], []).append(pos)
+
+        # Required devices are tracked as bits of a mask
+        names = list(dict.fromkeys(name.casefold() for name in required_devices))
+        full_mask = (1 << len(names)) - 1
+        required_bits: Dict[int, int] = {}
+        required_by_key: Dict[State, List[int]] = {}
+        for bit, name in enumerate(names):
+            positions = self.positions_by_name.get(name)
+            if not positions:
+                raise ValueError(f"Unknown required device: {name}")
+            for pos in positions:
+                if brands[pos] in excluded:
+                    continue
+                required_bits[pos] = required_bits.get(pos, 0) | (1 << bit)
+                required_by_key.setdefault(self.input_key_of[pos], []).append(pos)
+
+        remaining = self._lower_bounds(start, targets_by_key)
+        if start not in remaining or remaining[start] > budget:
+            return []  # No target reachable within the budget
+
+        def revisits(path, pos, state, mask) -> bool:
+            """True if pos is already used, or the chain returns to a state
+            it was in before without picking up a required device."""
+            while path is not None:
+                if path[0] == pos or (path[1] == mask and self.output_state_of[path[0]] == state):
+                    return True
+                path = path[2]
+            return state == start and mask == 0
+
+        counter = itertools.count()
+        # (cost + lower bound, hops, tiebreak, is_goal, cost, state, mask,
+        #  path as (pos, mask, parent) links)
+        heap = [(remaining[start], 0, next(counter), False, 0.0, start, 0, None)]
+        popped: Dict[Tuple[State, int], List[int]] = {}  # pops per hop count
+        results: List[Dict[str, Any]] = []
+
+        def push(pos: int, cost: float, hops: int, state: State, mask: int, path, is_goal: bool) -> bool:
+            """Queue a label unless it cannot finish within the budget."""
+            bound = cost if is_goal else cost + remaining.get(state, float('inf'))
+            if bound > budget:
+                return False
+            heapq.heappush(heap, (bound, hops, next(counter), is_goal, cost, state, mask, (pos, mask, path)))
+            return True
+
+        while heap and len(results) < k:
+            _, hops, _, is_goal, cost, state, mask, path = heapq.heappop(heap)
+
+            if is_goal:
+                positions = []
+                while path is not None:
+                    positions.append(path[0])
+                    path = path[2]
+                positions.reverse()
+                results.append({'total_latency': cost, 'hops': hops, 'positions': positions})
+                continue
+
+            # A node popped k times with no more hops dominates this label
+            counts = popped.setdefault((state, mask), [0] * (max_hops + 1))
+            if sum(counts[:hops + 1]) >= k:
+                continue
+            counts[hops] += 1
+
+            for in_key in self.input_keys(state):
+                # Chains ending at a target device
+                taken = 0
+                for pos in targets_by_key.get(in_key, ()):
+                    if taken >= k:
+                        break
+                    if (mask | required_bits.get(pos, 0) == full_mask
+                            and not revisits(path, pos, None, -1)):
+                        if not push(pos, cost + latency[pos], hops + 1,
+                                    self.output_state_of[pos], full_mask, path, True):
+                            break
+                        taken += 1
+
+                if hops + 1 >= max_hops:
+                    continue
+
+                # Required devices are always considered
+                for pos in required_by_key.get(in_key, ()):
+                    new_mask = mask | required_bits[pos]
+                    out_state = self.output_state_of[pos]
+                    if not revisits(path, pos, out_state, new_mask):
+                        push(pos, cost + latency[pos], hops + 1, out_state, new_mask, path, False)
+
+                # Otherwise only the k cheapest rows per transition
+                for out_state, positions in self.groups[in_key]:
+                    if out_state == state or out_state not in remaining:
+                        continue  # Pass-through, or no target reachable from there
+                    taken = 0
+                    for pos in positions:
+                        if pos in required_bits or brands[pos] in excluded or revisits(path, pos, out_state, mask):
+                            continue
+                        if not push(pos, cost + latency[pos], hops + 1, out_state, mask, path, False):
+                            break
+                        taken += 1
+                        if taken >= k:
+                            break
+
+        return results
+
+    def _lower_bounds(self, start: State, targets_by_key: Dict[State, List[int]]) -> Dict[State, float]:
+        """
+        Lower bound of the latency still needed to reach a target from each
+        state, by Dijkstra backwards over the cheapest transitions. States
+        that cannot reach a target are left out.
+        """
+        latency = self.catalogue.latency
+        target_min = {key: latency[positions[0]] for key, positions in targets_by_key.items()}
+
+        def finish(state: State) -> float:
+            return min((target_min[key] for key in self.input_keys(state) if key in target_min),
+                       default=float('inf'))
+
+        remaining: Dict[State, float] = {}
+        heap = [(cost, state) for state in self.states if (cost := finish(state)) < float('inf')]
+        heapq.heapify(heap)
+        while heap:
+            cost, state = heapq.heappop(heap)
+            if state in remaining:
+                continue
+            remaining[state] = cost
+            for previous, weight in self.predecessors.get(state, ()):
+                if previous not in remaining:
+                    heapq.heappush(heap, (cost + weight, previous))
+
+        if start not in self.states:
+            best = finish(start)
+            for next_state, weight in self._transitions(start).items():
+                best = min(best, weight + remaining.get(next_state, float('inf')))
+            if best < float('inf'):
+                remaining[start] = best
+        return remaining
+
+
+class ChainEvaluator:
+    """
+    Server-side latency totals and connection checks for chain trees as
+    built in the browser: lists of device nodes and split nodes, where a
+    split has ``branches``, optional ``branchNames`` and ``portSelections``.
+
+    Totals follow getAllPathTotals() in script.js: every device at a level
+    adds to all paths through that level, and each split branch becomes its
+    own path. Edges are checked with the same context as the chain builder,
+    i.e. the previous device at the same or an outer level, or a branch's
+    selected port.
+
+    A device node saved by the browser carries its own copy of the device
+    (name, latency, raw_data) next to its id. If the id now belongs to a
+    different row, e.g. after the CSVs changed, the node is stale: it is
+    evaluated from its own copy, the one the browser shows and the PDF
+    draws, and reported in ``stale``.
+    """
+
+    # Node fields that must match the catalogue row for an id to be trusted
+    IDENTITY_FIELDS = ('input_type', 'input_sr', 'output_type', 'output_sr')
+
+    def __init__(self, catalogue: DeviceCatalogue):
+        self.catalogue = catalogue
+
+    def _resolve(self, node: Any, stale: List[Dict[str, Any]]) -> Tuple[str, float, str, str, str, str]:
+        """
+        Get (name, latency, input type, input SR, output type, output SR) for a device node.
+
+        Args:
+            node: Device node or bare device id
+            stale: Nodes whose id no longer matches their own data are appended here
+        """
+        if not isinstance(node, (int, dict)):
+            raise ValueError(f"Invalid chain node: {node!r}")
+        device_id = node if isinstance(node, int) else node.get('id')
+        if device_id is not None:
+            row = self.catalogue.get_by_id(int(device_id))
+            if row is not None and self._matches(row, node):
+                raw = row.raw_data
+                return row.name, row.latency, raw.input_type, raw.input_sr, raw.output_type, raw.output_sr
+            if not isinstance(node, dict) or 'name' not in node or 'latency' not in node:
+                if row is None:
+                    raise ValueError(f"Unknown device id: {device_id}")
+                raise ValueError(f"Device id {device_id} no longer matches {node.get('name')!r}")
+            stale.append({'id': device_id, 'name': str(node['name'])})
+
+        # Stale nodes, and chains saved before devices had stable ids
+        raw = node.get('raw_data') or {}
+        return (str(node.get('name', '')), float(node.get('latency', 0)),
+                raw.get('input_type', ''), raw.get('input_sr', '-'),
+                raw.get('output_type', ''), raw.get('output_sr', '-'))
+
+    def _matches(self, row: Any, node: Any) -> bool:
+        """Whether a catalogue row is the device a node was saved from."""
+        if not isinstance(node, dict):
+            return True  # A bare id has nothing to check against
+        if 'name' in node and str(node['name']).strip() != row.name:
+            return False
+        raw = node.get('raw_data')
+        if isinstance(raw, dict):
+            row_raw = row.raw_data
+            for field in self.IDENTITY_FIELDS:
+                if field in raw and str(raw[field]).strip() != row_raw[field]:
+                    return False
+        return True
+
+    def evaluate(self, nodes: List[Any]) -> Dict[str, Any]:
+        """
+        Evaluate one chain tree.
+
+        Args:
+            nodes: Chain nodes; a device node may also be given as a bare id
+
+        Returns:
+            dict: paths ([{label, latency}]), total_latency (slowest path),
+            valid, errors ([{from, to, reason}]) and stale ([{id, name}],
+            nodes evaluated from their own data)
+
+        Raises:
+            ValueError: A node is malformed, or its id is unknown or stale
+                and the node has no name and latency of its own
+        """
+        if not isinstance(nodes, list):
+            raise ValueError("Chain must be a list of nodes")
+        errors: List[Dict[str, str]] = []
+        stale: List[Dict[str, Any]] = []
+        paths = self._walk(nodes, None, errors, stale)
+        return {
+            'paths': [{'label': label, 'latency': round(latency, 3)} for label, latency in paths],
+            'total_latency': round(max(latency for _, latency in paths), 3),
+            'valid': not errors,
+            'errors': errors,
+            'stale': stale,
+        }
+
+    def _walk(self, nodes: List[Any], context: Optional[Tuple[str, str, str]],
+              errors: List[Dict[str, str]], stale: List[Dict[str, Any]]) -> List[Tuple[str, float]]:
+        """
+        Path totals for one level of the tree.
+
+        Args:
+            nodes: Nodes at this level
+            context: (name, output type, output SR) feeding the first node
+            errors: Connection errors are appended here
+            stale: Stale device nodes are appended here
+        """
+        common = 0.0
+        splits: List[Tuple[str, float]] = []
+        for node in nodes:
+            if isinstance(node, dict) and node.get('type') == 'split':
+                branches = node.get('branches') or []
+                names = node.get('branchNames') or {}
+                ports = node.get('portSelections') or {}
+                for idx, branch in enumerate(branches):
+                    branch_name = names.get(str(idx)) or names.get(idx) or f"Path {chr(65 + idx)}"
+                    port = ports.get(str(idx)) or ports.get(idx)
+                    branch_context = context
+                    if port and context is not None:
+                        branch_context = (context[0], port.get('type', ''), port.get('sr', '-'))
+                    for label, latency in self._walk(branch, branch_context, errors, stale):
+                        splits.append((f"{branch_name} ➔ {label}" if label else branch_name, latency))
+                continue
+
+            name, latency, in_type, in_sr, out_type, out_sr = self._resolve(node, stale)
+            if context is not None:
+                ok, reason = is_compatible(context[1], context[2], in_type, in_sr)
+                if not ok:
+                    errors.append({'from': context[0], 'to': name, 'reason': reason})
+            context = (name, out_type, out_sr)
+            common += latency
+
+        if not splits:
+            return [('', common)]
+        return [(label, common + latency) for label, latency in splits]
@@ -20,15 +20,63 @@ class Config:
     NETWORK_CNF_FILE = os.getenv('NETWORK_CNF_FILE', 'device_network_cnf.csv')
     TRAFFIC_LOG_FILE = os.getenv('TRAFFIC_LOG_FILE', 'traffic_log.csv')
     SOURCES_CSV_FILE = os.getenv('SOURCES_CSV_FILE', 'sources.csv')
+    CSV_LOADER = os.getenv('CSV_LOADER', 'pandas')  # 'pandas' (vectorized) or 'csv'
     
     # Image folder
     IMAGE_FOLDER = os.getenv('IMAGE_FOLDER', None)
     if IMAGE_FOLDER is None:
         IMAGE_FOLDER = 'images' if os.path.exists(os.path.join(BASE_DIR, 'images')) else os.path.join('static', 'images')
+    IMAGE_FUZZY_THRESHOLD = float(os.getenv('IMAGE_FUZZY_THRESHOLD', '0.75'))  # 0 disables
+    THUMBNAIL_CACHE_DIR = os.getenv('THUMBNAIL_CACHE_DIR', 'thumbnail_cache')
+    THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', '80'))  # WebP quality
+    THUMBNAIL_MAX_AGE = int(os.getenv('THUMBNAIL_MAX_AGE', '31536000'))  # seconds
+    
+    # Traffic log batching
+    TRAFFIC_FLUSH_INTERVAL = float(os.getenv('TRAFFIC_FLUSH_INTERVAL', '1.0'))  # seconds
+    TRAFFIC_BATCH_SIZE = int(os.getenv('TRAFFIC_BATCH_SIZE', '100'))  # events per early flush
+    TRAFFIC_BUFFER_SIZE = int(os.getenv('TRAFFIC_BUFFER_SIZE', '10000'))  # max pending events
+    
+    # Popularity aggregation
+    POPULARITY_CHECKPOINT_FILE = os.getenv('POPULARITY_CHECKPOINT_FILE', 'popularity_checkpoint.json')
+    TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS', '72'))
+    
+    # Compiled catalogue snapshot (empty to disable)
+    SNAPSHOT_FILE = os.getenv('SNAPSHOT_FILE', 'catalogue.snapshot')
+    
+    # Directory through which gunicorn workers share one catalogue build
+    # (empty: each process builds its own; gunicorn.conf.py creates one)
+    SHARED_CATALOGUE_DIR = os.getenv('SHARED_CATALOGUE_DIR', '')
+    
+    # Prometheus metrics: directory for per-worker value files (empty: a
+    # temporary directory created at startup, shared by preloaded workers)
+    METRICS_DIR = os.getenv('METRICS_DIR', '')
+    
+    # Request profiling: cProfile every Nth request and/or requests sending
+    # the secret in an X-Profile-Token header (both off by default)
+    PROFILE_SAMPLE_EVERY = int(os.getenv('PROFILE_SAMPLE_EVERY', '0'))  # 0 = never
+    PROFILE_SECRET = os.getenv('PROFILE_SECRET', '')
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_MAX_DUMPS = int(os.getenv('PROFILE_MAX_DUMPS', '50'))  # oldest removed first
+    PROFILE_TOP_N = int(os.getenv('PROFILE_TOP_N', '30'))  # functions in each summary
+    
+    # Reload catalogue sources (device CSVs, network config, images) when
+    # they change on disk: inotify where available, polling otherwise
+    WATCH_FILES = os.getenv('WATCH_FILES', 'True').lower() == 'true'
+    WATCH_DEBOUNCE = float(os.getenv('WATCH_DEBOUNCE', '0.5'))  # quiet seconds before reloading
+    WATCH_POLL_INTERVAL = float(os.getenv('WATCH_POLL_INTERVAL', '2'))  # seconds, without inotify
+    
+    # Admin API bearer token (empty disables /api/admin/*)
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
     
     # Cache settings
     CACHE_TTL = int(os.getenv('CACHE_TTL', '60'))  # seconds
     
+    # API settings
+    API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', '500'))
+    SOLVER_MAX_K = int(os.getenv('SOLVER_MAX_K', '10'))
+    SOLVER_MAX_HOPS = int(os.getenv('SOLVER_MAX_HOPS', '8'))
+    EVALUATE_MAX_CHAINS = int(os.getenv('EVALUATE_MAX_CHAINS', '500'))
+    
     # Server settings
     PORT = int(os.getenv('PORT', '5000'))
     HOST = os.getenv('HOST', '0.0.0.0')
@@ -38,6 +86,24 @@ class Config:
     AUDIO_SAMPLE_RATE = int(os.getenv('AUDIO_SAMPLE_RATE', '44100'))
     AUDIO_BEEP_FREQ = int(os.getenv('AUDIO_BEEP_FREQ', '1000'))
     AUDIO_BEEP_DURATION_MS = int(os.getenv('AUDIO_BEEP_DURATION_MS', '100'))
+    AUDIO_CACHE_SIZE = int(os.getenv('AUDIO_CACHE_SIZE', '32'))  # rendered previews kept
+    AUDIO_CACHE_ENTRY_MAX_BYTES = int(os.getenv('AUDIO_CACHE_ENTRY_MAX_BYTES', str(4 * 1024 * 1024)))
+    AUDIO_STREAM_CHUNK_FRAMES = int(os.getenv('AUDIO_STREAM_CHUNK_FRAMES', '8192'))
+    
+    # PDF export settings
+    PDF_IMAGE_CACHE_SIZE = int(os.getenv('PDF_IMAGE_CACHE_SIZE', '128'))  # decoded images kept
+    PDF_IMAGE_MAX_PX = int(os.getenv('PDF_IMAGE_MAX_PX', '256'))  # node image resolution
+    PDF_POOL_SIZE = int(os.getenv('PDF_POOL_SIZE', '1'))  # render processes, 0 = inline
+    PDF_QUEUE_DEPTH = int(os.getenv('PDF_QUEUE_DEPTH', '2'))  # jobs waiting beyond running ones
+    # Exports admitted at once per request worker, 0 = pool size plus queue
+    # depth; gunicorn.conf.py keeps it below the worker's request threads
+    PDF_MAX_EXPORTS = int(os.getenv('PDF_MAX_EXPORTS', '0'))
+    PDF_TIMEOUT = float(os.getenv('PDF_TIMEOUT', '30'))  # seconds an export may go without output
+    PDF_RETRY_AFTER = int(os.getenv('PDF_RETRY_AFTER', '5'))  # seconds, sent when saturated
+    PDF_POOL_START_METHOD = os.getenv('PDF_POOL_START_METHOD', 'spawn')
+    # Import the PDF renderer in the background once a worker has started,
+    # instead of on its first export
+    PREWARM_IMPORTS = os.getenv('PREWARM_IMPORTS', 'False').lower() == 'true'
     
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
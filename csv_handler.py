@@ -2,14 +2,53 @@
 CSV handling module for device data, network config, and tracking.
 """
 import os
+import io
 import csv
+import time
+import atexit
+import hashlib
 import logging
+import threading
+from collections import deque
+from itertools import repeat
 from typing import List, Dict, Optional, Any
-from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks
+    fcntl = None
+import bulk_loader
 from utils import normalize_name, parse_time, extract_brand, safe_parse_csv_row
+from catalogue import DeviceCatalogue
+from device_index import DeviceIndex, CompatibilityIndex
+from chains import ChainSolver
+from popularity import PopularityTracker
+from metrics import TRAFFIC_EVENTS_DROPPED, TRAFFIC_EVENTS_WRITTEN
 
 logger = logging.getLogger(__name__)
 
+# Device ids fit in 53 bits so they survive as JSON numbers in the browser
+DEVICE_ID_MASK = (1 << 53) - 1
+
+
+def device_id(key: tuple) -> int:
+    """
+    Stable device id for a row identity.
+
+    The id is derived from the identity alone, so it does not depend on
+    load order, on other rows or files, or on any saved state.
+
+    Args:
+        key: (filename, name, input type, output type, input sr, output sr,
+            occurrence of identical rows in the file)
+
+    Returns:
+        int: Positive id below 2**53
+    """
+    text = '\0'.join(map(str, key)).encode('utf-8')
+    value = int.from_bytes(hashlib.blake2b(text, digest_size=8).digest(), 'big') & DEVICE_ID_MASK
+    return value or 1
+
 
 class CSVHandler:
     """Handles CSV file operations."""
@@ -34,25 +73,54 @@ class CSVHandler:
         
         try:
             with open(filepath, mode='r', encoding=encoding) as f:
-                reader = csv.DictReader(f)
-                if reader.fieldnames is None:
-                    logger.error(f"CSV file is empty or has no header: {filepath}")
-                    return data
-                
-                for idx, row in enumerate(reader, 1):
-                    try:
-                        if not any(row.values()):  # Skip empty rows
-                            continue
-                        data.append(row)
-                    except Exception as e:
-                        logger.warning(f"Error parsing row {idx} in {filepath}: {e}")
-                        continue
+                data = CSVHandler._read_rows(f, filepath)
         
         except Exception as e:
             logger.error(f"Error reading CSV file {filepath}: {e}")
         
         return data
     
+    @staticmethod
+    def parse_csv_bytes(content: bytes, source: str = '<bytes>',
+                        encoding: str = 'utf-8') -> List[Dict[str, str]]:
+        """
+        Parse CSV content that has already been read into memory.
+        
+        Args:
+            content: Raw file content
+            source: Name used in log messages
+            encoding: File encoding
+            
+        Returns:
+            List of dictionaries representing rows
+        """
+        try:
+            with io.TextIOWrapper(io.BytesIO(content), encoding=encoding) as f:
+                return CSVHandler._read_rows(f, source)
+        except Exception as e:
+            logger.error(f"Error reading CSV content {source}: {e}")
+            return []
+    
+    @staticmethod
+    def _read_rows(f, source: str) -> List[Dict[str, str]]:
+        """Read non-empty rows from an open CSV text stream."""
+        data = []
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None:
+            logger.error(f"CSV file is empty or has no header: {source}")
+            return data
+        
+        for idx, row in enumerate(reader, 1):
+            try:
+                if not any(row.values()):  # Skip empty rows
+                    continue
+                data.append(row)
+            except Exception as e:
+                logger.warning(f"Error parsing row {idx} in {source}: {e}")
+                continue
+        
+        return data
+    
     @staticmethod
     def append_csv_row(filepath: str, fieldnames: List[str], row_data: Dict[str, Any],
                        encoding: str = 'utf-8') -> bool:
@@ -92,14 +160,15 @@ class NetworkConfigHandler:
     def __init__(self, config_file: str):
         self.config_file = config_file
         self.configs: Dict[str, Dict[str, Any]] = {}
-        self.load()
+        self.version = ''
     
     def load(self) -> None:
         """Load network configurations from CSV."""
-        self.configs = {}
+        configs: Dict[str, Dict[str, Any]] = {}
         
         if not os.path.exists(self.config_file):
             logger.debug(f"Network config file not found: {self.config_file}")
+            self.configs, self.version = configs, ''
             return
         
         try:
@@ -110,19 +179,33 @@ class NetworkConfigHandler:
                 if not device_name:
                     continue
                 
-                if device_name not in self.configs:
-                    self.configs[device_name] = {'interfaces': []}
+                if device_name not in configs:
+                    configs[device_name] = {'interfaces': []}
                 
-                self.configs[device_name]['interfaces'].append({
+                configs[device_name]['interfaces'].append({
                     'name': row.get('interface_name', 'IP'),
                     'protocol': row.get('protocol', '-'),
                     'ip_type': row.get('ip_type', '-')
                 })
             
-            logger.info(f"Loaded network config for {len(self.configs)} devices")
+            logger.info(f"Loaded network config for {len(configs)} devices")
         
         except Exception as e:
             logger.error(f"Error parsing network config: {e}")
+        
+        self.configs = configs
+        self.version = hashlib.blake2b(
+            repr(sorted(configs.items())).encode('utf-8'), digest_size=16
+        ).hexdigest()
+    
+    def export_state(self) -> Dict[str, Any]:
+        """Loaded configs for the catalogue snapshot."""
+        return {'configs': self.configs, 'version': self.version}
+    
+    def restore_state(self, state: Dict[str, Any]) -> None:
+        """Restore configs from the catalogue snapshot instead of loading."""
+        self.configs = state['configs']
+        self.version = state['version']
     
     def get(self, device_name: str) -> Dict[str, Any]:
         """
@@ -139,57 +222,224 @@ class NetworkConfigHandler:
         })
 
 
+class _CSVFileState:
+    """Change-tracking state for one device CSV file."""
+    
+    __slots__ = ('mtime_ns', 'size', 'digest', 'start', 'count')
+    
+    def __init__(self, mtime_ns: int, size: int, digest: str):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.digest = digest
+        self.start = 0  # Row position in the current catalogue
+        self.count = 0
+
+
 class DeviceDataHandler:
     """Handles device data loading from multiple CSVs in a directory."""
     
+    # Master and sources csvs are not vendor device files
+    SKIP_FILES = ('MOTO Audio delay - Ark1.csv', 'sources.csv')
+    
+    # Below this size pandas' fixed overhead outweighs the vectorized parse
+    COLUMN_PARSE_MIN_BYTES = 64 * 1024
+    
     def __init__(self, csv_dir: str, network_handler: NetworkConfigHandler, 
-                 image_finder=None):
+                 image_finder=None, loader: str = 'pandas', image_version=None):
         self.csv_dir = csv_dir
         self.network_handler = network_handler
         self.image_finder = image_finder
-        self.devices: List[Dict[str, Any]] = []
+        self.image_version = image_version  # () -> str, changes when images do
+        if loader == 'pandas' and not bulk_loader.available():
+            logger.warning("pandas is not installed, using the csv loader")
+            loader = 'csv'
+        self.loader = loader
+        self.devices = DeviceCatalogue(network_handler.configs)
+        self._files: Dict[str, _CSVFileState] = {}
+        self._image_version = ''  # Image set the current rows were resolved against
     
-    def load(self) -> List[Dict[str, Any]]:
+    def invalidate(self) -> None:
+        """Forget file states so the next load re-parses every CSV."""
+        self._files = {}
+    
+    def export_state(self) -> Dict[str, Any]:
+        """Catalogue and file states for the catalogue snapshot."""
+        return {
+            'devices': self.devices,
+            'files': self._files,
+            'image_version': self._image_version,
+        }
+    
+    def restore_state(self, state: Dict[str, Any]) -> None:
+        """
+        Restore from the catalogue snapshot. Must be pickled together with
+        the network handler's state so the catalogue still shares its configs.
+        """
+        self.devices = state['devices']
+        self._files = state['files']
+        self._image_version = state['image_version']
+    
+    def load(self) -> DeviceCatalogue:
         """
         Load devices from all CSV files in the directory.
         
+        Files are re-parsed only when their size, mtime and content hash
+        change; rows of unchanged files are spliced over from the current
+        catalogue. If nothing changed the current catalogue is returned as is.
+        Every file is re-parsed when the image set changed, since images are
+        resolved while parsing rows.
+        
         Returns:
-            List of device dictionaries
+            DeviceCatalogue with one row per device mode
         """
-        self.devices = []
-        
         if not os.path.exists(self.csv_dir) or not os.path.isdir(self.csv_dir):
             logger.error(f"CSV data directory not found: {self.csv_dir}")
+            self._files = {}
+            self.devices = DeviceCatalogue(self.network_handler.configs)
             return self.devices
         
         try:
-            global_idx = 0
-            for filename in os.listdir(self.csv_dir):
-                if not filename.endswith('.csv'):
+            image_version = self.image_version() if self.image_version else ''
+            if image_version != self._image_version:
+                self.invalidate()
+                self._image_version = image_version
+            
+            filenames = sorted(
+                f for f in os.listdir(self.csv_dir)
+                if f.endswith('.csv') and f not in self.SKIP_FILES
+            )
+            
+            states: Dict[str, _CSVFileState] = {}
+            parsed: Dict[str, DeviceCatalogue] = {}
+            changed = set(self._files) - set(filenames)  # deleted files
+            
+            for filename in filenames:
+                filepath = os.path.join(self.csv_dir, filename)
+                st = os.stat(filepath)
+                state = self._files.get(filename)
+                
+                if state and state.mtime_ns == st.st_mtime_ns and state.size == st.st_size:
+                    states[filename] = state
                     continue
-                # Skip the master and sources csvs
-                if filename in ['MOTO Audio delay - Ark1.csv', 'sources.csv']:
+                
+                with open(filepath, 'rb') as f:
+                    content = f.read()
+                digest = hashlib.blake2b(content, digest_size=16).hexdigest()
+                
+                if state and state.digest == digest:
+                    # Touched but not modified: keep parsed rows
+                    state.mtime_ns, state.size = st.st_mtime_ns, st.st_size
+                    states[filename] = state
                     continue
-                    
-                filepath = os.path.join(self.csv_dir, filename)
-                rows = CSVHandler.safe_read_csv(filepath)
                 
-                for row in rows:
-                    try:
-                        global_idx += 1
-                        device = self._parse_device_row(row, global_idx)
-                        if device:
-                            self.devices.append(device)
-                    except Exception as e:
-                        logger.warning(f"Error parsing device row {global_idx} in {filename}: {e}")
+                states[filename] = _CSVFileState(st.st_mtime_ns, st.st_size, digest)
+                parsed[filename] = self._parse_file(filename, content)
+                changed.add(filename)
+            
+            configs = self.network_handler.configs
+            if not changed and configs is self.devices.network_configs:
+                self._files = states
+                return self.devices
+            
+            self.devices = self._splice(filenames, states, parsed, configs)
+            self._files = states
             
-            logger.info(f"Loaded {len(self.devices)} devices from {self.csv_dir}")
+            logger.info(
+                f"Loaded {len(self.devices)} devices from {self.csv_dir} "
+                f"({len(parsed)} of {len(filenames)} files parsed)"
+            )
         
         except Exception as e:
             logger.error(f"Error loading devices from directory: {e}")
         
         return self.devices
     
+    def _parse_file(self, filename: str, content: bytes) -> DeviceCatalogue:
+        """
+        Parse one CSV file into a catalogue segment with stable ids.
+        
+        Args:
+            filename: CSV file name (part of each row identity)
+            content: Raw file content
+        
+        Returns:
+            DeviceCatalogue segment for the file
+        """
+        if self.loader == 'pandas' and len(content) >= self.COLUMN_PARSE_MIN_BYTES:
+            return self._parse_file_columns(filename, content)
+        
+        segment = DeviceCatalogue()
+        rows = CSVHandler.parse_csv_bytes(content, filename)
+        seen: Dict[tuple, int] = {}
+        
+        for row_num, row in enumerate(rows, 1):
+            try:
+                device = self._parse_device_row(row, 0)
+                if not device:
+                    continue
+                
+                raw = device['raw_data']
+                identity = (filename, device['name'], raw['input_type'], raw['output_type'],
+                            raw['input_sr'], raw['output_sr'])
+                # Identical rows are told apart by their occurrence count
+                occurrence = seen.get(identity, 0)
+                seen[identity] = occurrence + 1
+                device['id'] = device_id(identity + (occurrence,))
+                segment.append(device)
+            except Exception as e:
+                logger.warning(f"Error parsing device row {row_num} in {filename}: {e}")
+        
+        return segment
+    
+    def _parse_file_columns(self, filename: str, content: bytes) -> DeviceCatalogue:
+        """Vectorized _parse_file: same rows and ids, parsed column-wise."""
+        segment = DeviceCatalogue()
+        columns = bulk_loader.parse_device_columns(content, filename, self.image_finder)
+        if columns is None:
+            return segment
+        
+        identities = list(zip(repeat(filename), columns['name'], columns['input_type'],
+                              columns['output_type'], columns['input_sr'], columns['output_sr']))
+        # Identical rows are told apart by their occurrence count
+        occurrences = repeat(0)
+        if len(set(identities)) < len(identities):
+            seen: Dict[tuple, int] = {}
+            occurrences = []
+            for identity in identities:
+                occurrence = seen.get(identity, 0)
+                seen[identity] = occurrence + 1
+                occurrences.append(occurrence)
+        ids = [device_id(identity + (occurrence,))
+               for identity, occurrence in zip(identities, occurrences)]
+        segment.append_columns(ids, columns)
+        return segment
+    
+    def _splice(self, filenames: List[str], states: Dict[str, _CSVFileState],
+                parsed: Dict[str, DeviceCatalogue], configs: Dict[str, Any]) -> DeviceCatalogue:
+        """Build a new catalogue from re-parsed segments and unchanged rows."""
+        version = hashlib.blake2b(digest_size=16)
+        for filename in filenames:
+            version.update(f"{filename}\0{states[filename].digest}\0".encode('utf-8'))
+        version.update(self.network_handler.version.encode('utf-8'))
+        version.update(self._image_version.encode('utf-8'))
+        
+        catalogue = DeviceCatalogue(configs, version.hexdigest())
+        for filename in filenames:
+            state = states[filename]
+            start = len(catalogue)
+            if filename in parsed:
+                catalogue.extend(parsed[filename])
+            else:
+                catalogue.extend(self.devices, state.start, state.start + state.count)
+            state.start, state.count = start, len(catalogue) - start
+        
+        if len(set(catalogue.ids)) < len(catalogue):
+            logger.error("Device id collision: some devices share an id")
+        catalogue.index = DeviceIndex(catalogue)
+        catalogue.compatibility = CompatibilityIndex(catalogue)
+        catalogue.solver = ChainSolver(catalogue)
+        return catalogue
+    
     def _parse_device_row(self, row: dict, idx: int) -> Optional[Dict[str, Any]]:
         """Parse a single device row from CSV."""
         # Handle both old and new column names for compatibility
@@ -206,7 +456,6 @@ class DeviceDataHandler:
             'display_time': row.get('Latency', ''),
             'image': self.image_finder(name) if self.image_finder else None,
             'source': row.get('Source', '-').strip(),
-            'network_config': self.network_handler.get(name),
             'raw_data': {
                 'input_type': row.get('Input Type', '').strip(),
                 'output_type': row.get('Output Type', '').strip(),
@@ -219,15 +468,36 @@ class DeviceDataHandler:
 
 
 class TrafficLogger:
-    """Handles traffic/usage logging."""
+    """
+    Handles traffic/usage logging.
+    
+    Events are queued in an in-memory ring buffer and written in batches by
+    a background thread, either every ``flush_interval`` seconds or as soon
+    as ``batch_size`` events are pending. Each batch is one ``O_APPEND``
+    write under an exclusive ``fcntl`` lock, so lines from different
+    gunicorn workers never interleave. Pending events are flushed at exit.
+    """
     
-    def __init__(self, log_file: str):
+    def __init__(self, log_file: str, flush_interval: float = 1.0,
+                 batch_size: int = 100, buffer_size: int = 10000,
+                 checkpoint_file: Optional[str] = None,
+                 trending_half_life_hours: float = 72.0):
         self.log_file = log_file
+        self.popularity = PopularityTracker(log_file, checkpoint_file, trending_half_life_hours)
         self.fieldnames = ['Timestamp', 'Event', 'Device', 'Brand', 'UserID']
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._dropped = 0
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        atexit.register(self.flush)
     
     def log_event(self, event: str, device: str, brand: str, user_id: str = 'anonymous') -> bool:
         """
-        Log a user event.
+        Queue a user event for the next batch write.
         
         Args:
             event: Event name
@@ -236,35 +506,120 @@ class TrafficLogger:
             user_id: User identifier
             
         Returns:
-            bool: True if successful, False otherwise
+            bool: True if queued, False otherwise
         """
-        row_data = {
-            'Timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            'Event': event,
-            'Device': device,
-            'Brand': brand,
-            'UserID': user_id
-        }
+        try:
+            if self._pid != os.getpid():
+                self._start_writer()
+            
+            if len(self._buffer) == self._buffer.maxlen:
+                self._dropped += 1  # Oldest event is overwritten
+                TRAFFIC_EVENTS_DROPPED.inc()
+            self._buffer.append((time.time(), event, device, brand, user_id))
+            
+            if len(self._buffer) >= self.batch_size:
+                self._wakeup.set()
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error queueing traffic event: {e}")
+            return False
+    
+    def _start_writer(self) -> None:
+        """Start the flush thread for this process (again after a fork)."""
+        with self._flush_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._wakeup = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run_writer, name='traffic-log-writer', daemon=True
+            )
+            self._thread.start()
+    
+    def _run_writer(self) -> None:
+        """Flush loop run by the background thread."""
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+    
+    def flush(self) -> bool:
+        """
+        Write all pending events to the log file.
+        
+        If the write fails the events go back to the front of the buffer,
+        ahead of newer ones, and the next flush retries them. The buffer
+        stays bounded: when there is not room for all of them the oldest
+        are dropped.
         
-        return CSVHandler.append_csv_row(
-            self.log_file,
-            self.fieldnames,
-            row_data
-        )
+        Returns:
+            bool: True if successful (or nothing to write), False otherwise
+        """
+        with self._flush_lock:
+            rows = []
+            while self._buffer:
+                rows.append(self._buffer.popleft())
+            if self._dropped:
+                logger.warning(f"Traffic buffer full, dropped {self._dropped} events")
+                self._dropped = 0
+            if not rows:
+                return True
+            
+            try:
+                out = io.StringIO()
+                csv.writer(out).writerows(
+                    (time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row[0])),) + row[1:]
+                    for row in rows
+                )
+                self._append(out.getvalue().encode('utf-8'))
+                TRAFFIC_EVENTS_WRITTEN.inc(len(rows))
+                return True
+            except Exception as e:
+                logger.error(f"Error writing traffic log {self.log_file}: {e}")
+                self._requeue(rows)
+                return False
+    
+    def _requeue(self, rows: List[tuple]) -> None:
+        """Put unwritten events back in front of the buffer, dropping the oldest if full."""
+        room = self._buffer.maxlen - len(self._buffer)
+        if room < len(rows):
+            dropped = len(rows) - max(room, 0)
+            self._dropped += dropped
+            TRAFFIC_EVENTS_DROPPED.inc(dropped)
+            rows = rows[dropped:]
+        self._buffer.extendleft(reversed(rows))
+    
+    def _append(self, data: bytes) -> None:
+        """Append data in one write under an exclusive advisory lock."""
+        fd = os.open(self.log_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            if os.fstat(fd).st_size == 0:
+                header = io.StringIO()
+                csv.writer(header).writerow(self.fieldnames)
+                data = header.getvalue().encode('utf-8') + data
+            
+            view = memoryview(data)
+            while view:
+                written = os.write(fd, view)
+                view = view[written:]
+        finally:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
     
     def get_popularity(self) -> Dict[str, int]:
         """
         Get device popularity from traffic log.
         
+        Only events appended since the previous call are parsed; counts
+        are kept by the popularity tracker.
+        
         Returns:
             dict: Device name -> count mapping
         """
-        popularity = {}
-        
-        rows = CSVHandler.safe_read_csv(self.log_file)
-        for row in rows:
-            device = row.get('Device', '')
-            if device:
-                popularity[device] = popularity.get(device, 0) + 1
-        
-        return popularity
+        self.flush()
+        self.popularity.update()
+        return self.popularity.counts()
@@ -0,0 +1,256 @@
+"""
+Search and attribute indexes over the device catalogue.
+
+Built once per catalogue load so filtered, sorted and paginated queries
+only touch the rows they return.
+"""
+import re
+import copy
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from catalogue import DeviceCatalogue
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+SORT_KEYS = ('default', 'name_asc', 'name_desc', 'latency_asc', 'latency_desc', 'popularity')
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric tokens."""
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+class DeviceIndex:
+    """Inverted token index, attribute indexes and sort orders for a catalogue."""
+
+    def __init__(self, catalogue: DeviceCatalogue):
+        self.catalogue = catalogue
+        self.size = len(catalogue)
+
+        postings: Dict[str, array] = {}
+        raw = catalogue.raw_columns
+        for pos, text in enumerate(zip(catalogue.names, raw['input_type'], raw['output_type'])):
+            for token in set(tokenize(' '.join(text))):
+                postings.setdefault(token, array('l')).append(pos)
+        self.tokens = postings
+        self.vocabulary = sorted(postings)
+
+        self.attributes = {
+            'brand': self._build_attribute(catalogue.brands),
+            'input_type': self._build_attribute(raw['input_type']),
+            'output_type': self._build_attribute(raw['output_type']),
+            'input_sr': self._build_attribute(raw['input_sr']),
+            'output_sr': self._build_attribute(raw['output_sr']),
+        }
+
+        positions = range(self.size)
+        by_latency = array('l', sorted(positions, key=lambda p: (catalogue.latency[p], p)))
+        self.latency_order = by_latency
+        self.sorted_latency = array('d', (catalogue.latency[p] for p in by_latency))
+
+        by_name = sorted(positions, key=lambda p: (catalogue.names[p].casefold(), p))
+        self.orders: Dict[str, array] = {
+            'default': array('l', positions),
+            'name_asc': array('l', by_name),
+            'name_desc': array('l', reversed(by_name)),
+            'latency_asc': by_latency,
+            'latency_desc': array('l', reversed(by_latency)),
+        }
+        self._ranks: Dict[str, array] = {}
+
+    def with_popularity(self, catalogue: DeviceCatalogue) -> 'DeviceIndex':
+        """
+        Get a copy for a popularity-ranked catalogue with a 'popularity'
+        sort order (most popular first), sharing all other indexes.
+        """
+        ranked = copy.copy(self)
+        ranked.catalogue = catalogue
+        ranked.orders = dict(self.orders)
+        ranked.orders['popularity'] = catalogue.popularity_order
+        ranked._ranks = {key: ranks for key, ranks in self._ranks.items() if key != 'popularity'}
+        return ranked
+
+    @staticmethod
+    def _build_attribute(column: Iterable[str]) -> Dict[str, array]:
+        """Map casefolded attribute value -> row positions."""
+        index: Dict[str, array] = {}
+        for pos, value in enumerate(column):
+            index.setdefault((value or '').casefold(), array('l')).append(pos)
+        return index
+
+    def rank(self, sort: str) -> array:
+        """Get position -> rank mapping for a sort order, built on first use."""
+        ranks = self._ranks.get(sort)
+        if ranks is None:
+            ranks = array('l', bytes(array('l').itemsize * self.size))
+            for rank, pos in enumerate(self.orders[sort]):
+                ranks[pos] = rank
+            self._ranks[sort] = ranks
+        return ranks
+
+    def match_text(self, text: str) -> Set[int]:
+        """
+        Rows whose name or protocols contain every query token as a prefix
+        of one of their tokens.
+        """
+        result: Optional[Set[int]] = None
+        vocabulary = self.vocabulary
+        for token in tokenize(text):
+            matches: Set[int] = set()
+            i = bisect_left(vocabulary, token)
+            while i < len(vocabulary) and vocabulary[i].startswith(token):
+                matches.update(self.tokens[vocabulary[i]])
+                i += 1
+            result = matches if result is None else result & matches
+            if not result:
+                break
+        return result if result is not None else set(range(self.size))
+
+    def match_attribute(self, field: str, value: str) -> Set[int]:
+        """Rows whose attribute equals value (case-insensitive)."""
+        return set(self.attributes[field].get(value.casefold(), ()))
+
+    def match_latency(self, minimum: Optional[float], maximum: Optional[float]) -> Set[int]:
+        """Rows with minimum <= latency <= maximum."""
+        lo = 0 if minimum is None else bisect_left(self.sorted_latency, minimum)
+        hi = self.size if maximum is None else bisect_right(self.sorted_latency, maximum)
+        return set(self.latency_order[lo:hi])
+
+    def query(self, search: str = '', brand: str = '', input_type: str = '',
+              output_type: str = '', sample_rate: str = '',
+              min_latency: Optional[float] = None, max_latency: Optional[float] = None,
+              sort: str = 'default', after: Optional[int] = None,
+              limit: int = 50) -> Tuple[List[int], int, Optional[int]]:
+        """
+        Filter, sort and paginate catalogue rows.
+
+        Args:
+            search: Free-text query matched against name and protocols
+            brand: Exact brand
+            input_type: Exact input protocol
+            output_type: Exact output protocol
+            sample_rate: Sample rate matching either input or output SR
+            min_latency: Lower latency bound in ms
+            max_latency: Upper latency bound in ms
+            sort: One of SORT_KEYS
+            after: Rank of the last row of the previous page
+            limit: Page size
+
+        Returns:
+            tuple: (row positions, total matches, rank cursor for next page or None)
+        """
+        if sort not in self.orders:
+            raise ValueError(f"Unknown sort key: {sort}")
+
+        filters: List[Set[int]] = []
+        if search:
+            filters.append(self.match_text(search))
+        if brand:
+            filters.append(self.match_attribute('brand', brand))
+        if input_type:
+            filters.append(self.match_attribute('input_type', input_type))
+        if output_type:
+            filters.append(self.match_attribute('output_type', output_type))
+        if sample_rate:
+            filters.append(self.match_attribute('input_sr', sample_rate)
+                           | self.match_attribute('output_sr', sample_rate))
+        if min_latency is not None or max_latency is not None:
+            filters.append(self.match_latency(min_latency, max_latency))
+
+        start = 0 if after is None else after + 1
+        order = self.orders[sort]
+
+        if not filters:
+            page = list(order[start:start + limit])
+            total = self.size
+            last_rank = start + len(page) - 1
+            more = start + limit < total
+        else:
+            filters.sort(key=len)
+            matches = filters[0].intersection(*filters[1:])
+            ranks = self.rank(sort)
+            ranked = sorted(ranks[pos] for pos in matches)
+            i = bisect_left(ranked, start)
+            selected = ranked[i:i + limit]
+            page = [order[r] for r in selected]
+            total = len(ranked)
+            last_rank = selected[-1] if selected else None
+            more = i + limit < total
+
+        return page, total, (last_rank if more and page else None)
+
+
+SR_WILDCARD = '-'
+
+
+def is_compatible(out_type: str, out_sr: str, in_type: str, in_sr: str) -> Tuple[bool, str]:
+    """
+    Check the connection rules from database_rules.txt for one edge.
+
+    Output protocol must equal the next input protocol, and sample rates
+    must match unless either side is the '-' wildcard. An empty protocol on
+    either side does not block the connection.
+
+    Returns:
+        tuple: (ok, reason) where reason describes a mismatch
+    """
+    if not out_type or not in_type:
+        return True, ''
+    if out_type != in_type:
+        return False, f"{out_type} ➔ {in_type}"
+    if out_sr != SR_WILDCARD and in_sr != SR_WILDCARD and out_sr != in_sr:
+        return False, f"SR {out_sr} ➔ {in_sr}"
+    return True, ''
+
+
+class CompatibilityIndex:
+    """
+    Adjacency index for the connection rules.
+
+    Rows are bucketed by (input protocol, input SR). Rows with a wildcard
+    input SR and rows without an input protocol get their own buckets, so
+    the rows that may follow an output are the union of at most three
+    prebuilt, disjoint buckets.
+    """
+
+    def __init__(self, catalogue: DeviceCatalogue):
+        self.size = len(catalogue)
+        self.by_input: Dict[Tuple[str, str], array] = {}
+        self.by_input_type: Dict[str, array] = {}
+        self.untyped = array('l')
+
+        raw = catalogue.raw_columns
+        for pos, (in_type, in_sr) in enumerate(zip(raw['input_type'], raw['input_sr'])):
+            if not in_type:
+                self.untyped.append(pos)
+                continue
+            self.by_input.setdefault((in_type, in_sr), array('l')).append(pos)
+            self.by_input_type.setdefault(in_type, array('l')).append(pos)
+
+    def buckets(self, out_type: str, out_sr: str) -> List[array]:
+        """Disjoint position buckets of rows that may follow an output."""
+        if not out_type:
+            return [array('l', range(self.size))]
+        if out_sr == SR_WILDCARD:
+            return [self.by_input_type.get(out_type, array('l')), self.untyped]
+        return [
+            self.by_input.get((out_type, out_sr), array('l')),
+            self.by_input.get((out_type, SR_WILDCARD), array('l')),
+            self.untyped,
+        ]
+
+    def following(self, out_type: str, out_sr: str) -> List[int]:
+        """
+        Positions of rows that may follow an output, in catalogue order.
+
+        Args:
+            out_type: Output protocol of the previous device
+            out_sr: Output sample rate of the previous device
+
+        Returns:
+            Sorted list of row positions
+        """
+        return list(heapq.merge(*self.buckets(out_type, out_sr)))
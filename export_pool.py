@@ -0,0 +1,248 @@
+"""
+Bounded process pool for PDF export.
+
+Keeps reportlab rendering off the request workers so a few large exports
+cannot stall every other endpoint. Streamed exports are written by the pool
+process to a temporary file page by page, which the request worker sends
+on as it grows.
+"""
+import os
+import sys
+import time
+import atexit
+import logging
+import tempfile
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, Optional
+
+import profiling
+
+logger = logging.getLogger(__name__)
+
+
+class PoolSaturated(Exception):
+    """Raised when all export slots (running plus queued) are taken."""
+
+
+class ExportTimeout(Exception):
+    """Raised when an export produces no output within the job timeout."""
+
+
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_POLL_INTERVAL = 0.05  # seconds between checks for new pages
+
+
+def _render_to_file(chain_data: list, total_latency: float, path: str) -> None:
+    """
+    Pool job: write the PDF to path, flushing each page as it is finished.
+
+    The renderer is imported here so spawned workers only load what they need.
+    """
+    from pdf_generator import iter_flowchart_pdf
+    with open(path, 'wb') as f:
+        for part in iter_flowchart_pdf(chain_data, total_latency):
+            f.write(part)
+            f.flush()
+
+
+def _render_to_file_profiled(chain_data: list, total_latency: float, path: str) -> tuple:
+    """Pool job for a profiled request: also returns the render's cProfile stats."""
+    return profiling.profile_call(_render_to_file, chain_data, total_latency, path)
+
+
+def _import_renderer() -> float:
+    """Pool job: import the renderer ahead of the first export, returns seconds taken."""
+    started = time.perf_counter()
+    import pdf_generator  # noqa: F401
+    return time.perf_counter() - started
+
+
+def clear_asset_cache() -> None:
+    """Drop the renderer's cached images, if it was imported in this process."""
+    pdf_generator = sys.modules.get('pdf_generator')
+    if pdf_generator is not None:
+        pdf_generator.clear_asset_cache()
+
+
+class PDFExportPool:
+    """
+    Runs PDF renders in a process pool with admission control.
+
+    At most ``workers + max_queue`` jobs are admitted at once, or
+    ``max_exports`` if that is lower; further requests fail fast with
+    PoolSaturated. The request thread streams the PDF for as long as the
+    render runs, so ``max_exports`` should stay below the number of threads
+    serving requests. ``timeout`` limits how long an export may go without
+    producing output, so long renders that keep writing pages are not cut
+    off. A job that times out keeps its slot until its process
+    actually finishes, so a stuck render cannot let the backlog grow
+    without bound. ``workers=0`` renders inline.
+    """
+
+    def __init__(self, workers: int, max_queue: int, timeout: float,
+                 start_method: str = 'spawn', max_exports: int = 0):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.start_method = start_method
+        slots = max(1, workers + max_queue)
+        if max_exports > 0:
+            slots = min(slots, max_exports)
+        self._slots = threading.BoundedSemaphore(slots)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Create the pool on first use, i.e. after gunicorn has forked."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.start_method)
+                )
+                logger.info(f"Started PDF export pool with {self.workers} workers")
+            return self._executor
+
+    def _reset_executor(self, executor: ProcessPoolExecutor) -> None:
+        """Drop a broken pool so the next job starts a fresh one."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def stream(self, chain_data: list, total_latency: float) -> Iterator[bytes]:
+        """
+        Render a flowchart PDF and stream it as its pages are finished.
+
+        Waits for the first page, so a full pool, a timeout or a failure
+        before any output raises here. After that the timeout applies to
+        each wait for more output; a timeout or failure then raises from
+        the iterator, aborting the download. The export slot is held until
+        the render finishes.
+
+        Args:
+            chain_data: Signal chain nodes
+            total_latency: Total latency in ms
+
+        Returns:
+            Iterator[bytes]: Parts of the PDF document; close it when done
+
+        Raises:
+            PoolSaturated: No export slot is free
+            ExportTimeout: The first page was not ready within the timeout
+        """
+        if not self._slots.acquire(blocking=False):
+            raise PoolSaturated()
+
+        if self.workers <= 0:
+            parts = self._stream_inline(chain_data, total_latency)
+        else:
+            try:
+                parts = self._stream_pooled(chain_data, total_latency)
+            except Exception:
+                self._slots.release()
+                raise
+
+        try:
+            first = next(parts, b'')
+        except BaseException:
+            parts.close()
+            raise
+        return _prepend(first, parts)
+
+    def _stream_inline(self, chain_data: list, total_latency: float) -> Iterator[bytes]:
+        """Render in this process as the parts are consumed."""
+        from pdf_generator import iter_flowchart_pdf
+        try:
+            yield from iter_flowchart_pdf(chain_data, total_latency)
+        finally:
+            self._slots.release()
+
+    def _stream_pooled(self, chain_data: list, total_latency: float) -> Iterator[bytes]:
+        """Submit a file render to the pool (slot released when it ends) and follow the file."""
+        fd, path = tempfile.mkstemp(prefix='alc-pdf-', suffix='.pdf')
+        os.close(fd)
+        executor = self._get_executor()
+        profiled = profiling.active()
+        try:
+            future = executor.submit(_render_to_file_profiled if profiled else _render_to_file,
+                                     chain_data, total_latency, path)
+        except Exception:
+            os.remove(path)
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return self._follow(executor, future, path, profiled)
+
+    def _follow(self, executor: ProcessPoolExecutor, future, path: str,
+                profiled: bool) -> Iterator[bytes]:
+        """
+        Yield what the pool job writes to path until it has finished.
+
+        Raises ExportTimeout when the job writes nothing for the timeout.
+        """
+        deadline = time.monotonic() + self.timeout
+        try:
+            with open(path, 'rb') as f:
+                while True:
+                    done = future.done()  # Before reading: then an empty read means the end
+                    data = f.read(STREAM_CHUNK_SIZE)
+                    if data:
+                        yield data
+                        deadline = time.monotonic() + self.timeout  # Still making progress
+                        continue
+                    if done:
+                        break
+                    if time.monotonic() >= deadline:
+                        future.cancel()  # Only succeeds while still queued
+                        raise ExportTimeout()
+                    wait([future], timeout=STREAM_POLL_INTERVAL)
+
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                logger.error("PDF export pool broke, restarting it")
+                self._reset_executor(executor)
+                raise
+            if profiled:
+                _, stats = result
+                profiling.add_stats(stats)
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def prewarm(self) -> float:
+        """
+        Import the renderer (reportlab, Pillow, svglib) before the first export.
+
+        With a pool this starts a pool process and imports it there, so the
+        request worker itself never loads the renderer; inline it is imported
+        in this process.
+
+        Returns:
+            float: Seconds the import took
+        """
+        if self.workers <= 0:
+            return _import_renderer()
+        return self._get_executor().submit(_import_renderer).result()
+
+    def shutdown(self) -> None:
+        """Stop the pool without waiting for running jobs."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _prepend(first: bytes, parts: Iterator[bytes]) -> Iterator[bytes]:
+    """Yield first, then the rest of parts; closing this closes parts."""
+    try:
+        yield first
+        yield from parts
+    finally:
+        parts.close()
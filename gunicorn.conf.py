@@ -1,4 +1,8 @@
+import gc
 import os
+import glob
+import shutil
+import tempfile
 
 # Render dynamically assigns a port
 port = os.environ.get("PORT", "10000")
@@ -6,3 +10,60 @@ bind = f"0.0.0.0:{port}"
 
 # Recommended workers for Render's free tier
 workers = 2
+
+# A PDF export holds its request thread while the download streams, so
+# each worker serves requests on several threads and admits fewer exports
+# than it has threads: other endpoints always keep a thread
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+os.environ.setdefault("PDF_MAX_EXPORTS", str(max(1, threads - 1)))
+
+# Load the app (and its catalogue) once in the master so forked workers
+# share those pages instead of each building their own copy
+preload_app = True
+
+# Every worker writes its metrics into this directory and /metrics sums
+# them. Set up here, before the app is preloaded, and emptied so counts
+# start from zero on each server start
+metrics_dir = os.environ.get("METRICS_DIR")
+temporary_metrics_dir = not metrics_dir
+if temporary_metrics_dir:
+    metrics_dir = os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="alc-metrics-")
+os.makedirs(metrics_dir, exist_ok=True)
+for path in glob.glob(os.path.join(metrics_dir, "*.db")):
+    os.remove(path)
+
+# One worker builds the catalogue and the others adopt it from this
+# directory (in shared memory when /dev/shm exists)
+catalogue_dir = os.environ.get("SHARED_CATALOGUE_DIR")
+temporary_catalogue_dir = not catalogue_dir
+if temporary_catalogue_dir:
+    catalogue_dir = os.environ["SHARED_CATALOGUE_DIR"] = tempfile.mkdtemp(
+        prefix="alc-catalogue-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None
+    )
+
+
+def pre_fork(server, worker):
+    # Move everything allocated so far out of the collector's reach, so GC
+    # passes in the workers don't touch (and un-share) the preloaded objects
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    # Start the file watcher (and PREWARM_IMPORTS) now rather than on the
+    # worker's first request
+    from app import start_worker_threads
+    start_worker_threads()
+
+
+def child_exit(server, worker):
+    # Counters of an exited worker still count; its in-flight gauges do not
+    from metrics import mark_process_dead
+    mark_process_dead(worker.pid, metrics_dir)
+
+
+def on_exit(server):
+    if temporary_metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+    if temporary_catalogue_dir:
+        shutil.rmtree(catalogue_dir, ignore_errors=True)
@@ -2,59 +2,185 @@
 Image file handling and matching.
 """
 import os
+import hashlib
 import logging
-from typing import Dict, Optional
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 from utils import normalize_name
+from metrics import IMAGE_CACHE_LOOKUPS
 
 logger = logging.getLogger(__name__)
 
+_LOOKUP_HITS = IMAGE_CACHE_LOOKUPS.labels(result='hit')
+_LOOKUP_MISSES = IMAGE_CACHE_LOOKUPS.labels(result='miss')
+
+
+def _trigrams(name: str) -> Set[str]:
+    """Character trigrams of a normalized name, padded to weight its start."""
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
 
 class ImageHandler:
     """Handles image file discovery and matching."""
     
     SUPPORTED_FORMATS = ('.png', '.jpg', '.jpeg', '.svg', '.webp')
     
-    def __init__(self, image_folder: str):
+    def __init__(self, image_folder: str, fuzzy_threshold: float = 0.75):
         self.image_folder = image_folder
+        self.fuzzy_threshold = fuzzy_threshold  # 0 disables fuzzy matching
         self.cache: Dict[str, str] = {}  # filename -> relative path
         self.normalized_map: Dict[str, str] = {}  # normalized name -> path
+        self.signature: Dict[str, tuple] = {}  # relative path -> (mtime_ns, size)
+        self.version = ''  # Changes whenever the set of image files or their contents change
         self._scanned = False
+        self._listeners: List[Callable[[], None]] = []
+        self._resolved: Dict[str, Optional[str]] = {}  # device name -> path
+        self._fuzzy_entries: Optional[List[Tuple[str, str, int, str, frozenset]]] = None
+        self._trigram_index: Dict[str, List[int]] = {}
+    
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        """Register a callback run when a scan finds changed image files."""
+        self._listeners.append(callback)
     
     def scan(self) -> None:
-        """Recursively scan image folder and build cache."""
-        self.cache = {}
-        self.normalized_map = {}
-        self._scanned = True
+        """
+        Recursively scan image folder and build cache.
+        
+        The new maps are built aside and swapped in at the end, so lookups
+        running during a rescan see either the old or the new image set.
+        """
+        cache: Dict[str, str] = {}
+        signature: Dict[str, tuple] = {}
         
         if not os.path.exists(self.image_folder):
             logger.warning(f"Image folder not found: {self.image_folder}")
-            return
-        
-        try:
-            for root, _, files in os.walk(self.image_folder):
-                for file in files:
-                    if file.lower().endswith(self.SUPPORTED_FORMATS):
-                        full_path = os.path.join(root, file)
-                        rel_path = os.path.relpath(full_path, self.image_folder).replace('\\', '/')
-                        self.cache[file.lower()] = rel_path
+        else:
+            try:
+                for root, _, files in os.walk(self.image_folder):
+                    for file in files:
+                        if file.lower().endswith(self.SUPPORTED_FORMATS):
+                            full_path = os.path.join(root, file)
+                            rel_path = os.path.relpath(full_path, self.image_folder).replace('\\', '/')
+                            cache[file.lower()] = rel_path
+                            st = os.stat(full_path)
+                            signature[rel_path] = (st.st_mtime_ns, st.st_size)
+                logger.info(f"Scanned {len(cache)} images from {self.image_folder}")
             
-            self._build_normalized_map()
-            logger.info(f"Scanned {len(self.cache)} images from {self.image_folder}")
+            except Exception as e:
+                logger.error(f"Error scanning images: {e}")
         
-        except Exception as e:
-            logger.error(f"Error scanning images: {e}")
+        previous = self.signature
+        self._swap(cache, self._build_normalized_map(cache), signature)
+        self._notify_if_changed(previous)
+    
+    def _swap(self, cache: Dict[str, str], normalized_map: Dict[str, str],
+              signature: Dict[str, tuple]) -> None:
+        """Publish a scanned image set and drop lookups made against the old one."""
+        self.cache = cache
+        self.normalized_map = normalized_map
+        self.signature = signature
+        self.version = hashlib.blake2b(
+            repr(sorted(signature.items())).encode('utf-8'), digest_size=16
+        ).hexdigest()
+        self._fuzzy_entries = None
+        self._resolved = {}
+        self._scanned = True
+    
+    def export_state(self) -> Dict[str, Any]:
+        """Scan results for the catalogue snapshot."""
+        return {
+            'cache': self.cache,
+            'normalized_map': self.normalized_map,
+            'signature': self.signature,
+        }
+    
+    def restore_state(self, state: Dict[str, Any]) -> None:
+        """Restore scan results from the catalogue snapshot instead of scanning."""
+        self._swap(state['cache'], state['normalized_map'], state['signature'])
+    
+    def _notify_if_changed(self, previous: Dict[str, tuple]) -> None:
+        """Run listeners if the set of image files or their contents changed."""
+        if previous == self.signature:
+            return
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Image change listener failed: {e}")
     
-    def _build_normalized_map(self) -> None:
+    @staticmethod
+    def _build_normalized_map(cache: Dict[str, str]) -> Dict[str, str]:
         """Build normalized name lookup map."""
-        for filename, path in self.cache.items():
+        normalized_map: Dict[str, str] = {}
+        for filename, path in cache.items():
             name_without_ext = filename.rsplit('.', 1)[0]
-            self.normalized_map[name_without_ext.lower()] = path
-            self.normalized_map[normalize_name(name_without_ext)] = path
+            normalized_map[name_without_ext.lower()] = path
+            normalized_map[normalize_name(name_without_ext)] = path
+        return normalized_map
+    
+    def _build_fuzzy_index(self) -> None:
+        """Build the trigram index over image basenames."""
+        entries: List[Tuple[str, str, int, str, frozenset]] = []
+        trigram_index: Dict[str, List[int]] = {}
+        for filename, path in sorted(self.cache.items()):
+            name = normalize_name(filename.rsplit('.', 1)[0])
+            grams = _trigrams(name)
+            entry = len(entries)
+            entries.append((name, name.split('_', 1)[0], len(grams), path, frozenset(name.split('_'))))
+            for gram in grams:
+                trigram_index.setdefault(gram, []).append(entry)
+        self._trigram_index = trigram_index
+        self._fuzzy_entries = entries
+    
+    def _fuzzy_find(self, name: str) -> Optional[str]:
+        """
+        Best image of the same brand by trigram similarity (Dice coefficient).
+        
+        Only images whose name contains every word of the device name are
+        considered, so model numbers and variants must match exactly: DiGiCo
+        SD7 never gets digico_sd12, nor SD-Mini Rack digico_sd_rack. Similar
+        names rank these candidates, e.g. AD4D finds ad4d_ad4q. Devices left
+        without an image show up in get_missing_images instead.
+        
+        Args:
+            name: Normalized device name
+            
+        Returns:
+            str: Relative path to image, or None if nothing scores above the threshold
+        """
+        if self._fuzzy_entries is None:
+            self._build_fuzzy_index()
+        
+        grams = _trigrams(name)
+        tokens = set(name.split('_'))
+        brand = name.split('_', 1)[0]
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self._trigram_index.get(gram, ()))
+        
+        # Entries are in filename order, so ties go to the first filename
+        best_score, best_entry = 0.0, None
+        for entry, count in sorted(shared.items()):
+            _, entry_brand, entry_size, _, entry_tokens = self._fuzzy_entries[entry]
+            if entry_brand != brand or not tokens <= entry_tokens:
+                continue
+            score = 2.0 * count / (len(grams) + entry_size)
+            if score > best_score:
+                best_score, best_entry = score, entry
+        
+        if best_entry is None or best_score < self.fuzzy_threshold:
+            return None
+        path = self._fuzzy_entries[best_entry][3]
+        logger.info(f"Fuzzy image match {name!r} -> {path} (score {best_score:.2f})")
+        return path
     
     def find(self, device_name: str) -> Optional[str]:
         """
         Find best matching image for device name.
         
+        Results are memoized per device name until the next scan.
+        
         Args:
             device_name: Name of device
             
@@ -64,6 +190,22 @@ class ImageHandler:
         if not self._scanned:
             self.scan()
         
+        resolved = self._resolved  # A rescan replaces rather than clears it
+        try:
+            path = resolved[device_name]
+        except KeyError:
+            pass
+        else:
+            _LOOKUP_HITS.inc()
+            return path
+        
+        _LOOKUP_MISSES.inc()
+        path = self._match(device_name)
+        resolved[device_name] = path
+        return path
+    
+    def _match(self, device_name: str) -> Optional[str]:
+        """Resolve a device name by exact candidates, then fuzzily."""
         # Build candidate names in priority order
         candidates = [
             device_name.lower(),
@@ -88,6 +230,8 @@ class ImageHandler:
             if candidate in self.normalized_map:
                 return self.normalized_map[candidate]
         
+        if self.fuzzy_threshold > 0:
+            return self._fuzzy_find(candidates[-1])
         return None
     
     def get_missing_images(self, devices: list) -> list:
@@ -0,0 +1,412 @@
+"""
+Prometheus metrics shared across gunicorn workers.
+
+Every process writes its samples into its own memory-mapped file in the
+metrics directory (one file for counters and histograms, one for gauges).
+Writes are a dict lookup plus an in-place float update, with no locking
+between processes. ``/metrics`` reads every file in the directory and sums
+the samples, so counts from all workers (including ones that have since
+exited) are aggregated. Gauge files of dead workers are removed by the
+gunicorn ``child_exit`` hook so their in-flight values do not linger.
+"""
+import os
+import glob
+import json
+import mmap
+import atexit
+import shutil
+import struct
+import logging
+import tempfile
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_HEADER = struct.Struct('<Q')  # bytes used, including the header
+_KEY_LENGTH = struct.Struct('<I')
+_VALUE = struct.Struct('<d')
+_INITIAL_FILE_SIZE = 64 * 1024
+
+
+class _ValueFile:
+    """
+    Append-only key -> float64 map in a memory-mapped file.
+
+    Entry layout: u32 key length, UTF-8 key padded to 8 bytes, f64 value.
+    A new entry is fully written before the header's used-bytes count
+    covers it, so readers in other processes never see a partial entry.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < _INITIAL_FILE_SIZE:
+            self._file.truncate(_INITIAL_FILE_SIZE)
+            size = _INITIAL_FILE_SIZE
+        self._mm = mmap.mmap(self._file.fileno(), size)
+        self._used = _HEADER.unpack_from(self._mm, 0)[0] or _HEADER.size
+        self._offsets = {key: offset for key, offset, _ in _iter_entries(self._mm, self._used)}
+
+    def add(self, key: str, amount: float) -> None:
+        """Add to a value, creating it at 0 first."""
+        offset = self._offsets.get(key)
+        if offset is None:
+            offset = self._append(key)
+        _VALUE.pack_into(self._mm, offset, _VALUE.unpack_from(self._mm, offset)[0] + amount)
+
+    def set(self, key: str, value: float) -> None:
+        """Overwrite a value."""
+        offset = self._offsets.get(key)
+        if offset is None:
+            offset = self._append(key)
+        _VALUE.pack_into(self._mm, offset, value)
+
+    def _append(self, key: str) -> int:
+        """Add a zero entry for key and return its value offset."""
+        encoded = key.encode('utf-8')
+        padded = (_KEY_LENGTH.size + len(encoded) + 7) // 8 * 8
+        end = self._used + padded + _VALUE.size
+        if end > len(self._mm):
+            size = len(self._mm)
+            while size < end:
+                size *= 2
+            self._mm.close()
+            self._file.truncate(size)
+            self._mm = mmap.mmap(self._file.fileno(), size)
+
+        _KEY_LENGTH.pack_into(self._mm, self._used, len(encoded))
+        self._mm[self._used + _KEY_LENGTH.size:self._used + _KEY_LENGTH.size + len(encoded)] = encoded
+        offset = self._used + padded
+        _VALUE.pack_into(self._mm, offset, 0.0)
+        self._used = end
+        _HEADER.pack_into(self._mm, 0, end)
+        self._offsets[key] = offset
+        return offset
+
+    def close(self) -> None:
+        self._mm.close()
+        self._file.close()
+
+
+def _iter_entries(data, used: int) -> Iterable[Tuple[str, int, float]]:
+    """Yield (key, value offset, value) for each entry in a value file."""
+    pos = _HEADER.size
+    while pos < used:
+        length = _KEY_LENGTH.unpack_from(data, pos)[0]
+        key = bytes(data[pos + _KEY_LENGTH.size:pos + _KEY_LENGTH.size + length]).decode('utf-8')
+        padded = (_KEY_LENGTH.size + length + 7) // 8 * 8
+        offset = pos + padded
+        yield key, offset, _VALUE.unpack_from(data, offset)[0]
+        pos = offset + _VALUE.size
+
+
+def _read_file(path: str) -> Iterable[Tuple[str, float]]:
+    """Read all (key, value) samples of a value file written by any process."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return ()
+    if len(data) < _HEADER.size:
+        return ()
+    used = min(_HEADER.unpack_from(data, 0)[0], len(data))
+    return [(key, value) for key, _, value in _iter_entries(data, used)]
+
+
+def mark_process_dead(pid: int, directory: Optional[str] = None) -> None:
+    """
+    Drop the gauges of an exited worker (gunicorn ``child_exit`` hook).
+
+    Args:
+        pid: Worker process id
+        directory: Metrics directory (default: the registry's)
+    """
+    directory = directory or REGISTRY.directory
+    if directory:
+        try:
+            os.remove(os.path.join(directory, f"gauge_{pid}.db"))
+        except OSError:
+            pass
+
+
+class MetricsRegistry:
+    """Metric definitions plus the per-process value files."""
+
+    def __init__(self, directory: Optional[str] = None):
+        self._directory = directory
+        self._metrics: Dict[str, '_Metric'] = {}
+        self._files: Dict[str, _ValueFile] = {}
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> str:
+        """Metrics directory, created on first use when not configured."""
+        if self._directory is None:
+            from config import Config
+            self._directory = Config.METRICS_DIR
+        if not self._directory:
+            # Created before gunicorn forks (preload_app), so workers share it
+            self._directory = tempfile.mkdtemp(prefix='alc-metrics-')
+            atexit.register(self._remove_directory, os.getpid())
+        return self._directory
+
+    def _remove_directory(self, owner_pid: int) -> None:
+        if os.getpid() == owner_pid:
+            shutil.rmtree(self._directory, ignore_errors=True)
+
+    def _file(self, kind: str) -> _ValueFile:
+        """This process's value file for 'values' or 'gauge' samples."""
+        pid = os.getpid()
+        if self._pid != pid:
+            # After a fork the inherited mappings belong to the parent
+            self._files = {}
+            self._pid = pid
+        value_file = self._files.get(kind)
+        if value_file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            value_file = _ValueFile(os.path.join(self.directory, f"{kind}_{pid}.db"))
+            self._files[kind] = value_file
+        return value_file
+
+    def add(self, kind: str, key: str, amount: float) -> None:
+        try:
+            with self._lock:
+                self._file(kind).add(key, amount)
+        except Exception as e:
+            logger.debug(f"Could not record metric {key}: {e}")
+
+    def set(self, kind: str, key: str, value: float) -> None:
+        try:
+            with self._lock:
+                self._file(kind).set(key, value)
+        except Exception as e:
+            logger.debug(f"Could not record metric {key}: {e}")
+
+    def _register(self, metric: '_Metric') -> '_Metric':
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> 'Counter':
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> 'Gauge':
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> 'Histogram':
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def collect(self) -> Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float]:
+        """Sum every sample over all processes' files."""
+        totals: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        with self._lock:
+            paths = glob.glob(os.path.join(self.directory, '*.db'))
+        for path in paths:
+            for key, value in _read_file(path):
+                sample, labels = json.loads(key)
+                sample_key = (sample, tuple(tuple(pair) for pair in labels))
+                totals[sample_key] = totals.get(sample_key, 0.0) + value
+        return totals
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (0.0.4)."""
+        totals = self.collect()
+        by_sample: Dict[str, List[Tuple[Tuple[Tuple[str, str], ...], float]]] = {}
+        for (sample, labels), value in totals.items():
+            by_sample.setdefault(sample, []).append((labels, value))
+
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.expose(by_sample))
+        return '\n'.join(lines) + '\n'
+
+
+class _Metric:
+    """Base for metrics whose samples are keyed by label values."""
+
+    kind = ''
+    file_kind = 'values'
+
+    def __init__(self, registry: MetricsRegistry, name: str, documentation: str,
+                 labelnames: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._keys: Dict[Tuple[str, Tuple[str, ...]], str] = {}
+
+    def _key(self, sample: str, labels: Dict[str, str],
+             labelnames: Optional[Tuple[str, ...]] = None) -> str:
+        """File key for a sample, cached per label combination."""
+        labelnames = labelnames or self.labelnames
+        values = tuple(str(labels.get(name, '')) for name in labelnames)
+        key = self._keys.get((sample, values))
+        if key is None:
+            if set(labels) - set(labelnames):
+                raise ValueError(f"Unknown labels for {self.name}: {sorted(labels)}")
+            key = json.dumps([sample, list(zip(labelnames, values))], separators=(',', ':'))
+            self._keys[(sample, values)] = key
+        return key
+
+    def expose(self, by_sample) -> List[str]:
+        return [
+            f"{sample}{_format_labels(labels)} {_format_value(value)}"
+            for sample in self.samples()
+            for labels, value in sorted(by_sample.get(sample, ()))
+        ]
+
+    def samples(self) -> Tuple[str, ...]:
+        return (self.name,)
+
+
+class _Child:
+    """A counter or gauge bound to one label combination."""
+
+    __slots__ = ('registry', 'file_kind', 'key')
+
+    def __init__(self, registry: MetricsRegistry, file_kind: str, key: str):
+        self.registry = registry
+        self.file_kind = file_kind
+        self.key = key
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.registry.add(self.file_kind, self.key, amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.registry.add(self.file_kind, self.key, -amount)
+
+
+class Counter(_Metric):
+    """Monotonic count, summed over workers."""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        self.registry.add(self.file_kind, self._key(f"{self.name}_total", labels), amount)
+
+    def labels(self, **labels: str) -> _Child:
+        """Bind label values once for a hot path."""
+        return _Child(self.registry, self.file_kind, self._key(f"{self.name}_total", labels))
+
+    def samples(self) -> Tuple[str, ...]:
+        return (f"{self.name}_total",)
+
+
+class Gauge(_Metric):
+    """Current value per worker, summed over live workers."""
+
+    kind = 'gauge'
+    file_kind = 'gauge'
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        self.registry.add(self.file_kind, self._key(self.name, labels), amount)
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.registry.add(self.file_kind, self._key(self.name, labels), -amount)
+
+    def set(self, value: float, **labels: str) -> None:
+        self.registry.set(self.file_kind, self._key(self.name, labels), value)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in fixed buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, registry: MetricsRegistry, name: str, documentation: str,
+                 labelnames: Sequence[str], buckets: Sequence[float]):
+        if 'le' in labelnames:
+            raise ValueError("'le' is reserved for histogram buckets")
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        self._bucket_labels = tuple(_format_value(b) for b in self.buckets) + ('+Inf',)
+
+    def observe(self, value: float, **labels: str) -> None:
+        # Stored per bucket (not cumulative) so one observation is one write
+        index = bisect_left(self.buckets, value)
+        bucket_labels = dict(labels, le=self._bucket_labels[index])
+        registry, kind = self.registry, self.file_kind
+        registry.add(kind, self._key(f"{self.name}_bucket", bucket_labels, self.labelnames + ('le',)), 1.0)
+        registry.add(kind, self._key(f"{self.name}_sum", labels), value)
+        registry.add(kind, self._key(f"{self.name}_count", labels), 1.0)
+
+    def expose(self, by_sample) -> List[str]:
+        # Regroup stored buckets per label set and make them cumulative
+        buckets: Dict[Tuple[Tuple[str, str], ...], Dict[str, float]] = {}
+        for labels, value in by_sample.get(f"{self.name}_bucket", ()):
+            base = tuple(pair for pair in labels if pair[0] != 'le')
+            le = dict(labels)['le']
+            buckets.setdefault(base, {})[le] = value
+
+        lines = []
+        sums = dict(by_sample.get(f"{self.name}_sum", ()))
+        counts = dict(by_sample.get(f"{self.name}_count", ()))
+        for labels in sorted(set(buckets) | set(counts)):
+            cumulative = 0.0
+            for le in self._bucket_labels:
+                cumulative += buckets.get(labels, {}).get(le, 0.0)
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(labels + (('le', le),))} {_format_value(cumulative)}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(sums.get(labels, 0.0))}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {_format_value(counts.get(labels, 0.0))}")
+        return lines
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in labels]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _escape_help(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value))
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'alc_http_request_duration_seconds', 'Request latency by endpoint.', ('method', 'endpoint')
+)
+HTTP_RESPONSES = REGISTRY.counter(
+    'alc_http_responses', 'Responses by endpoint and status code.', ('method', 'endpoint', 'status')
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    'alc_http_requests_in_flight', 'Requests currently being handled.', ('endpoint',)
+)
+CATALOGUE_RELOADS = REGISTRY.counter(
+    'alc_catalogue_reloads', 'Device catalogue rebuilds after source changes.'
+)
+CATALOGUE_LOAD_SECONDS = REGISTRY.histogram(
+    'alc_catalogue_load_duration_seconds', 'Time spent refreshing the device catalogue.'
+)
+SOURCE_RELOADS = REGISTRY.counter(
+    'alc_source_reloads', 'Catalogue source reloads by source and trigger (watcher or admin).',
+    ('source', 'trigger')
+)
+IMAGE_CACHE_LOOKUPS = REGISTRY.counter(
+    'alc_image_cache_lookups', 'Device image lookups by memo result (hit or miss).', ('result',)
+)
+TRAFFIC_EVENTS_WRITTEN = REGISTRY.counter(
+    'alc_traffic_events_written', 'Tracking events written to the traffic log.'
+)
+TRAFFIC_EVENTS_DROPPED = REGISTRY.counter(
+    'alc_traffic_events_dropped', 'Tracking events dropped because the buffer was full.'
+)
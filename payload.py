@@ -0,0 +1,105 @@
+"""
+Pre-serialized JSON payloads with compressed variants and ETag support.
+"""
+import gzip
+import json
+import logging
+import threading
+from typing import Any, Callable, Optional
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # Optional dependency
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+
+class Payload:
+    """JSON body encoded once, with gzip/brotli variants and ETags."""
+
+    __slots__ = ('version', 'body', 'gzip', 'br')
+
+    def __init__(self, version: str, body: bytes):
+        self.version = version
+        self.body = body
+        # mtime=0 keeps the gzip bytes identical across workers
+        self.gzip = gzip.compress(body, compresslevel=9, mtime=0)
+        self.br = brotli.compress(body) if brotli else None
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        """Strong ETag for one encoding of the payload."""
+        return f"{self.version}-{encoding}" if encoding else self.version
+
+    def etags(self) -> tuple:
+        """All ETags this payload may have been served under."""
+        return (self.etag(), self.etag('gzip'), self.etag('br'))
+
+
+class PayloadCache:
+    """Keeps the payload for the current data version."""
+
+    def __init__(self):
+        self._payload: Optional[Payload] = None
+        self._lock = threading.Lock()
+
+    def get(self, version: str, build: Callable[[], Any]) -> Payload:
+        """
+        Get payload for a version, encoding it only when the version changes.
+
+        Args:
+            version: Version string of the underlying data
+            build: Callable returning the JSON-serializable data
+
+        Returns:
+            Payload for the version
+        """
+        payload = self._payload
+        if payload is not None and payload.version == version:
+            return payload
+
+        with self._lock:
+            payload = self._payload
+            if payload is None or payload.version != version:
+                body = json.dumps(build(), separators=(',', ':'), sort_keys=True).encode('utf-8')
+                payload = Payload(version, body)
+                self._payload = payload
+                logger.debug(f"Encoded payload {version}: {len(body)} bytes, gzip {len(payload.gzip)}")
+        return payload
+
+
+def payload_response(payload: Payload, mimetype: str = 'application/json') -> Response:
+    """
+    Build a response for the current request, honouring If-None-Match
+    and Accept-Encoding.
+
+    Args:
+        payload: Payload to send
+        mimetype: Response content type
+
+    Returns:
+        Flask response (200 or 304)
+    """
+    matched = [tag for tag in payload.etags() if request.if_none_match.contains_weak(tag)]
+    if matched:
+        response = Response(status=304)
+        response.set_etag(matched[0])
+    else:
+        encodings = request.accept_encodings
+        if payload.br is not None and encodings['br']:
+            encoding, body = 'br', payload.br
+        elif encodings['gzip']:
+            encoding, body = 'gzip', payload.gzip
+        else:
+            encoding, body = None, payload.body
+
+        response = Response(body, mimetype=mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.set_etag(payload.etag(encoding))
+
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -1,6 +1,11 @@
 """
 PDF Flowchart Generation Module
 Generates professional flowchart representations of signal chains.
+
+Long chains flow across as many pages as needed. The document is produced
+page by page: each finished page is written out straight away, so memory
+does not grow with the chain length and the first bytes are available
+after the first page.
 """
 import io
 from datetime import datetime
@@ -11,7 +16,9 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from reportlab.pdfbase import pdfdoc
 import logging
+from typing import Iterator, List
 
 logger = logging.getLogger(__name__)
 
@@ -30,9 +37,111 @@ PROTOCOL_COLORS = {
 
 from config import Config
 import os
+import threading
+from collections import OrderedDict
 from PIL import Image
 from svglib.svglib import svg2rlg
 from reportlab.graphics import renderPDF
+from reportlab.lib.utils import ImageReader
+from reportlab import rl_config
+
+# Embed image streams as binary; ASCII85 only inflates them and costs CPU
+rl_config.useA85 = 0
+
+LOGO_PATH = os.path.join("static", "images", "logo_buttom.svg")
+LOGO_HEIGHT = 30.0  # Typical footer logo height
+
+# Page layout (points)
+PAGE_SIZE = landscape(A4)
+HEADER_HEIGHT = 30
+FOOTER_HEIGHT = 50
+NODE_RADIUS = 40
+MARGIN_X = 80
+MARGIN_Y = 120  # Page top to the centre of the first row
+X_SPACING = 160
+Y_SPACING = 140
+LABEL_DEPTH = 90  # Node centre to the bottom of its labels, plus clearance
+
+BAR_COLOR = colors.HexColor('#323d4d')  # Dark blue/gray requested by user
+MARKER_COLOR = colors.HexColor('#00D9FF')
+
+
+class _AssetCache:
+    """
+    Process-wide cache of parsed PDF assets.
+    
+    Holds the scaled footer logo drawing and decoded node images, keyed by
+    path and mtime so edited files are picked up. Bounded LRU for images.
+    Images are downscaled to ``max_px`` on load: nodes are drawn at 60pt, and
+    reportlab digests and encodes the full pixel data of every image it
+    embeds.
+    """
+    
+    def __init__(self, max_images: int, max_px: int):
+        self.max_images = max_images
+        self.max_px = max_px
+        self._images: 'OrderedDict[tuple, ImageReader]' = OrderedDict()
+        self._logo = None  # (key, drawing)
+        self._lock = threading.Lock()
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._images.clear()
+            self._logo = None
+    
+    def image(self, path: str):
+        """Get decoded ImageReader for a file, or None if missing."""
+        try:
+            key = (path, os.stat(path).st_mtime_ns)
+        except OSError:
+            return None
+        
+        with self._lock:
+            reader = self._images.get(key)
+            if reader is not None:
+                self._images.move_to_end(key)
+                return reader
+        
+        with Image.open(path) as img:
+            img.thumbnail((self.max_px, self.max_px), Image.LANCZOS)
+            if img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGBA')
+            reader = ImageReader(img.copy())
+        reader.getRGBData()  # Decode once, outside the lock
+        with self._lock:
+            self._images[key] = reader
+            while len(self._images) > self.max_images:
+                self._images.popitem(last=False)
+        return reader
+    
+    def logo(self, path: str = LOGO_PATH):
+        """Get the footer logo drawing scaled to LOGO_HEIGHT, or None."""
+        try:
+            key = (path, os.stat(path).st_mtime_ns)
+        except OSError:
+            return None
+        
+        cached = self._logo
+        if cached and cached[0] == key:
+            return cached[1]
+        
+        logo = svg2rlg(path)
+        if logo:
+            # Scale down the logo proportionately if it's too big
+            scale_factor = LOGO_HEIGHT / getattr(logo, 'height', 100)
+            logo.scale(scale_factor, scale_factor)
+        self._logo = (key, logo)
+        return logo
+
+
+_asset_cache = _AssetCache(Config.PDF_IMAGE_CACHE_SIZE, Config.PDF_IMAGE_MAX_PX)
+
+
+def clear_asset_cache() -> None:
+    """Drop cached logo and images, e.g. after the image folder changed."""
+    _asset_cache.clear()
+    logger.debug("PDF asset cache cleared")
+
 
 def get_protocol_color(protocol_name: str) -> colors.Color:
     """Get color for protocol type."""
@@ -43,244 +152,430 @@ def get_protocol_color(protocol_name: str) -> colors.Color:
     return PROTOCOL_COLORS.get(protocol, PROTOCOL_COLORS['default'])
 
 
-def generate_flowchart_pdf(chain_data: list, total_latency: float) -> bytes:
+def _output_color(device: dict) -> colors.Color:
+    """Color of the path leaving a device."""
+    return get_protocol_color(device.get('raw_data', {}).get('output_type', '-'))
+
+
+class _Written(pdfdoc.PDFObject):
+    """Stands in for a PDF object that was already written out."""
+    
+    def __init__(self, name: str, obj):
+        self.__InternalName__ = name
+        # drawImage reads the size of an image it has embedded before
+        for attr in ('width', 'height'):
+            if hasattr(obj, attr):
+                setattr(self, attr, getattr(obj, attr))
+
+
+class _PageWriter:
     """
-    Generate a professional flowchart PDF from signal chain data.
+    Writes out a canvas's PDF objects as its pages are finished.
+    
+    reportlab only formats a document in Canvas.save(), holding every page
+    until then. After each showPage(), flush() formats the objects
+    registered since the last flush (the page, its content stream, newly
+    used images and fonts) the way PDFDocument.format() would and swaps
+    them for stubs, keeping just their offsets. The objects that change
+    until the end (page tree, catalog, info, outlines and the shared font
+    dictionary) are written by finish(), with the cross-reference table.
     """
+    
+    def __init__(self, c: canvas.Canvas):
+        self._canvas = c
+        self._doc = c._doc
+        self._offset = 0
+        self._counter = 0  # Object numbers up to this one are written or deferred
+        self._pages = 0  # Pages in the page tree already swapped for stubs
+        self._deferred: List[str] = []
+        self._finishing = False
+    
+    def _is_deferred(self, name: str, obj) -> bool:
+        if self._finishing:
+            return False
+        doc = self._doc
+        return name == pdfdoc.BasicFonts or any(
+            obj is growing for growing in (doc.Pages, doc.Catalog, doc.info, doc.Outlines)
+        )
+    
+    def _write_object(self, name: str, out: List[bytes]) -> None:
+        doc = self._doc
+        obj = doc.idToObject[name]
+        data = pdfdoc.PDFIndirectObject(name, obj).format(doc)
+        doc.idToOffset[name] = self._offset
+        self._offset += len(data)
+        out.append(data)
+        doc.idToObject[name] = _Written(name, obj)
+    
+    def _write_new_objects(self, out: List[bytes]) -> None:
+        """Write objects in number order, including any registered while formatting."""
+        doc = self._doc
+        while self._counter + 1 in doc.numberToId:
+            self._counter += 1
+            name = doc.numberToId[self._counter]
+            if self._is_deferred(name, doc.idToObject[name]):
+                self._deferred.append(name)
+            else:
+                self._write_object(name, out)
+    
+    def flush(self) -> bytes:
+        """
+        Write out everything finished since the last call.
+        
+        Returns:
+            bytes: Next part of the document (starting with the file header)
+        """
+        out = []
+        if self._offset == 0:
+            header = pdfdoc.PDFFile(self._doc._pdfVersion).format(self._doc)
+            self._offset = len(header)
+            out.append(header)
+        self._write_new_objects(out)
+        
+        pages = self._doc.Pages.pages
+        for i in range(self._pages, len(pages)):
+            pages[i] = self._doc.idToObject[pages[i].__InternalName__]
+        self._pages = len(pages)
+        return b''.join(out)
+    
+    def finish(self) -> bytes:
+        """
+        Write the deferred objects, cross-reference table and trailer.
+        
+        Returns:
+            bytes: Last part of the document
+        """
+        doc = self._doc
+        out = [self.flush()]
+        
+        # As PDFDocument.GetPDFData() and format() do before formatting
+        for font in doc.delayedFonts:
+            font.addObjects(doc)
+        doc.info.invariant = doc.invariant
+        doc.info.digest(doc.signature)
+        catalog = doc.Reference(doc.Catalog)
+        info = doc.Reference(doc.info)
+        doc.Outlines.prepare(doc, self._canvas)
+        if doc.Outlines.ready < 0:
+            doc.Catalog.Outlines = None
+        
+        self._finishing = True
+        deferred, self._deferred = self._deferred, []
+        for name in deferred:
+            self._write_object(name, out)
+        self._write_new_objects(out)
+        
+        xref = pdfdoc.PDFCrossReferenceTable()
+        xref.addsection(0, [doc.numberToId[n] for n in range(1, self._counter + 1)])
+        trailer = pdfdoc.PDFTrailer(
+            startxref=self._offset,
+            Size=self._counter + 1,
+            Root=catalog,
+            Info=info,
+            ID=doc.ID(),
+        )
+        out.append(xref.format(doc))
+        out.append(trailer.format(doc))
+        return b''.join(out)
+
+
+def _grid(width: float, height: float) -> tuple:
+    """Nodes per row, and rows per page between the header and the footer."""
+    nodes_per_row = max(1, int((width - MARGIN_X * 2 + X_SPACING) // X_SPACING))
+    rows_per_page = max(1, int((height - MARGIN_Y - FOOTER_HEIGHT - LABEL_DEPTH) // Y_SPACING) + 1)
+    return nodes_per_row, rows_per_page
+
+
+def _positions(count: int, nodes_per_row: int, height: float) -> list:
+    """Node centres on a page, snaking left to right, then right to left."""
+    positions = []
+    for i in range(count):
+        row, col = divmod(i, nodes_per_row)
+        if row % 2 == 1:
+            col = (nodes_per_row - 1) - col
+        positions.append((MARGIN_X + col * X_SPACING, height - MARGIN_Y - row * Y_SPACING))
+    return positions
+
+
+def _draw_header(c: canvas.Canvas, width: float, height: float, title: str) -> None:
+    c.setFillColor(BAR_COLOR)
+    c.rect(0, height - HEADER_HEIGHT, width, HEADER_HEIGHT, fill=1, stroke=0)
+    c.setFillColor(colors.white)
+    c.setFont("Helvetica-Bold", 14)
+    c.drawCentredString(width / 2, height - 20, title)
+
+
+def _draw_footer(c: canvas.Canvas, width: float, total_latency: float, page: int, pages: int) -> None:
+    """Footer with the total latency, the logo and, for several pages, the page number."""
+    c.setFillColor(BAR_COLOR)
+    c.rect(0, 0, width, FOOTER_HEIGHT, fill=1, stroke=0)
+    c.setFillColor(colors.white)
+    c.setFont("Helvetica-Bold", 12)
+    c.drawRightString(width - 20, 20, f"TOTAL LATENCY: {total_latency:.2f} ms")
+    if pages > 1:
+        c.setFont("Helvetica", 10)
+        c.drawCentredString(width / 2, 20, f"PAGE {page} OF {pages}")
+    
     try:
-        buf = io.BytesIO()
-        # Create PDF with landscape orientation
-        c = canvas.Canvas(buf, pagesize=landscape(A4))
-        width, height = landscape(A4)
+        logo = _asset_cache.logo()
+        if logo:
+            renderPDF.draw(logo, c, 20, 10)
+    except Exception as e:
+        logger.warning(f"Could not draw logo in PDF footer: {e}")
+
+
+def _draw_marker(c: canvas.Canvas, x: float, y: float, label: str, side: int,
+                 line_color: colors.Color, note: str = '') -> None:
+    """
+    Draw a START, END or continuation block beside a node, joined to it.
+    
+    Args:
+        x, y: Node centre
+        label: Text of the block
+        side: -1 to the left of the node, 1 to the right
+        line_color: Color of the line between block and node
+        note: Small text under the block (e.g. the page the chain continues on)
+    """
+    block_x = x + side * (NODE_RADIUS + 30)  # Block centre
+    c.setStrokeColor(line_color)
+    c.setLineWidth(2)
+    c.line(x, y, x + side * (NODE_RADIUS + 20), y)
+    
+    c.setFillColor(MARKER_COLOR)
+    c.roundRect(block_x - 10, y - 20, 20, 40, 5, fill=1, stroke=0)
+    c.setFillColor(colors.white)
+    c.setFont("Helvetica-Bold", 10)
+    c.saveState()
+    c.translate(block_x, y)
+    c.rotate(90)
+    c.drawCentredString(0, -3, label)
+    c.restoreState()
+    
+    if note:
+        c.setFillColor(colors.HexColor('#4A4A4A'))
+        c.setFont("Helvetica", 7)
+        c.drawCentredString(block_x, y - 30, note)
+
+
+def _draw_segment(c: canvas.Canvas, x: float, y: float, next_x: float, next_y: float) -> None:
+    """Draw the path between two consecutive nodes in the current stroke color."""
+    path = c.beginPath()
+    path.moveTo(x, y)
+    if next_y == y:
+        path.lineTo(next_x, next_y)
+    else:
+        # Simple rectilinear drop down, curving at corners
+        turn_radius = 20
+        # if x == next_x (they are on top of each other, shouldn't happen with our snake pattern)
+        # we must go out around the node!
+        dist_out = NODE_RADIUS + 20
         
-        # Draw Header
-        title_str = f"MOTO ALC SIGNAL FLOWCHART ({datetime.now().strftime('%d-%m-%Y %H:%M')})"
-        c.setFillColor(colors.HexColor('#323d4d')) # Dark blue/gray requested by user
-        c.rect(0, height - 30, width, 30, fill=1, stroke=0)
-        c.setFillColor(colors.white)
-        c.setFont("Helvetica-Bold", 14)
-        c.drawCentredString(width / 2, height - 20, title_str)
+        if x > next_x: # Was going left to right, now dropping to next row going right to left
+            path.lineTo(x + dist_out - turn_radius, y)
+            path.arcTo(x + dist_out - turn_radius*2, y - turn_radius*2, x + dist_out, y, 90, -90)
+            path.lineTo(x + dist_out, next_y + turn_radius)
+            path.arcTo(x + dist_out - turn_radius*2, next_y, x + dist_out, next_y + turn_radius*2, 0, -90)
+            path.lineTo(next_x, next_y)
+        else: # Was going right to left, now dropping to next row going left to right
+            path.lineTo(x - dist_out + turn_radius, y)
+            path.arcTo(x - dist_out, y - turn_radius*2, x - dist_out + turn_radius*2, y, 90, 90)
+            path.lineTo(x - dist_out, next_y + turn_radius)
+            path.arcTo(x - dist_out, next_y, x - dist_out + turn_radius*2, next_y + turn_radius*2, 180, 90)
+            path.lineTo(next_x, next_y)
+    c.drawPath(path)
+
+
+def _draw_node(c: canvas.Canvas, x: float, y: float, device: dict) -> None:
+    """Draw a device node: split protocol background, image and labels."""
+    node_radius = NODE_RADIUS
+    
+    # Draw Split Background inside Circle
+    c.saveState()
+    
+    # Create a circular clipping path
+    circle_path = c.beginPath()
+    circle_path.circle(x, y, node_radius)
+    c.clipPath(circle_path, stroke=0, fill=0)
+    
+    # Background
+    c.setFillColor(colors.HexColor('#4A4A4A'))
+    c.rect(x - node_radius, y - node_radius, node_radius * 2, node_radius * 2, fill=1, stroke=0)
+    
+    # Left protocol color
+    in_proto = device.get('raw_data', {}).get('input_type', '-')
+    if in_proto and in_proto != '-':
+        c.setFillColor(get_protocol_color(in_proto))
+        # Draw left polygon: (0,0) to (70%,0) to (45%,100%) to (0,100%)
+        w, h = node_radius * 2, node_radius * 2
+        px, py = x - node_radius, y - node_radius
+        left_path = c.beginPath()
+        left_path.moveTo(px, py + h)
+        left_path.lineTo(px + w * 0.7, py + h)
+        left_path.lineTo(px + w * 0.45, py)
+        left_path.lineTo(px, py)
+        left_path.close()
+        c.drawPath(left_path, stroke=0, fill=1)
         
-        if not chain_data:
-            c.setFont("Helvetica", 12)
-            c.setFillColor(colors.black)
-            c.drawString(50, height - 80, "No devices in signal chain.")
-            c.save()
-            buf.seek(0)
-            return buf.getvalue()
-
-        # Layout settings
-        margin_x = 80
-        margin_y = 120
-        node_radius = 40
-        x_spacing = 160
-        y_spacing = 140
+    # Right protocol color
+    out_proto = device.get('raw_data', {}).get('output_type', '-')
+    if out_proto and out_proto != '-':
+        c.setFillColor(get_protocol_color(out_proto))
+        # Draw right polygon: (70%,0) to (100%,0) to (100%,100%) to (45%,100%)
+        w, h = node_radius * 2, node_radius * 2
+        px, py = x - node_radius, y - node_radius
+        right_path = c.beginPath()
+        right_path.moveTo(px + w * 0.7, py + h)
+        right_path.lineTo(px + w, py + h)
+        right_path.lineTo(px + w, py)
+        right_path.lineTo(px + w * 0.45, py)
+        right_path.close()
+        c.drawPath(right_path, stroke=0, fill=1)
         
-        nodes_per_row = int((width - margin_x*2 + x_spacing) // x_spacing)
-        if nodes_per_row < 1:
-            nodes_per_row = 1
-            
-        # Pre-calculate positions
-        positions = []
-        for i in range(len(chain_data)):
-            row = i // nodes_per_row
-            col = i % nodes_per_row
-            
-            # Snake direction (left to right, then right to left)
-            if row % 2 == 1:
-                col = (nodes_per_row - 1) - col
-                
-            x = margin_x + col * x_spacing
-            y = height - margin_y - row * y_spacing
-            positions.append((x, y))
-
-        # Draw Start block
-        if positions:
-            x, y = positions[0]
-            c.setFillColor(colors.HexColor('#00D9FF'))
-            c.roundRect(x - node_radius - 40, y - 20, 20, 40, 5, fill=1, stroke=0)
-            c.setFillColor(colors.white)
-            c.setFont("Helvetica-Bold", 10)
-            c.saveState()
-            c.translate(x - node_radius - 30, y)
-            c.rotate(90)
-            c.drawCentredString(0, -3, "START")
-            c.restoreState()
-            
-            # Line from Start to first node
-            c.setStrokeColor(colors.HexColor('#00D9FF'))
-            c.setLineWidth(2)
-            c.line(x - node_radius - 20, y, x, y)
+    c.restoreState()
+    
+    # Draw circle border
+    c.setStrokeColor(colors.HexColor('#222222'))
+    c.setLineWidth(1)
+    c.circle(x, y, node_radius, fill=0, stroke=1)
+    
+    # Try to draw image inside
+    filename = device.get('image')
+    if filename:
+        try:
+            img = _asset_cache.image(os.path.join(Config.IMAGE_FOLDER, filename))
+            if img is not None:
+                # reportlab handles transparent pngs pretty well directly if pillow is installed
+                img_size = node_radius * 1.5
+                c.drawImage(img, x - img_size/2, y - img_size/2, width=img_size, height=img_size, mask='auto', preserveAspectRatio=True)
+        except Exception as e:
+            logger.warning(f"Could not draw image for {device.get('name')}: {e}")
             
-        # Draw solid paths (Segments with protocol colors)
-        c.setLineWidth(2)
+    # Text below node
+    c.setFillColor(colors.black)
+    c.setFont("Helvetica-Bold", 9)
+    
+    # Truncate and split name
+    name = device.get('name', 'Unknown')
+    if len(name) > 20:
+        words = name.split()
+        line1 = " ".join(words[:len(words)//2])
+        line2 = " ".join(words[len(words)//2:])
+        c.drawCentredString(x, y - node_radius - 15, line1)
+        c.drawCentredString(x, y - node_radius - 26, line2)
+    else:
+        c.drawCentredString(x, y - node_radius - 15, name)
         
-        for i in range(len(chain_data)):
-            x, y = positions[i]
-            device = chain_data[i]
-            output_proto = device.get('raw_data', {}).get('output_type', '-')
-            path_color = get_protocol_color(output_proto)
-            
-            c.setStrokeColor(path_color)
-            
-            if i < len(chain_data) - 1:
-                next_x, next_y = positions[i+1]
-                path = c.beginPath()
-                path.moveTo(x, y)
-                if next_y == y:
-                    path.lineTo(next_x, next_y)
-                else:
-                    # Simple rectilinear drop down, curving at corners
-                    turn_radius = 20
-                    # if x == next_x (they are on top of each other, shouldn't happen with our snake pattern)
-                    # we must go out around the node!
-                    dist_out = node_radius + 20
-                    
-                    if x > next_x: # Was going left to right, now dropping to next row going right to left
-                        path.lineTo(x + dist_out - turn_radius, y)
-                        path.arcTo(x + dist_out - turn_radius*2, y - turn_radius*2, x + dist_out, y, 90, -90)
-                        path.lineTo(x + dist_out, next_y + turn_radius)
-                        path.arcTo(x + dist_out - turn_radius*2, next_y, x + dist_out, next_y + turn_radius*2, 0, -90)
-                        path.lineTo(next_x, next_y)
-                    else: # Was going right to left, now dropping to next row going left to right
-                        path.lineTo(x - dist_out + turn_radius, y)
-                        path.arcTo(x - dist_out, y - turn_radius*2, x - dist_out + turn_radius*2, y, 90, 90)
-                        path.lineTo(x - dist_out, next_y + turn_radius)
-                        path.arcTo(x - dist_out, next_y, x - dist_out + turn_radius*2, next_y + turn_radius*2, 180, 90)
-                        path.lineTo(next_x, next_y)
-                c.drawPath(path)
-
-        # Draw End block
-        if positions:
-            last_x, last_y = positions[-1]
-            last_device = chain_data[-1]
-            last_output_proto = last_device.get('raw_data', {}).get('output_type', '-')
-            
-            c.setStrokeColor(get_protocol_color(last_output_proto))
-            c.line(last_x, last_y, last_x + node_radius + 20, last_y)
-            
-            c.setFillColor(colors.HexColor('#00D9FF'))
-            c.roundRect(last_x + node_radius + 20, last_y - 20, 20, 40, 5, fill=1, stroke=0)
-            c.setFillColor(colors.white)
-            c.setFont("Helvetica-Bold", 10)
-            c.saveState()
-            c.translate(last_x + node_radius + 30, last_y)
-            c.rotate(90)
-            c.drawCentredString(0, -3, "END")
-            c.restoreState()
-
-        # Draw nodes over the lines
-        c.setDash(1, 0) # Solid lines for nodes
+    c.setFillColor(MARKER_COLOR)
+    c.setFont("Helvetica", 8)
+    lat = f"Lat: {device.get('latency', 0):.2f}ms"
+    c.drawCentredString(x, y - node_radius - 36, lat)
+
+
+def _draw_page(c: canvas.Canvas, chain_data: list, start: int, count: int, page: int, pages: int,
+               title: str, total_latency: float) -> None:
+    """
+    Draw one page of the flowchart.
+    
+    Args:
+        chain_data: Whole signal chain
+        start: Index of the first node on this page
+        count: Nodes on this page
+        page: Page number (from 1)
+        pages: Number of pages
+    """
+    width, height = PAGE_SIZE
+    nodes_per_row, _ = _grid(width, height)
+    nodes = chain_data[start:start + count]
+    positions = _positions(count, nodes_per_row, height)
+    
+    _draw_header(c, width, height, title)
+    
+    # Start block, or where the chain comes from
+    x, y = positions[0]
+    if page == 1:
+        _draw_marker(c, x, y, "START", -1, MARKER_COLOR)
+    else:
+        _draw_marker(c, x, y, "CONT.", -1, _output_color(chain_data[start - 1]),
+                     f"from page {page - 1}")
+    
+    # Draw solid paths (Segments with protocol colors)
+    c.setLineWidth(2)
+    for i in range(count - 1):
+        c.setStrokeColor(_output_color(nodes[i]))
+        _draw_segment(c, *positions[i], *positions[i + 1])
+    
+    # End block, or where the chain continues, in the direction of the last row
+    last_x, last_y = positions[-1]
+    side = 1 if ((count - 1) // nodes_per_row) % 2 == 0 else -1
+    if page == pages:
+        _draw_marker(c, last_x, last_y, "END", side, _output_color(nodes[-1]))
+    else:
+        _draw_marker(c, last_x, last_y, "CONT.", side, _output_color(nodes[-1]),
+                     f"to page {page + 1}")
+    
+    # Draw nodes over the lines
+    c.setDash(1, 0) # Solid lines for nodes
+    for (x, y), device in zip(positions, nodes):
+        _draw_node(c, x, y, device)
+    
+    _draw_footer(c, width, total_latency, page, pages)
+
+
+def iter_flowchart_pdf(chain_data: list, total_latency: float) -> Iterator[bytes]:
+    """
+    Generate a professional flowchart PDF from signal chain data, page by page.
+    
+    Rows of nodes flow onto as many pages as needed. Every page repeats the
+    header and footer, and a chain that runs over a page break ends at a
+    continuation block naming the next page, where it resumes.
+    
+    Args:
+        chain_data: Signal chain nodes
+        total_latency: Total latency in ms
+    
+    Yields:
+        bytes: Consecutive parts of the PDF, one per finished page (the last
+        part also holds the trailer)
+    """
+    try:
+        # Create PDF with landscape orientation
+        c = canvas.Canvas(io.BytesIO(), pagesize=PAGE_SIZE)
+        width, height = PAGE_SIZE
+        writer = _PageWriter(c)
+        title = f"MOTO ALC SIGNAL FLOWCHART ({datetime.now().strftime('%d-%m-%Y %H:%M')})"
         
-        for i, device in enumerate(chain_data):
-            x, y = positions[i]
-            
-            # Draw Split Background inside Circle
-            c.saveState()
-            
-            # Create a circular clipping path
-            circle_path = c.beginPath()
-            circle_path.circle(x, y, node_radius)
-            c.clipPath(circle_path, stroke=0, fill=0)
-            
-            # Background
-            c.setFillColor(colors.HexColor('#4A4A4A'))
-            c.rect(x - node_radius, y - node_radius, node_radius * 2, node_radius * 2, fill=1, stroke=0)
-            
-            # Left protocol color
-            in_proto = device.get('raw_data', {}).get('input_type', '-')
-            if in_proto and in_proto != '-':
-                c.setFillColor(get_protocol_color(in_proto))
-                # Draw left polygon: (0,0) to (70%,0) to (45%,100%) to (0,100%)
-                w, h = node_radius * 2, node_radius * 2
-                px, py = x - node_radius, y - node_radius
-                left_path = c.beginPath()
-                left_path.moveTo(px, py + h)
-                left_path.lineTo(px + w * 0.7, py + h)
-                left_path.lineTo(px + w * 0.45, py)
-                left_path.lineTo(px, py)
-                left_path.close()
-                c.drawPath(left_path, stroke=0, fill=1)
-                
-            # Right protocol color
-            out_proto = device.get('raw_data', {}).get('output_type', '-')
-            if out_proto and out_proto != '-':
-                c.setFillColor(get_protocol_color(out_proto))
-                # Draw right polygon: (70%,0) to (100%,0) to (100%,100%) to (45%,100%)
-                w, h = node_radius * 2, node_radius * 2
-                px, py = x - node_radius, y - node_radius
-                right_path = c.beginPath()
-                right_path.moveTo(px + w * 0.7, py + h)
-                right_path.lineTo(px + w, py + h)
-                right_path.lineTo(px + w, py)
-                right_path.lineTo(px + w * 0.45, py)
-                right_path.close()
-                c.drawPath(right_path, stroke=0, fill=1)
-                
-            c.restoreState()
-            
-            # Draw circle border
-            c.setStrokeColor(colors.HexColor('#222222'))
-            c.setLineWidth(1)
-            c.circle(x, y, node_radius, fill=0, stroke=1)
-            
-            # Try to draw image inside
-            filename = device.get('image')
-            if filename:
-                img_path = os.path.join(Config.IMAGE_FOLDER, filename)
-                if os.path.exists(img_path):
-                    try:
-                        # reportlab handles transparent pngs pretty well directly if pillow is installed
-                        img_size = node_radius * 1.5
-                        c.drawImage(img_path, x - img_size/2, y - img_size/2, width=img_size, height=img_size, mask='auto', preserveAspectRatio=True)
-                    except Exception as e:
-                        logger.warning(f"Could not draw image for {device.get('name')}: {e}")
-                    
-            # Text below node
+        if not chain_data:
+            _draw_header(c, width, height, title)
+            c.setFont("Helvetica", 12)
             c.setFillColor(colors.black)
-            c.setFont("Helvetica-Bold", 9)
-            
-            # Truncate and split name
-            name = device.get('name', 'Unknown')
-            if len(name) > 20:
-                words = name.split()
-                line1 = " ".join(words[:len(words)//2])
-                line2 = " ".join(words[len(words)//2:])
-                c.drawCentredString(x, y - node_radius - 15, line1)
-                c.drawCentredString(x, y - node_radius - 26, line2)
-            else:
-                c.drawCentredString(x, y - node_radius - 15, name)
-                
-            c.setFillColor(colors.HexColor('#00D9FF'))
-            c.setFont("Helvetica", 8)
-            lat = f"Lat: {device.get('latency', 0):.2f}ms"
-            c.drawCentredString(x, y - node_radius - 36, lat)
-
-        # Draw Footer with Total Latency
-        c.setFillColor(colors.HexColor('#323d4d')) # Dark blue/gray requested by user
-        c.rect(0, 0, width, 50, fill=1, stroke=0)
-        c.setFillColor(colors.white)
-        c.setFont("Helvetica-Bold", 12)
-        c.drawRightString(width - 20, 20, f"TOTAL LATENCY: {total_latency:.2f} ms")
+            c.drawString(50, height - 80, "No devices in signal chain.")
+            c.showPage()
+            yield writer.finish()
+            return
         
-        # Draw Logo in Footer
-        try:
-            logo_path = os.path.join("static", "images", "logo_buttom.svg")
-            if os.path.exists(logo_path):
-                logo = svg2rlg(logo_path)
-                if logo:
-                    # Scale down the logo proportionately if it's too big, typical height for footer ~30px
-                    scale_factor = 30.0 / getattr(logo, 'height', 100)
-                    logo.scale(scale_factor, scale_factor)
-                    renderPDF.draw(logo, c, 20, 10)
-        except Exception as e:
-            logger.warning(f"Could not draw logo in PDF footer: {e}")
+        nodes_per_row, rows_per_page = _grid(width, height)
+        per_page = nodes_per_row * rows_per_page
+        pages = -(-len(chain_data) // per_page)
         
-        # Save PDF
-        c.save()
-        buf.seek(0)
-        return buf.getvalue()
+        for page in range(1, pages + 1):
+            start = (page - 1) * per_page
+            _draw_page(c, chain_data, start, min(per_page, len(chain_data) - start),
+                       page, pages, title, total_latency)
+            c.showPage()
+            if page < pages:
+                yield writer.flush()
+        yield writer.finish()
     
     except Exception as e:
         logger.error(f"Error generating flowchart PDF: {e}")
         raise
+
+
+def generate_flowchart_pdf(chain_data: list, total_latency: float) -> bytes:
+    """
+    Generate a professional flowchart PDF from signal chain data.
+    
+    Returns:
+        bytes: The whole document (see iter_flowchart_pdf to stream it)
+    """
+    return b''.join(iter_flowchart_pdf(chain_data, total_latency))
@@ -0,0 +1,183 @@
+"""
+Incremental popularity aggregation over the traffic log.
+
+Instead of re-reading the whole log, the tracker remembers the byte offset
+it has consumed and only parses lines appended since. State is checkpointed
+to disk so a restart resumes from the same offset.
+"""
+import csv
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PopularityTracker:
+    """Per-device and per-brand event counts plus time-decayed trending scores."""
+
+    def __init__(self, log_file: str, checkpoint_file: Optional[str] = None,
+                 half_life_hours: float = 72.0):
+        self.log_file = log_file
+        self.checkpoint_file = checkpoint_file
+        self.decay = math.log(2) / (half_life_hours * 3600.0)
+        self._lock = threading.Lock()
+        self._reset()
+        self._load_checkpoint()
+
+    def _reset(self) -> None:
+        """Forget all aggregated state (log rotated or truncated)."""
+        self.file_id: Optional[Tuple[int, int]] = None
+        self.offset = 0
+        self.columns: Dict[str, int] = {}
+        self.devices: Dict[str, int] = {}
+        self.brands: Dict[str, int] = {}
+        self.trending: Dict[str, float] = {}
+        self.trending_time = 0.0  # Scores are relative to this timestamp
+
+    def _load_checkpoint(self) -> None:
+        """Resume from the checkpoint file if it matches the current log."""
+        if not self.checkpoint_file or not os.path.exists(self.checkpoint_file):
+            return
+        try:
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.file_id = tuple(state['file_id']) if state.get('file_id') else None
+            self.offset = state['offset']
+            self.columns = state['columns']
+            self.devices = state['devices']
+            self.brands = state['brands']
+            self.trending = state['trending']
+            self.trending_time = state['trending_time']
+            logger.info(f"Resumed popularity from offset {self.offset}")
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable popularity checkpoint: {e}")
+            self._reset()
+
+    def _save_checkpoint(self) -> None:
+        """Atomically write the current state to the checkpoint file."""
+        if not self.checkpoint_file:
+            return
+        tmp_path = f"{self.checkpoint_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'file_id': self.file_id,
+                    'offset': self.offset,
+                    'columns': self.columns,
+                    'devices': self.devices,
+                    'brands': self.brands,
+                    'trending': self.trending,
+                    'trending_time': self.trending_time,
+                }, f)
+            os.replace(tmp_path, self.checkpoint_file)
+        except Exception as e:
+            logger.warning(f"Could not write popularity checkpoint: {e}")
+
+    def update(self) -> bool:
+        """
+        Consume lines appended to the log since the last update.
+
+        Returns:
+            bool: True if any new events were aggregated
+        """
+        with self._lock:
+            try:
+                st = os.stat(self.log_file)
+            except OSError:
+                return False
+
+            file_id = (st.st_dev, st.st_ino)
+            if file_id != self.file_id or st.st_size < self.offset:
+                if self.file_id is not None:
+                    logger.info("Traffic log rotated or truncated, recounting popularity")
+                self._reset()
+                self.file_id = file_id
+
+            if st.st_size == self.offset:
+                return False
+
+            with open(self.log_file, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read(st.st_size - self.offset)
+
+            # Leave a partially written last line for the next update
+            end = data.rfind(b'\n') + 1
+            if end == 0:
+                return False
+
+            lines = data[:end].decode('utf-8', errors='replace').splitlines()
+            if self.offset == 0 and lines:
+                self.columns = {name: i for i, name in enumerate(next(csv.reader(lines[:1])))}
+                lines = lines[1:]
+
+            self._aggregate(csv.reader(lines))
+            self.offset += end
+            self._save_checkpoint()
+            return True
+
+    def _aggregate(self, rows) -> None:
+        """Add parsed log rows to counts and trending scores."""
+        device_col = self.columns.get('Device')
+        brand_col = self.columns.get('Brand')
+        time_col = self.columns.get('Timestamp')
+        if device_col is None:
+            return
+
+        events: List[Tuple[str, float]] = []
+        parsed_times: Dict[str, float] = {}
+        for row in rows:
+            if len(row) <= device_col or not row[device_col]:
+                continue
+            device = row[device_col]
+            self.devices[device] = self.devices.get(device, 0) + 1
+            if brand_col is not None and len(row) > brand_col and row[brand_col]:
+                brand = row[brand_col]
+                self.brands[brand] = self.brands.get(brand, 0) + 1
+
+            stamp = row[time_col] if time_col is not None and len(row) > time_col else ''
+            ts = parsed_times.get(stamp)
+            if ts is None:
+                try:
+                    ts = time.mktime(time.strptime(stamp, "%Y-%m-%d %H:%M:%S"))
+                except ValueError:
+                    ts = self.trending_time
+                parsed_times[stamp] = ts
+            events.append((device, ts))
+
+        if not events:
+            return
+
+        # Move the reference time forward once per batch, then add events
+        latest = max(self.trending_time, max(ts for _, ts in events))
+        if latest > self.trending_time:
+            factor = math.exp(-self.decay * (latest - self.trending_time))
+            self.trending = {d: score * factor for d, score in self.trending.items() if score * factor > 1e-6}
+            self.trending_time = latest
+        for device, ts in events:
+            self.trending[device] = self.trending.get(device, 0.0) + math.exp(-self.decay * (latest - ts))
+
+    def counts(self) -> Dict[str, int]:
+        """Copy of the per-device counts."""
+        with self._lock:
+            return dict(self.devices)
+
+    def top(self, kind: str = 'devices', limit: int = 20) -> List[Tuple[str, float]]:
+        """
+        Highest ranked entries.
+
+        Args:
+            kind: 'devices', 'brands' or 'trending'
+            limit: Number of entries
+
+        Returns:
+            List of (name, count or score) pairs, best first
+        """
+        with self._lock:
+            source = {'devices': self.devices, 'brands': self.brands, 'trending': self.trending}[kind]
+            items = list(source.items())
+        return sorted(items, key=lambda item: (-item[1], item[0]))[:limit]
@@ -0,0 +1,270 @@
+"""
+Sampled request profiling with cProfile.
+
+When enabled, every Nth request, and any request whose ``X-Profile-Token``
+header matches the configured secret, runs under cProfile. Each profile is
+written to the dump directory as a ``.pstats`` file (open it with
+``python -m pstats`` or snakeviz) next to a ``.txt`` summary of the top
+functions by cumulative time. File names carry the route and the duration,
+and the oldest dumps are removed once the directory holds more than the
+configured number.
+
+The profiler wraps the WSGI app, so the whole request is covered (catalogue
+refresh in ``get_devices``, streamed audio preview bodies) without touching
+the handlers. PDF renders in the export pool are profiled in the pool
+process and merged into the request's dump.
+
+Only one request per process is profiled at a time. On Python 3.12+ a
+cProfile profiler sees every thread of the interpreter, so profiles taken
+in a threaded worker can include calls from concurrent requests. When
+profiling is disabled the middleware is not installed at all.
+"""
+import os
+import re
+import hmac
+import time
+import glob
+import pstats
+import cProfile
+import logging
+import itertools
+import threading
+from io import StringIO
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from werkzeug.exceptions import HTTPException
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'X-Profile-Token'
+_HEADER_ENVIRON = 'HTTP_' + HEADER.upper().replace('-', '_')
+
+# Stats from other processes, collected for the request profiled in this thread
+_local = threading.local()
+
+
+def active() -> bool:
+    """Whether the current thread is running a profiled request."""
+    return getattr(_local, 'extra', None) is not None
+
+
+def add_stats(stats: Dict) -> None:
+    """
+    Merge raw profile stats from another process into the current request.
+
+    Args:
+        stats: ``Profile.stats`` mapping, as returned by profile_call
+    """
+    extra = getattr(_local, 'extra', None)
+    if extra is not None and stats:
+        extra.append(stats)
+
+
+def profile_call(func: Callable, *args) -> Tuple[Any, Dict]:
+    """
+    Run func under cProfile (used inside pool processes).
+
+    Returns:
+        tuple: (func result, raw stats mapping, picklable)
+    """
+    profile = cProfile.Profile()
+    result = profile.runcall(func, *args)
+    profile.create_stats()
+    return result, profile.stats
+
+
+class _Session:
+    """Profile and bookkeeping of one profiled request."""
+
+    def __init__(self, route: str, reason: str):
+        self.route = route
+        self.reason = reason
+        self.status = ''
+        self.profile = cProfile.Profile()
+        self.extra: List[Dict] = []
+        self.started = time.perf_counter()
+
+    def call(self, func: Callable, *args):
+        """Run func with the profiler enabled."""
+        _local.extra = self.extra
+        self.profile.enable()
+        try:
+            return func(*args)
+        finally:
+            self.profile.disable()
+            _local.extra = None
+
+
+class _ProfiledBody:
+    """Response body that profiles its iteration and writes the dump on close."""
+
+    def __init__(self, profiler: 'RequestProfiler', session: _Session, environ: dict,
+                 iterable: Iterable[bytes]):
+        self._profiler = profiler
+        self._session = session
+        self._environ = environ
+        self._iterable = iterable
+
+    def __iter__(self):
+        iterator = iter(self._iterable)
+        while True:
+            try:
+                chunk = self._session.call(next, iterator)
+            except StopIteration:
+                return
+            yield chunk
+
+    def close(self) -> None:
+        try:
+            close = getattr(self._iterable, 'close', None)
+            if close is not None:
+                self._session.call(close)
+        finally:
+            self._profiler._finish(self._session, self._environ)
+
+
+class RequestProfiler:
+    """
+    WSGI middleware that profiles sampled requests.
+
+    Args:
+        wsgi_app: Wrapped WSGI application
+        url_map: Flask URL map, used to tag dumps with the route pattern
+        directory: Dump directory, created on first dump
+        sample_every: Profile every Nth request (0 disables sampling)
+        secret: X-Profile-Token value that profiles a request ('' disables)
+        max_dumps: Profiles kept in the directory, oldest removed first
+        top_n: Functions listed in each summary
+    """
+
+    def __init__(self, wsgi_app: Callable, url_map, directory: str, sample_every: int = 0,
+                 secret: str = '', max_dumps: int = 50, top_n: int = 30):
+        self.wsgi_app = wsgi_app
+        self.url_map = url_map
+        self.directory = directory
+        self.sample_every = sample_every
+        self.secret = secret
+        self._secret_bytes = secret.encode('utf-8')
+        self.max_dumps = max_dumps
+        self.top_n = top_n
+        self._counter = itertools.count(1)
+        self._busy = threading.Lock()
+        self._dumps = itertools.count(1)
+        logger.info(f"Request profiling enabled (every {sample_every or '-'} requests, "
+                    f"header {'on' if secret else 'off'}), dumps in {directory}")
+
+    def _reason(self, environ: dict) -> Optional[str]:
+        """Why this request should be profiled, or None."""
+        if self.secret:
+            token = environ.get(_HEADER_ENVIRON)
+            if token is not None and self._token_matches(token):
+                return 'header'
+        if self.sample_every > 0 and next(self._counter) % self.sample_every == 0:
+            return 'sample'
+        return None
+
+    def _token_matches(self, token: str) -> bool:
+        """
+        Constant-time check of the profiling header against the secret.
+
+        compare_digest only takes ASCII strings, so both sides are compared
+        as bytes: WSGI passes header values decoded as latin-1, which gives
+        back the bytes the client sent.
+        """
+        try:
+            sent = token.encode('latin-1')
+        except UnicodeEncodeError:  # Not a WSGI header value
+            return False
+        return hmac.compare_digest(sent, self._secret_bytes)
+
+    def _route(self, environ: dict) -> str:
+        """Route pattern of a request (bounded set of dump names)."""
+        try:
+            rule, _ = self.url_map.bind_to_environ(environ).match(return_rule=True)
+            return rule.rule
+        except HTTPException:
+            return '<unmatched>'
+
+    def __call__(self, environ: dict, start_response: Callable):
+        reason = self._reason(environ)
+        if reason is None:
+            return self.wsgi_app(environ, start_response)
+        if not self._busy.acquire(blocking=False):
+            logger.debug(f"Skipping profile of {environ.get('PATH_INFO')}: another request is being profiled")
+            return self.wsgi_app(environ, start_response)
+
+        try:
+            session = _Session(self._route(environ), reason)
+        except Exception:
+            self._busy.release()
+            raise
+
+        def profiled_start_response(status, headers, exc_info=None):
+            session.status = status.split(' ', 1)[0]
+            return start_response(status, headers, exc_info)
+
+        try:
+            iterable = session.call(self.wsgi_app, environ, profiled_start_response)
+        except BaseException:
+            self._finish(session, environ)
+            raise
+        return _ProfiledBody(self, session, environ, iterable)
+
+    def _finish(self, session: _Session, environ: dict) -> None:
+        """Write the dump of a finished request and release the profiler."""
+        try:
+            self._write_dump(session, environ, time.perf_counter() - session.started)
+        except Exception as e:
+            logger.error(f"Error writing request profile: {e}")
+        finally:
+            self._busy.release()
+
+    def _write_dump(self, session: _Session, environ: dict, duration: float) -> None:
+        """Write the .pstats file and its summary, then prune old dumps."""
+        stats = pstats.Stats(session.profile)
+        for raw in session.extra:
+            other = pstats.Stats()
+            other.stats = raw
+            other.get_top_level_stats()
+            stats.add(other)
+
+        method = environ.get('REQUEST_METHOD', 'GET')
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', session.route).strip('_') or 'root'
+        base = os.path.join(
+            self.directory,
+            f"{time.strftime('%Y%m%d-%H%M%S')}_{method}_{slug}_{duration * 1000:.0f}ms"
+            f"_{os.getpid()}-{next(self._dumps)}"
+        )
+        os.makedirs(self.directory, exist_ok=True)
+        stats.dump_stats(base + '.pstats')
+
+        summary = StringIO()
+        query = environ.get('QUERY_STRING')
+        summary.write(
+            f"route: {method} {session.route}\n"
+            f"path: {environ.get('PATH_INFO', '')}{'?' + query if query else ''}\n"
+            f"status: {session.status or '-'}\n"
+            f"duration_ms: {duration * 1000:.1f}\n"
+            f"reason: {session.reason}\n"
+            f"pid: {os.getpid()}\n\n"
+        )
+        stats.stream = summary
+        stats.sort_stats('cumulative').print_stats(self.top_n)
+        with open(base + '.txt', 'w', encoding='utf-8') as f:
+            f.write(summary.getvalue())
+
+        logger.info(f"Profiled {method} {session.route} ({duration * 1000:.1f} ms): {base}.pstats")
+        self._prune()
+
+    def _prune(self) -> None:
+        """Remove the oldest dumps beyond max_dumps."""
+        dumps = glob.glob(os.path.join(self.directory, '*.pstats'))
+        if len(dumps) <= self.max_dumps:
+            return
+        dumps.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+        for path in dumps[:len(dumps) - self.max_dumps]:
+            for stale in (path, path[:-len('.pstats')] + '.txt'):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
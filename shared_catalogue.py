@@ -0,0 +1,175 @@
+"""
+Catalogue state shared between gunicorn workers.
+
+One process at a time builds the catalogue, holding an exclusive flock on
+``catalogue.lock``, and publishes the parsed handler state (the same state
+the catalogue snapshot pickles) as ``catalogue-<sequence>.bin``. A small
+memory-mapped header holds the latest sequence number, so a worker notices
+a new catalogue with one memory read and restores it from the mapped blob
+instead of parsing the sources itself.
+
+Each publication records a fingerprint per source (device CSVs, network
+config, images, parser code) as of when that source was last loaded. A
+builder only reloads the sources whose fingerprint changed since, so a
+change on disk is parsed once however many workers notice it.
+
+Needs ``fcntl`` (not on Windows); without it every process builds its own
+catalogue, see available().
+"""
+import os
+import mmap
+import glob
+import pickle
+import struct
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks
+    fcntl = None
+from snapshot import SNAPSHOT_MAGIC
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct('<8sQ')  # magic, sequence of the latest blob
+_HEADER_MAGIC = b'ALCSHRD1'
+_HEADER_SIZE = 4096
+_BLOBS_KEPT = 2  # A reader may still be opening the previous blob
+
+
+def available() -> bool:
+    """Whether this platform can share a catalogue between processes."""
+    return fcntl is not None
+
+
+class SharedCatalogue:
+    """
+    Publishes and adopts handler state through files in a shared directory.
+
+    Args:
+        directory: Directory shared by all workers (tmpfs is ideal)
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.adopted = 0  # Sequence of the state this process holds
+        self.fingerprints: Dict[str, str] = {}  # Per-source fingerprints of that state
+        self._lock_pid: Optional[int] = None
+        self._lock_file = None
+        self._thread_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        with self.building():
+            with open(os.path.join(directory, 'catalogue.header'), 'a+b') as f:
+                if os.fstat(f.fileno()).st_size < _HEADER_SIZE:
+                    f.truncate(_HEADER_SIZE)
+                self._header = mmap.mmap(f.fileno(), _HEADER_SIZE)
+            magic, _ = _HEADER.unpack_from(self._header, 0)
+            if magic != _HEADER_MAGIC:
+                _HEADER.pack_into(self._header, 0, _HEADER_MAGIC, 0)
+
+    @property
+    def sequence(self) -> int:
+        """Sequence number of the latest published state."""
+        return _HEADER.unpack_from(self._header, 0)[1]
+
+    def changed(self) -> bool:
+        """Whether a newer state was published than this process holds (no syscall)."""
+        return _HEADER.unpack_from(self._header, 0)[1] != self.adopted
+
+    @contextmanager
+    def building(self) -> Iterator[None]:
+        """
+        Hold the builder lock across processes (blocks until available).
+
+        flock belongs to the open file, which forked workers would share,
+        so every process opens the lock file itself.
+        """
+        with self._thread_lock:
+            if self._lock_pid != os.getpid():
+                self._lock_file = open(os.path.join(self.directory, 'catalogue.lock'), 'a+b')
+                self._lock_pid = os.getpid()
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _blob_path(self, sequence: int) -> str:
+        return os.path.join(self.directory, f"catalogue-{sequence}.bin")
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        """
+        Load the latest published state if it is newer than the adopted one.
+
+        The blob is unpickled straight from a read-only mapping, without
+        reading it into a bytes copy first. Call adopt() once the state has
+        been restored.
+
+        Returns:
+            dict: {'sequence', 'fingerprints', 'state'}, or None when there is
+            nothing newer or it cannot be read
+        """
+        sequence = self.sequence
+        if sequence == 0 or sequence == self.adopted:
+            return None
+        try:
+            with open(self._blob_path(sequence), 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    if mapped[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                        logger.warning(f"Ignoring shared catalogue with unknown format: {f.name}")
+                        return None
+                    with memoryview(mapped) as view:
+                        published = pickle.loads(view[len(SNAPSHOT_MAGIC):])
+        except Exception as e:
+            logger.warning(f"Could not read shared catalogue {sequence}: {e}")
+            return None
+        published['sequence'] = sequence
+        return published
+
+    def adopt(self, published: Dict[str, Any]) -> None:
+        """Record that this process now holds a published state."""
+        self.adopted = published['sequence']
+        self.fingerprints = published['fingerprints']
+
+    def publish(self, fingerprints: Dict[str, str], state: Dict[str, Any]) -> int:
+        """
+        Publish handler state for the other workers. Call while building().
+
+        Args:
+            fingerprints: Per-source fingerprints the state was loaded at
+            state: Handler states to pickle
+
+        Returns:
+            int: Sequence number of the publication
+        """
+        sequence = self.sequence + 1
+        path = self._blob_path(sequence)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(SNAPSHOT_MAGIC)
+                pickle.dump({'fingerprints': fingerprints, 'state': state}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        _HEADER.pack_into(self._header, 0, _HEADER_MAGIC, sequence)
+        self.adopted = sequence
+        self.fingerprints = dict(fingerprints)
+        logger.info(f"Published shared catalogue {sequence}")
+
+        for stale in glob.glob(os.path.join(self.directory, 'catalogue-*.bin')):
+            try:
+                if int(os.path.basename(stale)[len('catalogue-'):-len('.bin')]) <= sequence - _BLOBS_KEPT:
+                    os.remove(stale)
+            except (ValueError, OSError):
+                pass
+        return sequence
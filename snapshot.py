@@ -0,0 +1,115 @@
+"""
+Compiled catalogue snapshot.
+
+Parsed handler state (image map, network configs, device catalogue with its
+indexes) is pickled into one binary file, keyed by a fingerprint of every
+source file and of the modules that parse them. Startup loads the snapshot
+instead of re-parsing when nothing changed.
+"""
+import os
+import pickle
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b'ALCSNAP1'
+
+# Modules whose code shapes the snapshot; editing them invalidates it
+SNAPSHOT_MODULES = (
+    'bulk_loader.py', 'catalogue.py', 'chains.py', 'csv_handler.py', 'device_index.py',
+    'image_handler.py', 'snapshot.py', 'utils.py',
+)
+
+
+def source_fingerprint(paths: Iterable[str]) -> str:
+    """
+    Hash the path, size and mtime of every file under the given paths.
+
+    Args:
+        paths: Files or directories (walked recursively); missing paths
+            are part of the fingerprint too
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    full_path = os.path.join(root, name)
+                    st = os.stat(full_path)
+                    digest.update(f"{full_path}\0{st.st_size}\0{st.st_mtime_ns}\n".encode('utf-8'))
+        elif os.path.exists(path):
+            st = os.stat(path)
+            digest.update(f"{path}\0{st.st_size}\0{st.st_mtime_ns}\n".encode('utf-8'))
+        else:
+            digest.update(f"{path}\0missing\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class CatalogueSnapshot:
+    """Reads and writes the snapshot file for a set of source paths."""
+
+    def __init__(self, path: str, sources: Iterable[str]):
+        self.path = path
+        module_dir = os.path.dirname(os.path.abspath(__file__))
+        self.sources = list(sources) + [os.path.join(module_dir, m) for m in SNAPSHOT_MODULES]
+
+    def fingerprint(self) -> str:
+        """Fingerprint of the current sources."""
+        return source_fingerprint(self.sources)
+
+    def load(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """
+        Load the snapshot if it was built from the same sources.
+
+        Args:
+            fingerprint: Current source fingerprint
+
+        Returns:
+            dict: Handler states, or None if missing, stale or unreadable
+        """
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                    logger.warning(f"Ignoring snapshot with unknown format: {self.path}")
+                    return None
+                stored = f.read(32).decode('ascii')
+                if stored != fingerprint:
+                    logger.info("Catalogue sources changed, snapshot is stale")
+                    return None
+                return pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable snapshot: {e}")
+            return None
+
+    def save(self, fingerprint: str, state: Dict[str, Any]) -> None:
+        """
+        Atomically write handler states under a fingerprint.
+
+        Args:
+            fingerprint: Source fingerprint the state was built from
+            state: Handler states to pickle
+        """
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(SNAPSHOT_MAGIC)
+                f.write(fingerprint.encode('ascii'))
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+            logger.info(f"Wrote catalogue snapshot to {self.path}")
+        except Exception as e:
+            logger.warning(f"Could not write catalogue snapshot: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
@@ -38,6 +38,23 @@ document.addEventListener('DOMContentLoaded', () => {
     const MEASURED_SOURCE = '(moto measured)';
     const measuredIcon = `<img src="/static/images/measured.svg" class="measured-icon-file" alt="Measured">`;
 
+    // Resized variant when the server has one, else the original file
+    function imageSrc(device, variant) {
+        return device.thumb?.[variant] || `/static/images/${device.image}`;
+    }
+
+    // Retry with the original image once (e.g. thumb URL from an old saved chain), then show the fallback icon
+    window.imageFallback = (img) => {
+        const fallback = img.dataset.fallback;
+        if (fallback && img.getAttribute('src') !== fallback) {
+            img.dataset.fallback = '';
+            img.src = fallback;
+            return;
+        }
+        img.style.display = 'none';
+        img.nextElementSibling.style.display = 'flex';
+    };
+
 
     // ... (rest of init code) ...
 
@@ -387,6 +404,7 @@ document.addEventListener('DOMContentLoaded', () => {
                         name: device.name,
                         brand: device.brand,
                         image: device.image,
+                        thumb: device.thumb,
                         source: device.source,
                         variants: [],
                         hasValid: false
@@ -555,7 +573,7 @@ document.addEventListener('DOMContentLoaded', () => {
         return `
             <div class="card-media">
                 ${bgHtml}
-                <img src="/static/images/${group.image}" alt="${group.name}" class="device-image" onload="this.style.opacity=1" onerror="this.style.display='none'; this.nextElementSibling.style.display='flex'">
+                <img src="${imageSrc(group, 'card')}" data-fallback="/static/images/${group.image}" alt="${group.name}" class="device-image" onload="this.style.opacity=1" onerror="imageFallback(this)">
                 <div class="fallback-icon">
                     <svg viewBox="0 0 24 24" width="48" height="48" stroke="currentColor" stroke-width="1" fill="none" stroke-linecap="round" stroke-linejoin="round"><rect x="4" y="4" width="16" height="16" rx="2" ry="2"></rect><circle cx="12" cy="12" r="3"></circle><line x1="12" y1="9" x2="12" y2="15"></line><line x1="9" y1="12" x2="15" y2="12"></line></svg>
                 </div>
@@ -1142,7 +1160,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 <div class="chain-item-info">
                     <div class="chain-icon">
                         ${getProtocolBgHtml(item.raw_data?.input_type, item.raw_data?.output_type)}
-                        <img src="/static/images/${item.image}" onload="this.style.opacity=1" onerror="this.style.display='none'; this.nextElementSibling.style.display='flex'">
+                        <img src="${imageSrc(item, 'chain')}" data-fallback="/static/images/${item.image}" onload="this.style.opacity=1" onerror="imageFallback(this)">
                         <div class="chain-fallback">
                             <svg viewBox="0 0 24 24" width="20" height="20" stroke="currentColor" stroke-width="2" fill="none"><circle cx="12" cy="12" r="3"></circle></svg>
                         </div>
@@ -1525,6 +1543,7 @@ document.addEventListener('DOMContentLoaded', () => {
             if (sortType === 'name_desc') return b.name.localeCompare(a.name);
             if (sortType === 'latency_asc') return a.latency - b.latency;
             if (sortType === 'latency_desc') return b.latency - a.latency;
+            if (sortType === 'popularity') return (b.popularity || 0) - (a.popularity || 0);
             return 0;
         });
         renderDeviceLibrary(filtered);
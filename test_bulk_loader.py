@@ -0,0 +1,91 @@
+"""
+Unit tests for the pandas device loader.
+
+Run with:
+    python -m unittest test_bulk_loader -v
+"""
+import os
+import shutil
+import logging
+import tempfile
+import unittest
+
+import bulk_loader
+from config import Config
+from catalogue import RAW_FIELDS
+from image_handler import ImageHandler
+from csv_handler import DeviceDataHandler, NetworkConfigHandler
+from tools.check_bulk_loader import EDGE_CASES
+
+COLUMNS = ('ids', 'latency', 'names', 'brands', 'display_time', 'images', 'sources')
+
+
+@unittest.skipUnless(bulk_loader.available(), "pandas is not installed")
+class TestBulkLoaderEquivalence(unittest.TestCase):
+    """The pandas loader must build the same catalogue as the csv loader."""
+
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.CRITICAL)
+        cls.image_handler = ImageHandler(Config.IMAGE_FOLDER)
+        cls.image_handler.scan()
+        cls.network_handler = NetworkConfigHandler(Config.NETWORK_CNF_FILE)
+        cls.network_handler.load()
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='alc-loader-')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def load(self, csv_dir, loader):
+        handler = DeviceDataHandler(csv_dir, self.network_handler,
+                                    image_finder=self.image_handler.find, loader=loader)
+        handler.COLUMN_PARSE_MIN_BYTES = 0  # Parse every file column-wise
+        return handler.load()
+
+    def assertSameCatalogue(self, csv_dir):
+        expected = self.load(csv_dir, 'csv')
+        actual = self.load(csv_dir, 'pandas')
+        self.assertEqual(len(expected), len(actual))
+        for column in COLUMNS:
+            self.assertEqual(list(getattr(expected, column)), list(getattr(actual, column)), column)
+        for field in RAW_FIELDS:
+            self.assertEqual(expected.raw_columns[field], actual.raw_columns[field], field)
+        self.assertEqual([d.to_dict() for d in expected], [d.to_dict() for d in actual])
+
+    def test_shipped_data(self):
+        self.assertSameCatalogue(Config.CSV_DIR)
+
+    def test_edge_cases(self):
+        for filename, text in EDGE_CASES.items():
+            with self.subTest(filename=filename):
+                case_dir = os.path.join(self.tmp_dir, os.path.splitext(filename)[0])
+                os.makedirs(case_dir)
+                with open(os.path.join(case_dir, filename), 'w', encoding='utf-8', newline='') as f:
+                    f.write(text)
+                self.assertSameCatalogue(case_dir)
+
+    def test_bad_encoding(self):
+        with open(os.path.join(self.tmp_dir, 'bad_encoding.csv'), 'wb') as f:
+            f.write(b"Device Name,Latency\nCaf\xe9 Unit,1ms\n")
+        self.assertSameCatalogue(self.tmp_dir)
+
+    def test_small_files_use_row_path(self):
+        with open(os.path.join(self.tmp_dir, 'small.csv'), 'w', encoding='utf-8') as f:
+            f.write(EDGE_CASES['short_rows.csv'])
+        handler = DeviceDataHandler(self.tmp_dir, self.network_handler, loader='pandas')
+        original = bulk_loader.parse_device_columns
+        bulk_loader.parse_device_columns = None  # Would raise if called
+        try:
+            self.assertEqual(handler.load().names, ['Foo Box'])
+        finally:
+            bulk_loader.parse_device_columns = original
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Unit tests for chain evaluation.
+
+Run with:
+    python -m unittest test_chains -v
+"""
+import unittest
+
+from catalogue import DeviceCatalogue
+from chains import ChainEvaluator
+
+
+def _device(device_id, name, latency, input_type, output_type, input_sr='-', output_sr='-'):
+    return {
+        'id': device_id,
+        'name': name,
+        'brand': name.split()[0],
+        'latency': latency,
+        'display_time': f"{latency}ms",
+        'image': None,
+        'source': '-',
+        'raw_data': {
+            'input_type': input_type,
+            'output_type': output_type,
+            'input_sr': input_sr,
+            'output_sr': output_sr,
+            'input_count': '2',
+            'output_count': '2',
+        },
+    }
+
+
+class TestChainEvaluator(unittest.TestCase):
+    """Totals must come from the device each node was saved from."""
+
+    def setUp(self):
+        catalogue = DeviceCatalogue()
+        catalogue.append(_device(1, 'Allen & Heath CDM48', 1.48, 'Analog', 'AES3', output_sr='96kHz'))
+        catalogue.append(_device(2, 'Soniflex RB-ADDA', 0.105, 'AES3', 'Analog', input_sr='96kHz'))
+        self.evaluator = ChainEvaluator(catalogue)
+
+    def test_current_ids_use_catalogue(self):
+        soniflex = _device(2, 'Soniflex RB-ADDA', 9.0, 'AES3', 'Analog', input_sr='96kHz')
+        result = self.evaluator.evaluate([1, soniflex])
+        self.assertEqual(result['total_latency'], 1.585)
+        self.assertEqual(result['stale'], [])
+        self.assertTrue(result['valid'])
+
+    def test_stale_id_uses_node_data(self):
+        # Saved when the Soniflex row had id 1, which is now the CDM48
+        soniflex = _device(1, 'Soniflex RB-ADDA', 0.24, 'Analog', 'AES3', output_sr='48kHz')
+        result = self.evaluator.evaluate([soniflex])
+        self.assertEqual(result['total_latency'], 0.24)
+        self.assertEqual(result['stale'], [{'id': 1, 'name': 'Soniflex RB-ADDA'}])
+
+    def test_stale_mode_uses_node_data(self):
+        # Same device name, but the id now belongs to another mode
+        cdm48 = _device(1, 'Allen & Heath CDM48', 2.0, 'Analog', 'AES3', output_sr='48kHz')
+        result = self.evaluator.evaluate([cdm48])
+        self.assertEqual(result['total_latency'], 2.0)
+        self.assertEqual(len(result['stale']), 1)
+
+    def test_unknown_id_uses_node_data(self):
+        node = _device(99, 'Gone Device', 3.0, 'Analog', 'Analog')
+        self.assertEqual(self.evaluator.evaluate([node])['total_latency'], 3.0)
+
+    def test_stale_id_without_node_data(self):
+        with self.assertRaises(ValueError):
+            self.evaluator.evaluate([{'id': 1, 'name': 'Soniflex RB-ADDA'}])
+        with self.assertRaises(ValueError):
+            self.evaluator.evaluate([99])
+
+
+if __name__ == '__main__':
+    unittest.main()
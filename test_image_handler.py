@@ -0,0 +1,64 @@
+"""
+Unit tests for device image matching.
+
+Run with:
+    python -m unittest test_image_handler -v
+"""
+import os
+import shutil
+import logging
+import tempfile
+import unittest
+
+from image_handler import ImageHandler
+
+IMAGES = (
+    'digico_sd12.png',
+    'digico_sd_rack.png',
+    'yamaha_cl5.PNG',
+    'shure_axient_digital_ad4d_ad4q.png',
+)
+
+
+class TestFuzzyImageMatch(unittest.TestCase):
+    """Fuzzy matches must never give a device another model's image."""
+
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.CRITICAL)
+        cls.image_dir = tempfile.mkdtemp(prefix='alc-images-')
+        for filename in IMAGES:
+            open(os.path.join(cls.image_dir, filename), 'wb').close()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.image_dir)
+        logging.disable(logging.NOTSET)
+
+    def setUp(self):
+        self.handler = ImageHandler(self.image_dir, fuzzy_threshold=0.75)
+        self.handler.scan()
+
+    def test_other_models_are_not_matched(self):
+        for device in ('DiGiCo SD5', 'DiGiCo SD7', 'DiGiCo SD10', 'Yamaha CL1', 'Yamaha CL3',
+                       'DiGiCo SD‑Mini Rack', 'DiGiCo SD‑Nano Rack'):
+            with self.subTest(device=device):
+                self.assertIsNone(self.handler.find(device))
+
+    def test_exact_names_still_match(self):
+        self.assertEqual(self.handler.find('DiGiCo SD12'), 'digico_sd12.png')
+        self.assertEqual(self.handler.find('Yamaha CL5'), 'yamaha_cl5.PNG')
+        self.assertEqual(self.handler.find('DiGiCo SD-Rack (MADI)'), 'digico_sd_rack.png')
+
+    def test_fuzzy_match_with_all_words(self):
+        self.assertEqual(self.handler.find('Shure Axient Digital AD4D'),
+                         'shure_axient_digital_ad4d_ad4q.png')
+
+    def test_missing_images_are_reported(self):
+        devices = [{'name': name, 'image': self.handler.find(name)}
+                   for name in ('DiGiCo SD7', 'DiGiCo SD12')]
+        self.assertEqual(self.handler.get_missing_images(devices), ['DiGiCo SD7'])
+
+
+if __name__ == '__main__':
+    unittest.main()
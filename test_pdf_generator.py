@@ -0,0 +1,115 @@
+"""
+Unit tests for the flowchart PDF writer.
+
+The page writer formats reportlab's document objects itself as pages are
+finished, so these tests check the structure of the output. Verified
+against reportlab 4.0.7 and 5.0.1.
+
+Run with:
+    python -m unittest test_pdf_generator -v
+"""
+import os
+import re
+import logging
+import unittest
+
+from config import Config
+
+try:
+    import pdf_generator
+except ImportError:  # reportlab or svglib is not installed
+    pdf_generator = None
+
+XREF_RE = re.compile(rb'startxref\s+(\d+)\s+%%EOF\s*$')
+XREF_HEADER_RE = re.compile(rb'xref\s+0 (\d+)\s+')
+PAGES_RE = re.compile(rb'<<([^<>]*/Type /Pages\b[^<>]*)>>')
+
+
+def _images(count):
+    """Raster images from the image folder to draw into nodes."""
+    names = sorted(f for f in os.listdir(Config.IMAGE_FOLDER) if f.lower().endswith('.png'))
+    return names[:count]
+
+
+def _chain(length, images):
+    return [
+        {
+            'name': f"Test Device {i}",
+            'latency': 0.5,
+            'image': images[i % len(images)] if images else None,
+            'raw_data': {'input_type': 'Analog', 'output_type': 'Dante',
+                         'input_sr': '-', 'output_sr': '48kHz'},
+        }
+        for i in range(length)
+    ]
+
+
+@unittest.skipIf(pdf_generator is None, "PDF renderer is not installed")
+class TestFlowchartPDF(unittest.TestCase):
+    """Streamed PDFs must be complete, well-formed documents."""
+
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.CRITICAL)
+        width, height = pdf_generator.PAGE_SIZE
+        nodes_per_row, rows_per_page = pdf_generator._grid(width, height)
+        cls.per_page = nodes_per_row * rows_per_page
+        cls.images = _images(3)
+
+    @classmethod
+    def tearDownClass(cls):
+        pdf_generator.clear_asset_cache()
+        logging.disable(logging.NOTSET)
+
+    def render(self, pages):
+        chain = _chain(self.per_page * (pages - 1) + 1, self.images)
+        parts = list(pdf_generator.iter_flowchart_pdf(chain, 12.5))
+        self.assertEqual(len(parts), pages)  # One part per finished page
+        return b''.join(parts)
+
+    def assertWellFormed(self, pdf, pages):
+        self.assertTrue(pdf.startswith(b'%PDF-'))
+        match = XREF_RE.search(pdf)
+        self.assertIsNotNone(match, "missing startxref")
+        start = int(match.group(1))
+        header = XREF_HEADER_RE.match(pdf, start)
+        self.assertIsNotNone(header, "startxref does not point at the xref table")
+
+        size = int(header.group(1))
+        entries = pdf[header.end():header.end() + 20 * size]
+        for number in range(1, size):
+            entry = entries[20 * number:20 * number + 20]
+            self.assertTrue(entry.endswith(b' n\r\n') or entry.endswith(b' n \n'), entry)
+            offset = int(entry[:10])
+            self.assertTrue(pdf.startswith(f"{number} 0 obj".encode('ascii'), offset),
+                            f"xref entry {number} points at {pdf[offset:offset + 20]!r}")
+        self.assertIn(f"/Size {size}".encode('ascii'), pdf[start:])
+
+        trees = PAGES_RE.findall(pdf)
+        self.assertEqual(len(trees), 1)
+        self.assertEqual(re.search(rb'/Count (\d+)', trees[0]).group(1), str(pages).encode('ascii'))
+        self.assertEqual(len(re.findall(rb'/Type /Page\b', pdf)), pages)
+
+    def test_single_page(self):
+        self.assertWellFormed(self.render(1), 1)
+
+    def test_multiple_pages_with_images(self):
+        pdf = self.render(4)
+        self.assertWellFormed(pdf, 4)
+        # Images are embedded once, not once per page that shows them
+        single = pdf_generator.generate_flowchart_pdf(_chain(len(self.images), self.images), 1.0)
+        self.assertEqual(pdf.count(b'/Subtype /Image'), single.count(b'/Subtype /Image'))
+        self.assertGreater(pdf.count(b'/Subtype /Image'), 0)
+
+    def test_empty_chain(self):
+        parts = list(pdf_generator.iter_flowchart_pdf([], 0))
+        self.assertEqual(len(parts), 1)
+        self.assertWellFormed(parts[0], 1)
+
+    def test_generate_matches_stream_layout(self):
+        chain = _chain(self.per_page + 1, self.images)
+        self.assertWellFormed(pdf_generator.generate_flowchart_pdf(chain, 1.0), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
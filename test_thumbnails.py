@@ -0,0 +1,61 @@
+"""
+Unit tests for resized image variants.
+
+Run with:
+    python -m unittest test_thumbnails -v
+"""
+import os
+import shutil
+import logging
+import tempfile
+import unittest
+
+from thumbnails import ThumbnailStore
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow renders the variants
+    Image = None
+
+
+@unittest.skipIf(Image is None, "Pillow is not installed")
+class TestThumbnailStore(unittest.TestCase):
+    """A variant URL must be servable by every process sharing the catalogue."""
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmp_dir = tempfile.mkdtemp(prefix='alc-thumbs-')
+        self.image_dir = os.path.join(self.tmp_dir, 'images')
+        os.makedirs(self.image_dir)
+        Image.new('RGB', (800, 600), (200, 30, 30)).save(os.path.join(self.image_dir, 'desk.png'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        logging.disable(logging.NOTSET)
+
+    def store(self, name):
+        return ThumbnailStore(self.image_dir, os.path.join(self.tmp_dir, name))
+
+    def test_urls_are_servable(self):
+        store = self.store('cache')
+        url = store.urls(['desk.png', None])['desk.png']['card']
+        path = store.path(url.rsplit('/', 1)[-1])
+        with Image.open(path) as img:
+            self.assertEqual(img.size, (400, 300))
+
+    def test_unknown_digest_is_not_found(self):
+        self.assertIsNone(self.store('cache').path('0123456789abcdef0123-card.webp'))
+
+    def test_second_store_serves_registered_urls(self):
+        thumbnails = self.store('builder').urls(['desk.png'])
+        worker = self.store('worker')
+        name = thumbnails['desk.png']['chain'].rsplit('/', 1)[-1]
+        self.assertIsNone(worker.path(name))
+
+        worker.register(thumbnails)
+        with Image.open(worker.path(name)) as img:
+            self.assertEqual(img.size, (180, 135))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+"""
+Resized device image variants with content-hashed URLs.
+
+Source images are large PNGs shown as small cards and chain icons. Each
+(image, size, format) variant is rendered once with Pillow, stored in an
+on-disk cache and served under a URL derived from the source file's content,
+so browsers may cache it forever.
+"""
+import os
+import re
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> bounding box in px (2x the largest CSS size)
+THUMBNAIL_SIZES = {
+    'card': 400,
+    'chain': 180,
+}
+THUMBNAIL_FORMATS = ('webp', 'png')
+RESIZABLE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+# Bump to change every URL when the rendering changes
+THUMBNAIL_VERSION = 1
+
+THUMBNAIL_NAME_RE = re.compile(r'^([0-9a-f]{20})-([a-z]+)\.([a-z]+)$')
+
+
+class ThumbnailStore:
+    """Maps images to variant URLs and renders variants on first request."""
+
+    def __init__(self, image_folder: str, cache_dir: str, quality: int = 80,
+                 url_prefix: str = '/thumbs'):
+        self.image_folder = image_folder
+        self.cache_dir = cache_dir
+        self.quality = quality
+        self.url_prefix = url_prefix
+        self._digests: Dict[str, Tuple[int, int, str]] = {}  # path -> (mtime_ns, size, digest)
+        self._sources: Dict[str, str] = {}  # digest -> image path
+        self._lock = threading.Lock()
+        self._render_locks: Dict[str, threading.Lock] = {}
+
+    def _digest(self, image: str) -> Optional[str]:
+        """Content hash of a source image, recomputed when it changes on disk."""
+        full_path = os.path.join(self.image_folder, image)
+        try:
+            st = os.stat(full_path)
+        except OSError:
+            return None
+
+        cached = self._digests.get(image)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+
+        digest = hashlib.blake2b(f"v{THUMBNAIL_VERSION}\0".encode('ascii'), digest_size=10)
+        with open(full_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        value = digest.hexdigest()
+        with self._lock:
+            self._digests[image] = (st.st_mtime_ns, st.st_size, value)
+            self._sources[value] = image
+        return value
+
+    def urls(self, images: Iterable[Optional[str]]) -> Dict[str, Dict[str, str]]:
+        """
+        Get WebP variant URLs for each distinct resizable image.
+
+        Args:
+            images: Relative image paths (None and vector images are skipped)
+
+        Returns:
+            dict: image path -> {variant name: URL}
+        """
+        result: Dict[str, Dict[str, str]] = {}
+        for image in set(images):
+            if not image or not image.lower().endswith(RESIZABLE_EXTENSIONS) or image in result:
+                continue
+            digest = self._digest(image)
+            if digest is None:
+                continue
+            result[image] = {
+                size: f"{self.url_prefix}/{digest}-{size}.webp" for size in THUMBNAIL_SIZES
+            }
+        return result
+
+    def register(self, thumbnails: Dict[str, Dict[str, str]]) -> None:
+        """
+        Learn the variant URLs of a catalogue built by another process.
+
+        A worker that adopts a shared or snapshot catalogue gets its
+        thumbnail URLs without calling urls(), so path() would not know
+        their digests. The sources are taken from the URLs themselves
+        rather than by hashing every image again.
+
+        Args:
+            thumbnails: image path -> {variant name: URL}, as from urls()
+        """
+        sources: Dict[str, str] = {}
+        for image, variants in thumbnails.items():
+            for url in variants.values():
+                match = THUMBNAIL_NAME_RE.match(url.rsplit('/', 1)[-1])
+                if match:
+                    sources[match.group(1)] = image
+        with self._lock:
+            self._sources.update(sources)
+
+    def path(self, name: str) -> Optional[str]:
+        """
+        Get the cached file for a variant name, rendering it if needed.
+
+        Args:
+            name: '<digest>-<size>.<format>' as used in variant URLs
+
+        Returns:
+            str: Path of the variant file, or None if the name is unknown
+        """
+        match = THUMBNAIL_NAME_RE.match(name)
+        if not match:
+            return None
+        digest, size, fmt = match.groups()
+        image = self._sources.get(digest)
+        if size not in THUMBNAIL_SIZES or fmt not in THUMBNAIL_FORMATS or image is None:
+            return None
+
+        target = os.path.join(self.cache_dir, name)
+        if os.path.exists(target):
+            return target
+
+        with self._lock:
+            lock = self._render_locks.setdefault(name, threading.Lock())
+        with lock:
+            if not os.path.exists(target):
+                self._render(image, THUMBNAIL_SIZES[size], fmt, target)
+        return target
+
+    def _render(self, image: str, max_px: int, fmt: str, target: str) -> None:
+        """Downscale one image into the cache directory (atomic write)."""
+        from PIL import Image
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with Image.open(os.path.join(self.image_folder, image)) as img:
+            img = img.convert('RGBA')
+            img.thumbnail((max_px, max_px), Image.LANCZOS)
+            if fmt == 'webp':
+                img.save(tmp_path, 'WEBP', quality=self.quality, method=4)
+            else:
+                img.save(tmp_path, 'PNG', optimize=True)
+        os.replace(tmp_path, target)
+        logger.info(f"Rendered {os.path.basename(target)} from {image}")
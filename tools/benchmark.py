@@ -0,0 +1,381 @@
+"""
+Offline benchmark suite for the application's hot paths.
+
+Usage (from anywhere):
+    python tools/benchmark.py [--output bench.json]
+    python tools/benchmark.py --compare baseline.json [--tolerance 0.25]
+                              [--metric-tolerance pdf_500_nodes=0.5]
+
+Runs every benchmark in-process with the Flask test client; no server is
+needed. Files the app writes (traffic log, popularity checkpoint, catalogue
+snapshot, thumbnails, log file) go to a temporary directory, so the working
+tree is left untouched.
+
+Results are written as JSON. With --compare, every metric present in both
+runs is checked against the baseline and the script exits with status 1 if
+any metric is worse by more than its tolerance (a fraction: 0.25 = 25%).
+"""
+import os
+import sys
+import csv
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timedelta
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+AUDIO_LATENCIES_MS = (1, 10, 100, 1000)
+PDF_NODE_COUNTS = (5, 50, 500)
+PDF_STREAM_NODES = 1000
+
+# Run in a fresh interpreter: module import, create_app, peak RSS
+STARTUP_SCRIPT = '''
+import json, time, resource
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.app
+created = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'create_app': created - imported,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+'''
+
+
+def sandbox_environment(work_dir: str) -> None:
+    """Point every file the app writes into work_dir (before importing config)."""
+    os.environ['TRAFFIC_LOG_FILE'] = os.path.join(work_dir, 'traffic_log.csv')
+    os.environ['POPULARITY_CHECKPOINT_FILE'] = os.path.join(work_dir, 'popularity_checkpoint.json')
+    os.environ['THUMBNAIL_CACHE_DIR'] = os.path.join(work_dir, 'thumbnail_cache')
+    os.environ['LOG_FILE'] = os.path.join(work_dir, 'app.log')
+    os.environ['SNAPSHOT_FILE'] = ''
+    os.environ['PDF_POOL_SIZE'] = '0'  # Render inline, measure reportlab not IPC
+    os.environ['LOG_LEVEL'] = 'ERROR'
+
+
+def measure(func, repeat: int, setup=None) -> dict:
+    """
+    Time a callable.
+
+    Args:
+        func: Callable to time
+        repeat: Number of timed runs
+        setup: Optional untimed callable run before each run
+
+    Returns:
+        dict: Median and min wall time in seconds
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return {
+        'value': statistics.median(timings),
+        'min': min(timings),
+        'runs': repeat,
+        'unit': 's',
+        'better': 'lower',
+    }
+
+
+def throughput(count: int, seconds: float, unit: str) -> dict:
+    """Metric for operations per second."""
+    return {'value': count / seconds, 'unit': unit, 'runs': 1, 'better': 'higher'}
+
+
+def write_traffic_log(path: str, events: int, names: list, append: bool = False) -> None:
+    """Write (or append) synthetic traffic events spread over the last 30 days."""
+    rng = random.Random(events)
+    start = datetime.now() - timedelta(days=30)
+    step = timedelta(days=30) / max(1, events)
+    with open(path, 'a' if append else 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        if not append:
+            writer.writerow(['Timestamp', 'Event', 'Device', 'Brand', 'UserID'])
+        for i in range(events):
+            name = rng.choice(names)
+            writer.writerow([
+                (start + step * i).strftime("%Y-%m-%d %H:%M:%S"),
+                rng.choice(('add_to_chain', 'view_device', 'search')),
+                name, name.split(' ')[0], f"user{rng.randrange(500)}",
+            ])
+
+
+def bench_startup(results: dict, args, work_dir: str) -> None:
+    runs = []
+    for _ in range(args.repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', STARTUP_SCRIPT], cwd=REPO_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    for key, name in (('import', 'startup_import'), ('create_app', 'startup_create_app')):
+        timings = [run[key] for run in runs]
+        results[name] = {
+            'value': statistics.median(timings),
+            'min': min(timings),
+            'runs': len(runs),
+            'unit': 's',
+            'better': 'lower',
+        }
+    results['startup_rss'] = {
+        'value': statistics.median(run['rss_mb'] for run in runs),
+        'unit': 'MB',
+        'runs': len(runs),
+        'better': 'lower',
+    }
+
+
+def bench_catalogue(results: dict, args, work_dir: str) -> None:
+    from config import Config
+    from image_handler import ImageHandler
+    from csv_handler import DeviceDataHandler, NetworkConfigHandler
+
+    images = ImageHandler(Config.IMAGE_FOLDER)
+    images.scan()
+    network = NetworkConfigHandler(Config.NETWORK_CNF_FILE)
+    network.load()
+
+    for loader in ('csv', 'pandas'):
+        results[f'catalogue_load_{loader}'] = measure(
+            lambda: DeviceDataHandler(args.csv_dir, network, image_finder=images.find,
+                                      loader=loader).load(),
+            args.repeat
+        )
+
+    handler = DeviceDataHandler(args.csv_dir, network, loader=Config.CSV_LOADER)
+    handler.load()
+    results['catalogue_reload_unchanged'] = measure(handler.load, args.repeat * 10)
+
+
+def bench_images(results: dict, args, work_dir: str) -> None:
+    from config import Config
+    from image_handler import ImageHandler
+    from csv_handler import DeviceDataHandler, NetworkConfigHandler
+
+    network = NetworkConfigHandler(Config.NETWORK_CNF_FILE)
+    network.load()
+    names = sorted(set(DeviceDataHandler(args.csv_dir, network).load().names))
+
+    results['image_scan'] = measure(lambda: ImageHandler(Config.IMAGE_FOLDER).scan(), args.repeat)
+
+    handler = ImageHandler(Config.IMAGE_FOLDER)
+
+    def find_all():
+        for name in names:
+            handler.find(name)
+
+    results['image_find_cold'] = measure(find_all, args.repeat, setup=handler.scan)
+    results['image_find_warm'] = measure(find_all, args.repeat)
+
+
+def bench_api(results: dict, args, work_dir: str) -> None:
+    import app as app_module
+    from payload import PayloadCache
+
+    client = app_module.app.test_client()
+
+    def get_data():
+        response = client.get('/api/data')
+        assert response.status_code == 200, response.status_code
+
+    def reset_payload():
+        app_module.data_payload_cache = PayloadCache()
+
+    results['api_data_cold'] = measure(get_data, args.repeat, setup=reset_payload)
+    results['api_data_cached'] = measure(get_data, args.repeat * 10)
+
+    def reset_audio():
+        app_module.audio_renderer._cache.clear()
+
+    for latency in AUDIO_LATENCIES_MS:
+        def get_audio():
+            response = client.get(f'/api/audio_preview?latency={latency}')
+            assert response.status_code == 200, response.status_code
+            response.get_data()
+        results[f'audio_preview_{latency}ms'] = measure(get_audio, args.repeat, setup=reset_audio)
+
+    events = args.track_events
+    payload = {'event': 'add_to_chain', 'device': 'DiGiCo SD12', 'brand': 'DiGiCo'}
+    started = time.perf_counter()
+    for _ in range(events):
+        client.post('/api/track', json=payload)
+    app_module.traffic_logger.flush()
+    results['track_throughput'] = throughput(events, time.perf_counter() - started, 'req/s')
+
+
+def bench_pdf(results: dict, args, work_dir: str) -> None:
+    import app as app_module
+    from pdf_generator import generate_flowchart_pdf, iter_flowchart_pdf
+
+    app_module.app  # Loads the catalogue
+    devices = [row.to_dict() for row in app_module.get_devices()]
+    for count in PDF_NODE_COUNTS:
+        chain = [devices[i % len(devices)] for i in range(count)]
+        total = sum(node['latency'] for node in chain)
+        repeat = max(1, args.repeat // 2) if count >= 500 else args.repeat
+        results[f'pdf_{count}_nodes'] = measure(
+            lambda: generate_flowchart_pdf(chain, total), repeat
+        )
+
+    # Time until the first page of a long (paginated) chain can be sent
+    chain = [devices[i % len(devices)] for i in range(PDF_STREAM_NODES)]
+    results[f'pdf_{PDF_STREAM_NODES}_nodes_first_page'] = measure(
+        lambda: next(iter_flowchart_pdf(chain, 0.0)), args.repeat
+    )
+
+
+def bench_popularity(results: dict, args, work_dir: str) -> None:
+    import app as app_module
+    from popularity import PopularityTracker
+
+    app_module.app  # Loads the catalogue
+    names = sorted(set(app_module.get_devices().names))
+    log_file = os.path.join(work_dir, 'large_traffic_log.csv')
+    write_traffic_log(log_file, args.log_events, names)
+
+    results['popularity_full_scan'] = measure(
+        lambda: PopularityTracker(log_file).update(), args.repeat
+    )
+
+    tracker = PopularityTracker(log_file)
+    tracker.update()
+    results['popularity_incremental_1k'] = measure(
+        tracker.update, args.repeat * 10,
+        setup=lambda: write_traffic_log(log_file, 1000, names, append=True)
+    )
+
+
+BENCHMARKS = {
+    'startup': bench_startup,
+    'catalogue': bench_catalogue,
+    'images': bench_images,
+    'api': bench_api,
+    'pdf': bench_pdf,
+    'popularity': bench_popularity,
+}
+
+
+def compare(current: dict, baseline: dict, tolerance: float, overrides: dict) -> list:
+    """
+    Compare metrics against a baseline run.
+
+    Returns:
+        list: (metric, baseline value, current value, change) for regressions
+    """
+    regressions = []
+    for name, metric in sorted(current['metrics'].items()):
+        base = baseline.get('metrics', {}).get(name)
+        if not base or not base['value']:
+            continue
+        allowed = overrides.get(name, tolerance)
+        change = metric['value'] / base['value'] - 1
+        worse = change if metric['better'] == 'lower' else -change
+        marker = 'REGRESSION' if worse > allowed else ''
+        print(f"  {name:32} {base['value']:12.5f} -> {metric['value']:12.5f} "
+              f"{metric['unit']:6} {change:+7.1%} {marker}")
+        if worse > allowed:
+            regressions.append((name, base['value'], metric['value'], change))
+    return regressions
+
+
+def git_revision() -> str:
+    """Current commit hash, or '' outside a git checkout."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def parse_overrides(values: list) -> dict:
+    """Parse NAME=FRACTION tolerance overrides."""
+    overrides = {}
+    for value in values:
+        name, _, fraction = value.partition('=')
+        overrides[name] = float(fraction)
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--output', default='benchmark_results.json', help="JSON results file")
+    parser.add_argument('--compare', help="Baseline JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed slowdown as a fraction (default 0.25)")
+    parser.add_argument('--metric-tolerance', action='append', default=[], metavar='NAME=FRACTION',
+                        help="Per-metric tolerance override (repeatable)")
+    parser.add_argument('--only', default='', help="Comma-separated groups: " + ','.join(BENCHMARKS))
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per metric")
+    parser.add_argument('--csv-dir', default='data', help="Device CSV directory for load benchmarks")
+    parser.add_argument('--log-events', type=int, default=200000,
+                        help="Events in the synthetic traffic log")
+    parser.add_argument('--track-events', type=int, default=2000, help="/api/track requests")
+    args = parser.parse_args()
+
+    groups = [g for g in args.only.split(',') if g] or list(BENCHMARKS)
+    unknown = set(groups) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmark groups: {', '.join(sorted(unknown))}")
+
+    work_dir = tempfile.mkdtemp(prefix='alc-bench-')
+    output = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+    os.chdir(REPO_DIR)
+    sys.path.insert(0, REPO_DIR)
+    sandbox_environment(work_dir)
+    logging.disable(logging.CRITICAL)
+
+    metrics: dict = {}
+    try:
+        for group in groups:
+            started = time.perf_counter()
+            BENCHMARKS[group](metrics, args, work_dir)
+            print(f"{group}: {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    result = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'csv_dir': args.csv_dir,
+        },
+        'metrics': metrics,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+    print(f"Wrote {len(metrics)} metrics to {output}")
+
+    if baseline_path:
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"Comparing against {baseline_path} (revision {baseline['meta'].get('revision') or '?'})")
+        regressions = compare(result, baseline, args.tolerance, parse_overrides(args.metric_tolerance))
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed beyond tolerance")
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Check that the pandas loader and the csv loader build identical catalogues.
+
+Usage (from the repo root):
+    python tools/check_bulk_loader.py [csv_dir ...]
+
+Compares every column and id of both loaders on the given directories
+(default: data) and on a set of hand-written edge cases.
+"""
+import os
+import sys
+import shutil
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from catalogue import RAW_FIELDS
+from image_handler import ImageHandler
+from csv_handler import DeviceDataHandler, NetworkConfigHandler
+
+EDGE_CASES = {
+    'short_rows.csv': (
+        "Device Name,Latency,Input Type,Output Type,Input Sample Rate,Output Sample Rate,Source\n"
+        "Foo Box,1ms,Analog,Dante,48,48,x\n"
+        "Foo Short,2ms\n"
+        "Foo Shorter\n"
+        "Foo Almost,3ms,Analog,Dante,48,48\n"
+    ),
+    'comments_and_blanks.csv': (
+        "Device Name,Latency,Input Type,Output Type\n"
+        "\n"
+        "# comment line,,,\n"
+        ",,,\n"
+        "   ,1ms,Analog,Analog\n"
+        "Bar Unit,\" 0,38 ms \",Analog,AES\n"
+        "\n"
+        "Bar Unit,\" 0,38 ms \",Analog,AES\n"
+    ),
+    'quoting.csv': (
+        "Device Name,Latency,Input Type,Output Type,Source\n"
+        "\"Baz, Inc Mixer\",\"1,5ms (round trip)\",\"Analog\",\"MADI\",\"a, b\"\n"
+        "\"Baz \"\"Pro\"\"\",.5,Analog,MADI,\"multi\nline\"\n"
+    ),
+    'bom.csv': (
+        "﻿Device Name,Latency,Input Type,Output Type\n"
+        "Qux Amp,4 MS,Analog,Analog\n"
+    ),
+    'duplicate_header.csv': (
+        "Device Name,Latency,Latency,Input Type,Output Type,Input Type\n"
+        "Dup One,1ms,2ms,Analog,Dante,AES\n"
+    ),
+    'extra_columns.csv': (
+        "Device Name,Latency,Input Type,Output Type\n"
+        "Extra Unit,1ms,Analog,Dante,surplus,more\n"
+        ",,,,surplus\n"
+        "Extra Unit,1ms,Analog,Dante\n"
+    ),
+    'old_columns.csv': (
+        "Name,Latency,Input Type,Output Type,Input SR,Output SR,Input Count,Output Count\n"
+        "Old Desk,n/a,Analog,Analog,44.1,48, 8 , 16 \n"
+        "Old Desk,,Analog,Analog,44.1,48,,\n"
+        "Old Desk,ms,Analog,Analog,44.1,48,2,2\n"
+        "Old Desk,inf,Analog,Analog,96,96,2,2\n"
+        "Old Desk,1e-1ms,Analog,Analog,96,96,2,2\n"
+    ),
+    'name_only_header.csv': (
+        "Device Name\n"
+        "Lonely Device\n"
+        "Lonely Device\n"
+    ),
+    'header_only.csv': "Device Name,Latency\n",
+    'empty.csv': "",
+    'crlf.csv': (
+        "Device Name,Latency,Input Type,Output Type\r\n"
+        "Crlf Box,1ms,Analog,\"Dante\r\nAES\"\r\n"
+    ),
+}
+
+
+def load(csv_dir: str, loader: str, network_handler, image_handler):
+    handler = DeviceDataHandler(csv_dir, network_handler, image_finder=image_handler.find,
+                                loader=loader)
+    handler.COLUMN_PARSE_MIN_BYTES = 0  # Parse every file column-wise
+    return handler.load()
+
+
+def compare(csv_dir: str, network_handler, image_handler) -> bool:
+    """Load a directory with both loaders and report differing columns."""
+    expected = load(csv_dir, 'csv', network_handler, image_handler)
+    actual = load(csv_dir, 'pandas', network_handler, image_handler)
+
+    columns = ['ids', 'latency', 'names', 'brands', 'display_time', 'images', 'sources']
+    ok = len(expected) == len(actual)
+    if not ok:
+        print(f"  row count differs: csv={len(expected)} pandas={len(actual)}")
+    for column in columns:
+        if list(getattr(expected, column)) != list(getattr(actual, column)):
+            print(f"  column {column} differs")
+            ok = False
+    for field in RAW_FIELDS:
+        if expected.raw_columns[field] != actual.raw_columns[field]:
+            print(f"  raw column {field} differs")
+            ok = False
+    if [d.to_dict() for d in expected] != [d.to_dict() for d in actual]:
+        print("  device dicts differ")
+        ok = False
+    print(f"{'OK  ' if ok else 'FAIL'} {csv_dir} ({len(expected)} rows)")
+    return ok
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    image_handler = ImageHandler(Config.IMAGE_FOLDER)
+    image_handler.scan()
+    network_handler = NetworkConfigHandler(Config.NETWORK_CNF_FILE)
+    network_handler.load()
+
+    ok = True
+    for csv_dir in sys.argv[1:] or [Config.CSV_DIR]:
+        ok &= compare(csv_dir, network_handler, image_handler)
+
+    edge_dir = tempfile.mkdtemp(prefix='alc-loader-')
+    try:
+        for filename, text in EDGE_CASES.items():
+            case_dir = os.path.join(edge_dir, os.path.splitext(filename)[0])
+            os.makedirs(case_dir)
+            with open(os.path.join(case_dir, filename), 'w', encoding='utf-8', newline='') as f:
+                f.write(text)
+            ok &= compare(case_dir, network_handler, image_handler)
+        with open(os.path.join(edge_dir, 'bad_encoding.csv'), 'wb') as f:
+            f.write(b"Device Name,Latency\nCaf\xe9 Unit,1ms\n")
+        ok &= compare(edge_dir, network_handler, image_handler)
+    finally:
+        shutil.rmtree(edge_dir)
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,324 @@
+"""
+File watcher for the catalogue sources.
+
+Watches files and directories from one background thread and runs a
+callback per target once its changes have settled. On Linux it uses
+inotify through ctypes, so nothing is read from disk until something
+changes; elsewhere, or when a path cannot be watched (not created yet, out
+of inotify watches), the target is polled every ``poll_interval`` seconds
+by comparing stat signatures. Bursts of events (an editor saving, a copy of
+many images) are debounced into a single callback.
+"""
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+_EVENT = struct.Struct('iIII')  # wd, mask, cookie, name length
+
+# A target that keeps changing still fires after this many debounce periods
+MAX_DEBOUNCE_PERIODS = 10
+
+
+def _load_inotify():
+    """libc with the inotify functions, or None when unavailable."""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class _Target:
+    """One watched file or directory tree and its pending change."""
+
+    def __init__(self, name: str, path: str, callback: Callable[[], None],
+                 recursive: bool, suffixes: Tuple[str, ...]):
+        self.name = name
+        self.path = os.path.abspath(path)
+        self.callback = callback
+        self.recursive = recursive
+        self.suffixes = suffixes
+        self.polled = False
+        self.signature = None
+        self.first_change: Optional[float] = None
+        self.last_change = 0.0
+
+    @property
+    def is_file(self) -> bool:
+        return not self.suffixes and not self.recursive
+
+    @property
+    def directory(self) -> str:
+        """Directory watched with inotify for this target."""
+        return os.path.dirname(self.path) if self.is_file else self.path
+
+    def matches(self, directory: str, filename: str, is_dir: bool) -> bool:
+        """Whether an event for directory/filename concerns this target."""
+        if self.is_file:
+            return os.path.join(directory, filename) == self.path
+        if is_dir:
+            return self.recursive
+        return not self.suffixes or filename.lower().endswith(self.suffixes)
+
+    def poll_signature(self):
+        """Stat signature of the target, compared between polls."""
+        if self.is_file:
+            try:
+                st = os.stat(self.path)
+                return (st.st_mtime_ns, st.st_size)
+            except OSError:
+                return None
+
+        entries = []
+        for root, dirs, files in os.walk(self.path):
+            if not self.recursive:
+                dirs.clear()
+            for filename in files:
+                if self.suffixes and not filename.lower().endswith(self.suffixes):
+                    continue
+                try:
+                    st = os.stat(os.path.join(root, filename))
+                except OSError:
+                    continue
+                entries.append((os.path.join(root, filename), st.st_mtime_ns, st.st_size))
+        return tuple(sorted(entries))
+
+    def mark_changed(self, now: float) -> None:
+        if self.first_change is None:
+            self.first_change = now
+        self.last_change = now
+
+    def due(self, now: float, debounce: float) -> bool:
+        """Whether the pending change has been quiet for the debounce period."""
+        if self.first_change is None:
+            return False
+        return (now - self.last_change >= debounce
+                or now - self.first_change >= debounce * MAX_DEBOUNCE_PERIODS)
+
+
+class FileWatcher:
+    """
+    Runs a callback when a watched file or directory changes.
+
+    Args:
+        debounce: Seconds without further changes before a callback runs
+        poll_interval: Seconds between polls of targets inotify cannot watch
+        use_inotify: Use inotify when available (False forces polling)
+    """
+
+    def __init__(self, debounce: float = 0.5, poll_interval: float = 2.0, use_inotify: bool = True):
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.pid: Optional[int] = None
+        self._targets: List[_Target] = []
+        self._libc = None
+        self._fd = -1
+        self._watches: Dict[int, Tuple[str, List[_Target]]] = {}  # wd -> (directory, targets)
+        self._next_poll = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def watch(self, name: str, path: str, callback: Callable[[], None],
+              recursive: bool = False, suffixes: Tuple[str, ...] = ()) -> None:
+        """
+        Register a target before start().
+
+        Args:
+            name: Target name used in log messages
+            path: File, or directory when recursive or suffixes are given
+            callback: Called from the watcher thread after changes settle
+            recursive: Also watch subdirectories
+            suffixes: Only files with these (lowercase) suffixes count
+        """
+        self._targets.append(_Target(name, path, callback, recursive, tuple(suffixes)))
+
+    def start(self) -> None:
+        """Start the watcher thread for this process (again after a fork)."""
+        with self._lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self._stop = threading.Event()
+            self._watches = {}
+            self._fd = self._open_inotify() if self.use_inotify else -1
+            for target in self._targets:
+                self._add_target(target)
+            self._thread = threading.Thread(target=self._run, name='file-watcher', daemon=True)
+            self._thread.start()
+        polled = [t.name for t in self._targets if t.polled]
+        logger.info(
+            f"Watching {', '.join(t.name for t in self._targets)} "
+            f"({'inotify' if self._fd >= 0 else 'polling'}"
+            f"{', polling ' + ', '.join(polled) if polled and self._fd >= 0 else ''})"
+        )
+
+    def stop(self) -> None:
+        """Stop the watcher thread and release the inotify descriptor."""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=2)
+
+    def _open_inotify(self) -> int:
+        """inotify descriptor, or -1 to poll everything."""
+        self._libc = _load_inotify()
+        if self._libc is None:
+            return -1
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            logger.warning(f"inotify unavailable ({os.strerror(ctypes.get_errno())}), polling instead")
+            return -1
+        return fd
+
+    def _add_target(self, target: _Target) -> None:
+        """Watch a target with inotify, falling back to polling it."""
+        target.polled = False
+        if self._fd >= 0:
+            directories = [target.directory]
+            if target.recursive:
+                directories += [root for root, _, _ in os.walk(target.directory)][1:]
+            if all(self._add_watch(d, target) for d in directories):
+                return
+        target.polled = True
+        target.signature = target.poll_signature()
+
+    def _add_watch(self, directory: str, target: _Target) -> bool:
+        """Watch one directory for a target."""
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err != errno.ENOENT:
+                logger.warning(f"Cannot watch {directory}: {os.strerror(err)}, polling instead")
+            return False
+        _, targets = self._watches.setdefault(wd, (directory, []))
+        if target not in targets:
+            targets.append(target)
+        return True
+
+    def _run(self) -> None:
+        """Watcher loop: read events, poll, and fire settled targets."""
+        try:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                timeout = 1.0
+                for target in self._targets:
+                    if target.first_change is not None:
+                        timeout = min(timeout, max(0.0, target.last_change + self.debounce - now))
+                if any(t.polled for t in self._targets):
+                    timeout = min(timeout, max(0.0, self._next_poll - now))
+
+                if self._fd >= 0:
+                    readable, _, _ = select.select([self._fd], [], [], timeout)
+                    if readable:
+                        self._read_events()
+                else:
+                    self._stop.wait(timeout)
+
+                now = time.monotonic()
+                if now >= self._next_poll:
+                    self._poll(now)
+                    self._next_poll = now + self.poll_interval
+                for target in self._targets:
+                    if target.due(now, self.debounce):
+                        self._fire(target)
+        except Exception as e:
+            logger.error(f"File watcher stopped: {e}")
+        finally:
+            if self._fd >= 0:
+                os.close(self._fd)
+                self._fd = -1
+
+    def _read_events(self) -> None:
+        """Drain the inotify descriptor and mark affected targets."""
+        now = time.monotonic()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset + _EVENT.size <= len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                raw_name = data[offset + _EVENT.size:offset + _EVENT.size + length]
+                offset += _EVENT.size + length
+                self._handle_event(wd, mask, os.fsdecode(raw_name.split(b'\0', 1)[0]), now)
+
+    def _handle_event(self, wd: int, mask: int, filename: str, now: float) -> None:
+        if mask & IN_Q_OVERFLOW:
+            for target in self._targets:
+                target.mark_changed(now)
+            return
+
+        directory, targets = self._watches.get(wd, ('', []))
+        if mask & IN_IGNORED:
+            # Watched directory deleted or moved away: poll until it returns
+            self._watches.pop(wd, None)
+            for target in targets:
+                if not target.polled:
+                    target.polled = True
+                    target.signature = None
+                    target.mark_changed(now)
+            return
+
+        is_dir = bool(mask & IN_ISDIR)
+        for target in targets:
+            if not filename or target.matches(directory, filename, is_dir):
+                target.mark_changed(now)
+                if is_dir and target.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                    for root, _, _ in os.walk(os.path.join(directory, filename)):
+                        self._add_watch(root, target)
+
+    def _poll(self, now: float) -> None:
+        """Compare signatures of polled targets, re-watching any that came back."""
+        for target in self._targets:
+            if not target.polled:
+                continue
+            signature = target.poll_signature()
+            if signature != target.signature:
+                target.signature = signature
+                target.mark_changed(now)
+            if self._fd >= 0 and os.path.isdir(target.directory):
+                self._add_target(target)
+
+    def _fire(self, target: _Target) -> None:
+        target.first_change = None
+        logger.info(f"Detected changes in {target.name}, reloading")
+        try:
+            target.callback()
+        except Exception as e:
+            logger.error(f"Reload of {target.name} failed: {e}")